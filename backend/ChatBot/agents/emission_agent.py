@@ -1,49 +1,35 @@
 # Emissions impact agent
 
-import re
-import json
-from utils.data_store import get_credits, get_user_footprint, format_footprint_for_chat
+from typing import Dict, Iterator, Optional
+
+from utils.conversation_memory import fit_prompt
+from utils.data_store import footprint_prompt_section
 from utils.prompt_templates import EMISSION_AGENT_SYSTEM
-from utils.helpers import llm_chat
+from utils.entity_extractor import extract, mentioned_credits
+from utils.helpers import llm_chat, llm_chat_stream
+from utils.session_store import Session
+from utils.snapshot import get_snapshot
 
 
 def find_credit_by_id(credit_id: str):
-    for credit in get_credits():
-        if credit["credit_id"].lower() == credit_id.lower():
-            return credit
-    return None
+    return get_snapshot().find_credit(credit_id)
 
 
 def extract_quantity(text: str) -> int:
-    match = re.search(r"(\d+)\s*(credits|credit|tons|ton)", text.lower())
-    if match:
-        return int(match.group(1))
-    return 1
-
-
-def extract_user_id_from_context(session_context: str) -> str:
-    """Extract user_id from session context if available."""
-    lines = session_context.split("\n")
-    for line in lines:
-        if "user_id:" in line.lower():
-            return line.split(":", 1)[-1].strip()
-    return None
+    return extract(text).quantity or 1
 
 
-def answer_emission_question(user_input: str, session_context: str = "") -> str:
+def build_emission_context(user_input: str) -> str:
     quantity = extract_quantity(user_input)
-    credit = None
-    credits = get_credits()
-    
-    # Try to find credit by ID in user input
-    for c in credits:
-        if c["credit_id"].lower() in user_input.lower():
-            credit = c
-            break
-
-    if not credit:
+    snapshot = get_snapshot()
+
+    # Use the first credit the user names, if any
+    named = mentioned_credits(user_input, snapshot)
+    if named:
+        credit = named[0]
+    else:
         # Default to highest impact credit for illustration
-        credit = max(credits, key=lambda c: c["emissions_offset_tons"])
+        credit = max(snapshot.credits, key=lambda c: c["emissions_offset_tons"])
 
     total_offset = credit["emissions_offset_tons"] * quantity
 
@@ -53,24 +39,31 @@ def answer_emission_question(user_input: str, session_context: str = "") -> str:
         f"Quantity: {quantity}\n"
         f"Estimated total offset: {total_offset} tons CO2"
     )
+    return context
+
 
-    # Try to include user's carbon footprint if available
-    user_footprint_context = ""
-    user_id = extract_user_id_from_context(session_context)
-    if user_id:
-        try:
-            user_footprint = get_user_footprint(user_id)
-            if user_footprint:
-                footprint_text = format_footprint_for_chat(user_footprint)
-                user_footprint_context = f"\nUser's Carbon Footprint:\n{footprint_text}\n"
-        except Exception as e:
-            print(f"Warning: Could not retrieve user footprint: {str(e)}")
-
-    prompt = (
+def build_emission_prompt(user_input: str, session_context: str = "", footprint: Optional[Dict] = None, context: Optional[str] = None) -> str:
+    if context is None:
+        context = build_emission_context(user_input)
+    return (
         "User question: " + user_input + "\n\n" +
         "Emissions context:\n" + context + "\n" +
-        user_footprint_context +
+        footprint_prompt_section(footprint) +
         "User profile context:\n" + session_context +
         "\n\nExplain the calculation in plain language, considering the user's carbon footprint, and note assumptions."
     )
+
+
+def answer_emission_question(user_input: str, session: Optional[Session] = None) -> str:
+    # Include the user's carbon footprint when the session has a user_id
+    footprint = session.footprint(user_input) if session else None
+    context = session.context if session else ""
+    prompt = fit_prompt(session, EMISSION_AGENT_SYSTEM, build_emission_prompt(user_input, context, footprint))
     return llm_chat(EMISSION_AGENT_SYSTEM, prompt)
+
+
+def stream_emission_question(user_input: str, session: Optional[Session] = None) -> Iterator[str]:
+    footprint = session.footprint(user_input) if session else None
+    context = session.context if session else ""
+    prompt = fit_prompt(session, EMISSION_AGENT_SYSTEM, build_emission_prompt(user_input, context, footprint))
+    yield from llm_chat_stream(EMISSION_AGENT_SYSTEM, prompt)
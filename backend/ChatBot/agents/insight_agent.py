@@ -1,40 +1,32 @@
 # Project insights agent
 
 from collections import Counter
-from utils.data_store import get_credits, get_sellers, get_user_footprint, format_footprint_for_chat
-from utils.prompt_templates import INSIGHT_AGENT_SYSTEM
-from utils.helpers import llm_chat
-from utils.scoring import compute_trust_score
-
+from typing import Dict, Iterator, Optional
 
-def extract_user_id_from_context(session_context: str) -> str:
-    """Extract user_id from session context if available."""
-    lines = session_context.split("\n")
-    for line in lines:
-        if "user_id:" in line.lower():
-            return line.split(":", 1)[-1].strip()
-    return None
+from utils.conversation_memory import fit_prompt
+from utils.data_store import footprint_prompt_section
+from utils.prompt_templates import INSIGHT_AGENT_SYSTEM
+from utils.helpers import llm_chat, llm_chat_stream
+from utils.session_store import Session
+from utils.ranking_index import get_ranking_index
+from utils.snapshot import get_snapshot
 
 
 def build_insights() -> str:
-    credits = get_credits()
-    sellers = get_sellers()
+    credits = get_snapshot().credits
+    index = get_ranking_index()
     project_types = [c["project_type"] for c in credits]
     type_counts = Counter(project_types)
 
-    seller_trust = []
-    for seller_id, profile in sellers.items():
-        seller_trust.append((compute_trust_score(profile), seller_id, profile))
-    seller_trust.sort(reverse=True)
-
-    high_demand = sorted(credits, key=lambda c: c["demand_score"], reverse=True)[:3]
+    seller_trust = index.top_sellers(3)
+    high_demand = index.top_by_demand(3)
 
     lines = ["Project type distribution:"]
     for ptype, count in type_counts.items():
         lines.append(f"- {ptype}: {count} listings")
 
     lines.append("Top trusted sellers:")
-    for score, seller_id, profile in seller_trust[:3]:
+    for score, seller_id, profile in seller_trust:
         lines.append(f"- {profile['name']} (trust score {profile['trust_score']}, volume {profile['past_sales_volume']})")
 
     lines.append("High demand credits:")
@@ -46,26 +38,28 @@ def build_insights() -> str:
     return "\n".join(lines)
 
 
-def answer_insight_question(user_input: str, session_context: str = "") -> str:
-    context = build_insights()
-    
-    # Try to include user's carbon footprint if available
-    user_footprint_context = ""
-    user_id = extract_user_id_from_context(session_context)
-    if user_id:
-        try:
-            user_footprint = get_user_footprint(user_id)
-            if user_footprint:
-                footprint_text = format_footprint_for_chat(user_footprint)
-                user_footprint_context = f"\nUser's Carbon Footprint:\n{footprint_text}\n"
-        except Exception as e:
-            print(f"Warning: Could not retrieve user footprint: {str(e)}")
-    
-    prompt = (
+def build_insight_prompt(user_input: str, session_context: str = "", footprint: Optional[Dict] = None, context: Optional[str] = None) -> str:
+    if context is None:
+        context = build_insights()
+    return (
         "User question: " + user_input + "\n\n" +
         "Project insights data:\n" + context + "\n" +
-        user_footprint_context +
+        footprint_prompt_section(footprint) +
         "User profile context:\n" + session_context +
         "\n\nProvide concise insights grounded in the data. Consider the user's carbon footprint if available."
     )
+
+
+def answer_insight_question(user_input: str, session: Optional[Session] = None) -> str:
+    # Include the user's carbon footprint when the session has a user_id
+    footprint = session.footprint(user_input) if session else None
+    context = session.context if session else ""
+    prompt = fit_prompt(session, INSIGHT_AGENT_SYSTEM, build_insight_prompt(user_input, context, footprint))
     return llm_chat(INSIGHT_AGENT_SYSTEM, prompt)
+
+
+def stream_insight_question(user_input: str, session: Optional[Session] = None) -> Iterator[str]:
+    footprint = session.footprint(user_input) if session else None
+    context = session.context if session else ""
+    prompt = fit_prompt(session, INSIGHT_AGENT_SYSTEM, build_insight_prompt(user_input, context, footprint))
+    yield from llm_chat_stream(INSIGHT_AGENT_SYSTEM, prompt)
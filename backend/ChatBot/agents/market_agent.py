@@ -1,16 +1,20 @@
 # Market analysis agent
 
-from utils.data_store import get_credits, get_sellers
+from typing import Iterator, Optional
+
+from utils.snapshot import get_snapshot
 from utils.prompt_templates import MARKET_AGENT_SYSTEM
-from utils.helpers import llm_chat
-from utils.scoring import rank_credits
+from utils.conversation_memory import fit_prompt
+from utils.helpers import llm_chat, llm_chat_stream
+from utils.session_store import Session
+from utils.ranking_index import get_ranking_index
 
 
 def market_summary() -> str:
-    credits = get_credits()
-    sellers = get_sellers()
-    top_by_value = rank_credits(credits)[:3]
-    top_selling = sorted(credits, key=lambda c: c["demand_score"], reverse=True)[:3]
+    sellers = get_snapshot().sellers
+    index = get_ranking_index()
+    top_by_value = index.top_by_value(3)
+    top_selling = index.top_by_demand(3)
 
     def credit_line(c):
         seller = sellers.get(c["seller_id"], {})
@@ -25,12 +29,22 @@ def market_summary() -> str:
     return "\n".join(lines)
 
 
-def answer_market_question(user_input: str, session_context: str = "") -> str:
-    context = market_summary()
-    prompt = (
+def build_market_prompt(user_input: str, session_context: str = "", footprint=None, context: Optional[str] = None) -> str:
+    if context is None:
+        context = market_summary()
+    return (
         "User question: " + user_input + "\n\n" +
         "Marketplace snapshot:\n" + context + "\n\n" +
         "User profile context:\n" + session_context +
         "\n\nAnswer in a clear, professional tone."
     )
-    return llm_chat(MARKET_AGENT_SYSTEM, prompt)
+
+
+def answer_market_question(user_input: str, session: Optional[Session] = None) -> str:
+    prompt = build_market_prompt(user_input, session.context if session else "")
+    return llm_chat(MARKET_AGENT_SYSTEM, fit_prompt(session, MARKET_AGENT_SYSTEM, prompt))
+
+
+def stream_market_question(user_input: str, session: Optional[Session] = None) -> Iterator[str]:
+    prompt = build_market_prompt(user_input, session.context if session else "")
+    yield from llm_chat_stream(MARKET_AGENT_SYSTEM, fit_prompt(session, MARKET_AGENT_SYSTEM, prompt))
@@ -0,0 +1,234 @@
+# Pipelined /chat preparation: agent context is prefetched while the LLM router decides
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Dict, List, NamedTuple, Optional
+
+from agents.registry import AGENTS, FALLBACK_INTENT, AgentSpec
+from agents.router_agent import is_confident, route_intent, route_with_llm
+from config import CHAT_PREFETCH_ENABLED, CHAT_PREFETCH_INTENTS, CHAT_PREFETCH_WORKERS
+from utils.conversation_memory import fit_prompt
+from utils.intent_classifier import IntentPrediction, classify_intent
+from utils.latency import get_latency_recorder
+from utils.metrics import record_stage
+from utils.session_store import Session
+from utils.tracing import span
+
+_executor = ThreadPoolExecutor(max_workers=CHAT_PREFETCH_WORKERS, thread_name_prefix="chat-prefetch")
+
+
+class WorkerSlots:
+    """Counts prefetch tasks queued or running on the shared pool.
+
+    A request claims slots before submitting its tasks and each task frees its
+    slot when it finishes or is cancelled. A request only submits as many
+    tasks as there are free workers, so a prefetch never queues behind other
+    chats' prefetches, where waiting would cost more than the overlap saves.
+    """
+
+    def __init__(self, workers: int):
+        self._lock = threading.Lock()
+        self.workers = workers
+        self.busy = 0
+
+    def acquire(self, wanted: int) -> int:
+        """Claim up to `wanted` free workers and return how many were claimed."""
+        with self._lock:
+            granted = max(0, min(wanted, self.workers - self.busy))
+            self.busy += granted
+            return granted
+
+    def release(self, _future=None) -> None:
+        with self._lock:
+            self.busy -= 1
+
+
+_slots = WorkerSlots(CHAT_PREFETCH_WORKERS)
+
+
+class PrefetchPlan(NamedTuple):
+    intents: List[str]
+    footprint: bool
+
+
+class PreparedChat(NamedTuple):
+    intent: str
+    agent: AgentSpec
+    prompt: str
+
+
+class PrefetchStats:
+    """Counters for speculative prefetch, reported by /health."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.speculated = 0
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+        self.skipped = 0
+        self.trimmed = 0
+        self.saved_ms = 0.0
+
+    def record(self, hit: bool, cancelled: int, saved_ms: float) -> None:
+        with self._lock:
+            self.speculated += 1
+            self.hits += hit
+            self.misses += not hit
+            self.cancelled += cancelled
+            self.saved_ms += saved_ms
+
+    def record_pool_busy(self, skipped: bool) -> None:
+        with self._lock:
+            self.skipped += skipped
+            self.trimmed += not skipped
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "speculated": self.speculated,
+                "hits": self.hits,
+                "misses": self.misses,
+                "cancelled": self.cancelled,
+                "skipped_pool_busy": self.skipped,
+                "trimmed_pool_busy": self.trimmed,
+                "busy_workers": _slots.busy,
+                "saved_ms_total": round(self.saved_ms, 1),
+                "saved_ms_avg": round(self.saved_ms / self.speculated, 1) if self.speculated else 0.0,
+            }
+
+
+_stats = PrefetchStats()
+
+
+def get_prefetch_stats() -> PrefetchStats:
+    return _stats
+
+
+def agent_key(intent: str) -> str:
+    return intent if intent in AGENTS else FALLBACK_INTENT
+
+
+def likely_intents(prediction: IntentPrediction, count: int) -> List[str]:
+    """The `count` most probable agents according to the local classifier."""
+    keys = []
+    for label in sorted(prediction.scores, key=prediction.scores.get, reverse=True):
+        key = agent_key(label)
+        if key not in keys:
+            keys.append(key)
+        if len(keys) == count:
+            break
+    return keys
+
+
+def _timed(name: str, fn, *args):
+    start = time.perf_counter()
+    with span(name):
+        result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def _submit(name: str, fn, *args):
+    # In a copy of this context, so the worker's spans join the request's trace.
+    # The caller has already claimed a slot for this task in _slots.
+    future = _executor.submit(copy_context().run, _timed, name, fn, *args)
+    future.add_done_callback(_slots.release)
+    return future
+
+
+def _claim_prefetch(prediction: IntentPrediction, session: Optional[Session]) -> Optional[PrefetchPlan]:
+    """Claim prefetch workers for this request and return what to prefetch with them.
+
+    Returns None when prefetch is off, the classifier is confident, or no
+    worker is free; the request then runs sequentially. With fewer free workers
+    than tasks, the footprint (a MongoDB round trip) is kept first, then the
+    agents' contexts from the likeliest down.
+    """
+    if not CHAT_PREFETCH_ENABLED or is_confident(prediction):
+        return None
+    keys = likely_intents(prediction, CHAT_PREFETCH_INTENTS)
+    footprint = bool(session and session.user_id)
+    wanted = len(keys) + footprint
+    granted = _slots.acquire(wanted)
+    if granted < wanted:
+        _stats.record_pool_busy(skipped=granted == 0)
+    if granted == 0:
+        return None
+    if granted < wanted:
+        keys = keys[:granted - footprint]
+    return PrefetchPlan(keys, footprint)
+
+
+def prepare_chat(message: str, session: Optional[Session] = None, prediction: Optional[IntentPrediction] = None) -> PreparedChat:
+    """Route `message` and build the chosen agent's prompt.
+
+    When the local classifier is confident, routing costs nothing and the steps
+    run in order. Otherwise the LLM router call overlaps with building the
+    context of the likeliest agents and fetching the user's footprint; the
+    winning branch is used and the rest are cancelled or discarded. Either way
+    the prompt is the same one the agent's answer_* function would build, and
+    it carries the session's conversation history. Only personalized agents
+    get the profile context and footprint. When the prefetch pool is busy with
+    other chats, only what fits on the free workers is prefetched and the rest
+    is loaded after routing, as in sequential mode.
+    """
+    prediction = prediction or classify_intent(message)
+    plan = _claim_prefetch(prediction, session)
+    if plan is None:
+        intent, router_ms = _timed("route", route_intent, message, prediction)
+        agent = AGENTS[agent_key(intent)]
+        context, context_ms = _timed("context", agent.build_context, message)
+        record_stage("route", router_ms / 1000)
+        record_stage("context", context_ms / 1000)
+        if not agent.personalized or session is None:
+            prompt = agent.build_prompt(message, context=context)
+        else:
+            footprint, footprint_ms = _timed("footprint", session.footprint, message)
+            record_stage("footprint", footprint_ms / 1000)
+            prompt = agent.build_prompt(message, session.context, footprint, context=context)
+        return PreparedChat(intent, agent, fit_prompt(session, agent.system_prompt, prompt))
+
+    started = time.perf_counter()
+    contexts = {key: _submit("prefetch.context." + key, AGENTS[key].build_context, message) for key in plan.intents}
+    footprint_future = _submit("prefetch.footprint", session.footprint, message) if plan.footprint else None
+
+    intent, router_ms = _timed("route", route_with_llm, message)
+    key = agent_key(intent)
+    agent = AGENTS[key]
+
+    cancelled = sum(future.cancel() for other, future in contexts.items() if other != key)
+    hit = key in contexts
+    if hit:
+        context, context_ms = contexts[key].result()
+    else:
+        context, context_ms = _timed("context", agent.build_context, message)
+
+    footprint, footprint_ms = None, 0.0
+    if footprint_future is not None:
+        if agent.personalized:
+            footprint, footprint_ms = footprint_future.result()
+        else:
+            cancelled += footprint_future.cancel()
+    elif agent.personalized and session and session.user_id:
+        # Not prefetched: the pool had no worker left for it
+        footprint, footprint_ms = _timed("footprint", session.footprint, message)
+
+    if agent.personalized and session is not None:
+        prompt = agent.build_prompt(message, session.context, footprint, context=context)
+    else:
+        prompt = agent.build_prompt(message, context=context)
+
+    # Stage times overlap here, so they can add up to more than the request took
+    record_stage("route", router_ms / 1000)
+    record_stage("context", context_ms / 1000)
+    if footprint_ms:
+        record_stage("footprint", footprint_ms / 1000)
+
+    # Critical-path time saved versus running router, context and footprint back to back
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    saved_ms = max(0.0, router_ms + context_ms + footprint_ms - elapsed_ms)
+    _stats.record(hit, cancelled, saved_ms)
+    get_latency_recorder().record("chat_prefetch_saved", saved_ms)
+    return PreparedChat(intent, agent, fit_prompt(session, agent.system_prompt, prompt))
@@ -0,0 +1,65 @@
+# Intent -> agent lookup shared by the chat serving paths
+
+from typing import Callable, Iterator, NamedTuple, Optional
+
+from agents.emission_agent import answer_emission_question, build_emission_context, build_emission_prompt, stream_emission_question
+from agents.insight_agent import answer_insight_question, build_insight_prompt, build_insights, stream_insight_question
+from agents.market_agent import answer_market_question, build_market_prompt, market_summary, stream_market_question
+from agents.recommendation_agent import (
+    answer_recommendation_question,
+    build_recommendation_context,
+    build_recommendation_prompt,
+    stream_recommendation_question,
+)
+from agents.theory_agent import answer_theory_question, build_theory_context, build_theory_prompt, stream_theory_question
+from utils.session_store import Session
+from utils.prompt_templates import (
+    EMISSION_AGENT_SYSTEM,
+    INSIGHT_AGENT_SYSTEM,
+    MARKET_AGENT_SYSTEM,
+    RECOMMENDATION_AGENT_SYSTEM,
+    THEORY_AGENT_SYSTEM,
+)
+
+
+class AgentSpec(NamedTuple):
+    system_prompt: str
+    # Data-dependent part of the prompt; build_prompt(..., context=...) reuses a prebuilt one
+    build_context: Callable[[str], str]
+    build_prompt: Callable[..., str]
+    # (message, session) -> answer
+    answer: Callable[[str, Optional[Session]], str]
+    stream: Callable[[str, Optional[Session]], Iterator[str]]
+    # The /chat API passes the session (profile context and the user's footprint) only to these agents
+    personalized: bool
+
+
+AGENTS = {
+    "market_analysis": AgentSpec(
+        MARKET_AGENT_SYSTEM, lambda user_input: market_summary(), build_market_prompt,
+        answer_market_question, stream_market_question, False,
+    ),
+    "recommendation": AgentSpec(
+        RECOMMENDATION_AGENT_SYSTEM, build_recommendation_context, build_recommendation_prompt,
+        answer_recommendation_question, stream_recommendation_question, True,
+    ),
+    "emissions": AgentSpec(
+        EMISSION_AGENT_SYSTEM, build_emission_context, build_emission_prompt,
+        answer_emission_question, stream_emission_question, True,
+    ),
+    "theory": AgentSpec(
+        THEORY_AGENT_SYSTEM, build_theory_context, build_theory_prompt,
+        answer_theory_question, stream_theory_question, False,
+    ),
+    "insights": AgentSpec(
+        INSIGHT_AGENT_SYSTEM, lambda user_input: build_insights(), build_insight_prompt,
+        answer_insight_question, stream_insight_question, True,
+    ),
+}
+
+# "general" and unknown intents fall back to the market agent
+FALLBACK_INTENT = "market_analysis"
+
+
+def get_agent(intent: str) -> AgentSpec:
+    return AGENTS.get(intent, AGENTS[FALLBACK_INTENT])
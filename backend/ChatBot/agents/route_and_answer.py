@@ -0,0 +1,85 @@
+# Single-call mode: one completion both routes the message and answers it
+
+from typing import Dict, NamedTuple, Optional
+
+from agents.registry import AGENTS
+from config import MAX_TOKENS, TEMPERATURE
+from utils.conversation_memory import fit_prompt
+from utils.data_store import footprint_prompt_section
+from utils.helpers import CHAT_MODEL, llm_complete, normalize_intent, safe_parse_json
+from utils.llm_cache import get_llm_cache, make_cache_key
+from utils.metrics import stage
+from utils.prompt_templates import ROUTE_AND_ANSWER_SYSTEM_PROMPT
+from utils.session_store import Session
+from utils.single_flight import get_single_flight
+
+# Per-agent context budget; sections are cut at a line boundary
+COMPACT_SECTION_CHARS = 800
+
+
+class RoutedAnswer(NamedTuple):
+    intent: str
+    reason: str
+    answer: str
+
+
+def compact(text: str, limit: int = COMPACT_SECTION_CHARS) -> str:
+    if len(text) <= limit:
+        return text
+    cut = text.rfind("\n", 0, limit)
+    return text[:cut if cut > 0 else limit] + "\n..."
+
+
+def build_route_and_answer_prompt(user_input: str, session_context: str = "", footprint: Optional[Dict] = None) -> str:
+    sections = [f"[{intent}]\n{compact(agent.build_context(user_input))}" for intent, agent in AGENTS.items()]
+    return (
+        "User question: " + user_input + "\n\n" +
+        "Context by label:\n" + "\n\n".join(sections) + "\n" +
+        footprint_prompt_section(footprint) +
+        "User profile context:\n" + session_context
+    )
+
+
+def parse_routed_answer(text: str) -> Optional[RoutedAnswer]:
+    """Validate the model's JSON; None means the caller should use the two-call path."""
+    payload = safe_parse_json(text)
+    if not isinstance(payload, dict):
+        return None
+    label = payload.get("label")
+    answer = payload.get("answer")
+    if not isinstance(label, str) or not isinstance(answer, str) or not answer.strip():
+        return None
+    intent = normalize_intent(label)
+    if intent == "general" and label.strip().lower() != "general":
+        # Unknown label: the model did not follow the format
+        return None
+    reason = payload.get("reason")
+    return RoutedAnswer(intent, reason if isinstance(reason, str) else "", answer.strip())
+
+
+def route_and_answer(user_input: str, session: Optional[Session] = None) -> Optional[RoutedAnswer]:
+    with stage("footprint"):
+        footprint = session.footprint(user_input) if session else None
+    with stage("context"):
+        prompt = build_route_and_answer_prompt(user_input, session.context if session else "", footprint)
+        prompt = fit_prompt(session, ROUTE_AND_ANSWER_SYSTEM_PROMPT, prompt)
+
+    # Cached like llm_chat, but only once the reply has parsed: a malformed reply
+    # must not pin this prompt to the fallback path
+    cache = get_llm_cache()
+    key = make_cache_key(CHAT_MODEL, TEMPERATURE, MAX_TOKENS, ROUTE_AND_ANSWER_SYSTEM_PROMPT, prompt, "json")
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        return parse_routed_answer(cached)
+
+    def complete() -> str:
+        return llm_complete(ROUTE_AND_ANSWER_SYSTEM_PROMPT, prompt, json_mode=True).text
+
+    # Identical prompts in flight at once share one Groq request, as in llm_chat
+    flights = get_single_flight()
+    with stage("route_and_answer_llm"):
+        text = flights.do(key, complete) if flights is not None else complete()
+    routed = parse_routed_answer(text)
+    if routed is not None and cache is not None:
+        cache.put(key, text)
+    return routed
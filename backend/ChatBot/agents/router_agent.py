@@ -1,27 +1,51 @@
 # Router agent to classify user intent and route to the correct specialized agent
 
+from typing import Optional
+
+from config import ROUTER_CONFIDENCE_THRESHOLD
 from utils.prompt_templates import ROUTER_SYSTEM_PROMPT
-from utils.helpers import llm_chat, safe_parse_json, normalize_intent
+from utils.helpers import allm_chat, llm_chat, safe_parse_json, normalize_intent
+from utils.intent_classifier import IntentPrediction, classify_intent, keyword_labels
+from utils.tracing import traced
+
+
+def route_intent(user_input: str, prediction: Optional[IntentPrediction] = None) -> str:
+    # Tier 1: local classifier, no network round trip when it is confident
+    prediction = prediction or classify_intent(user_input)
+    if is_confident(prediction):
+        return prediction.label
+
+    # Tier 2: ask LLM to classify intent
+    return route_with_llm(user_input)
+
+
+def is_confident(prediction: IntentPrediction) -> bool:
+    return prediction.confidence >= ROUTER_CONFIDENCE_THRESHOLD
 
 
-def route_intent(user_input: str) -> str:
-    # Ask LLM to classify intent
+@traced("router.llm")
+def route_with_llm(user_input: str) -> str:
     response = llm_chat(ROUTER_SYSTEM_PROMPT, user_input)
+    return label_from_router_response(response, user_input)
+
+
+async def aroute_intent(user_input: str) -> str:
+    prediction = classify_intent(user_input)
+    if is_confident(prediction):
+        return prediction.label
+
+    response = await allm_chat(ROUTER_SYSTEM_PROMPT, user_input)
+    return label_from_router_response(response, user_input)
+
+
+def label_from_router_response(response: str, user_input: str) -> str:
     payload = safe_parse_json(response)
     label = payload.get("label", "general")
     normalized = normalize_intent(label)
 
     # Lightweight heuristic backup for robustness
-    text = user_input.lower()
     if normalized == "general":
-        if any(k in text for k in ["price", "demand", "selling", "market"]):
-            return "market_analysis"
-        if any(k in text for k in ["recommend", "buy", "best option", "suggest"]):
-            return "recommendation"
-        if any(k in text for k in ["emission", "offset", "co2", "impact"]):
-            return "emissions"
-        if any(k in text for k in ["explain", "what is", "theory", "sdg", "voluntary", "compliance"]):
-            return "theory"
-        if any(k in text for k in ["insight", "data", "project-specific", "trustworthy", "seller"]):
-            return "insights"
+        matches = keyword_labels(user_input)
+        if matches:
+            return matches[0]
     return normalized
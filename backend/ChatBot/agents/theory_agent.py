@@ -1,24 +1,35 @@
 # Theory and explanation agent
 
-from utils.data_store import get_theory
+from typing import Iterator, Optional
+
+from utils.theory_index import get_theory_index
 from utils.prompt_templates import THEORY_AGENT_SYSTEM
-from utils.helpers import llm_chat
+from utils.conversation_memory import fit_prompt
+from utils.helpers import llm_chat, llm_chat_stream
+from utils.session_store import Session
 
 
-def build_theory_context() -> str:
-    lines = []
-    theory = get_theory()
-    for key, value in theory.items():
-        lines.append(f"{key}: {value}")
-    return "\n".join(lines)
+def build_theory_context(user_input: str) -> str:
+    # Only the passages most relevant to the question, within the token budget
+    return "\n".join(get_theory_index().context(user_input))
 
 
-def answer_theory_question(user_input: str, session_context: str = "") -> str:
-    context = build_theory_context()
-    prompt = (
+def build_theory_prompt(user_input: str, session_context: str = "", footprint=None, context: Optional[str] = None) -> str:
+    if context is None:
+        context = build_theory_context(user_input)
+    return (
         "User question: " + user_input + "\n\n" +
         "Theory reference:\n" + context + "\n\n" +
         "User profile context:\n" + session_context +
         "\n\nAnswer clearly and simply."
     )
-    return llm_chat(THEORY_AGENT_SYSTEM, prompt)
+
+
+def answer_theory_question(user_input: str, session: Optional[Session] = None) -> str:
+    prompt = build_theory_prompt(user_input, session.context if session else "")
+    return llm_chat(THEORY_AGENT_SYSTEM, fit_prompt(session, THEORY_AGENT_SYSTEM, prompt))
+
+
+def stream_theory_question(user_input: str, session: Optional[Session] = None) -> Iterator[str]:
+    prompt = build_theory_prompt(user_input, session.context if session else "")
+    yield from llm_chat_stream(THEORY_AGENT_SYSTEM, fit_prompt(session, THEORY_AGENT_SYSTEM, prompt))
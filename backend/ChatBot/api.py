@@ -2,29 +2,75 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from flask_cors import CORS
+import io
+import json
+import logging
 import os
+import time
+from datetime import datetime
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 
-from agents.router_agent import route_intent
-from agents.market_agent import answer_market_question
-from agents.recommendation_agent import answer_recommendation_question
-from agents.emission_agent import answer_emission_question
-from agents.theory_agent import answer_theory_question
-from agents.insight_agent import answer_insight_question
+from agents.router_agent import is_confident
+from agents.pipeline import get_prefetch_stats, prepare_chat
+from agents.route_and_answer import route_and_answer
+from utils.catalog_query import CREDITS, SELLERS, query_listing, wants_page
+from utils.conversation_memory import get_conversation_memory, has_history, remember
 from utils.data_store import get_credits, get_sellers, get_users, get_theory, save_user_footprint, get_user_footprint
-from utils.helpers import get_groq_client
-from utils.db import seed_if_empty
+from utils.footprint_bulk import ingest_footprints, read_ndjson_lines
+from utils.footprint_history import PERIODS, SCOPES, get_footprint_history, get_rollups
+from utils.helpers import get_groq_client, get_token_usage, llm_chat, llm_chat_stream
+from utils.intent_classifier import classify_intent
+from utils.latency import get_latency_recorder
+from utils.llm_cache import get_llm_cache
+from utils.metrics import CONTENT_TYPE, finish_chat, record_stage, render_metrics, stage, start_chat
+from utils.db import run_migrations
+from utils.question_index import get_question_index
+from utils.session_store import get_session_store
+from utils.single_flight import get_flight_stats
+from utils.snapshot import get_snapshot, get_snapshot_store
+from utils.tracing import TRACE_HEADER, configure_logging, finish_trace, get_tracing_stats, record_exception, start_trace
+from utils.user_context_cache import get_user_context_cache
+from config import ROUTE_AND_ANSWER, SNAPSHOT_CHANGE_STREAM
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)
 
 
+@app.before_request
+def begin_trace():
+    rule = request.url_rule.rule if request.url_rule else request.path
+    g.trace = start_trace(f"{request.method} {rule}")
+
+
+@app.after_request
+def tag_trace(response):
+    trace = g.get("trace")
+    if trace is not None:
+        response.headers[TRACE_HEADER] = trace.trace_id
+        trace.attributes["status"] = response.status_code
+        # Handlers catch their own exceptions and answer 500
+        if response.status_code >= 500 and trace.error is None:
+            trace.error = f"HTTP {response.status_code}"
+        if response.is_streamed:
+            # Teardown runs before the body is generated; finish once it has been sent
+            response.call_on_close(lambda: finish_trace(trace))
+            g.trace = None
+    return response
+
+
+@app.teardown_request
+def end_trace(exc):
+    finish_trace(g.pop("trace", None), exc)
+
 
 def validate_dependencies():
     try:
         get_groq_client()
-        seed_if_empty()
+        run_migrations()
         return None
     except Exception as exc:
         return str(exc)
@@ -34,7 +80,37 @@ def validate_dependencies():
 def health():
     error = validate_dependencies()
     status = "ok" if error is None else "error"
-    return jsonify({"status": status, "details": error or "ready"})
+    cache = get_llm_cache()
+    questions = get_question_index()
+    user_contexts = get_user_context_cache()
+    conversations = get_conversation_memory()
+    tracing = get_tracing_stats()
+    flights = get_flight_stats()
+    return jsonify({
+        "status": status,
+        "details": error or "ready",
+        "llm_cache": cache.stats() if cache is not None else None,
+        "latency": get_latency_recorder().summary(),
+        "prefetch": get_prefetch_stats().stats(),
+        "tokens": get_token_usage().stats(),
+        "question_index": questions.stats() if questions is not None else None,
+        "user_context_cache": user_contexts.stats() if user_contexts is not None else None,
+        "sessions": get_session_store().stats(),
+        "conversation_memory": conversations.stats() if conversations is not None else None,
+        "tracing": tracing.stats() if tracing is not None else None,
+        "single_flight": flights.stats() if flights is not None else None,
+    })
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(render_metrics(), content_type=CONTENT_TYPE)
+
+
+def _chat_done(chat_metrics, started: float, intent: str) -> None:
+    elapsed = time.perf_counter() - started
+    get_latency_recorder().record("chat_total", elapsed * 1000)
+    finish_chat(chat_metrics, intent, elapsed)
 
 
 @app.route("/options", methods=["GET"])
@@ -89,7 +165,7 @@ def route_only():
     if not message:
         return jsonify({"error": "message is required"}), 400
 
-    print("Message received:", message)
+    logger.debug("Message received: %s", message)
 
     intent = "test"
     response = "Backend is connected successfully."
@@ -105,62 +181,176 @@ def route_only():
 
 @app.route("/chat", methods=["POST"])
 def chat():
+    started = time.perf_counter()
+    chat_metrics = None
     try:
         payload = request.get_json(silent=True) or {}
         message = (payload.get("message") or "").strip()
         role = (payload.get("role") or "").strip().lower()
         user_id = (payload.get("user_id") or "").strip()
 
-        print("CHAT HIT:", message, role, user_id)
-
         if not message:
             return jsonify({"error": "message is required"}), 400
-
-        # Optional session context including user info
-        session_context = ""
-        if role in {"buyer", "seller"}:
-            session_context = f"User role: {role}\n"
-        if user_id:
-            session_context += f"user_id: {user_id}\n"
-
-        # Detect intent
-        intent = route_intent(message)
-
-        # Route to correct agent
-        if intent == "recommendation":
-            response = answer_recommendation_question(message, session_context=session_context)
-        elif intent == "market_analysis":
-            response = answer_market_question(message)
-        elif intent == "emissions":
-            response = answer_emission_question(message, session_context=session_context)
-        elif intent == "theory":
-            response = answer_theory_question(message)
-        elif intent == "insights":
-            response = answer_insight_question(message)
-        else:
-            response = answer_market_question(message)
-
+        chat_metrics = start_chat()
+
+        # Role profile and prompt context are built on the session's first
+        # turn; later turns send back session_id and reuse them
+        with stage("session"):
+            session = get_session_store().resolve(payload.get("session_id"), role, user_id)
+
+        # A reworded repeat of an earlier question reuses its answer. Answers
+        # that may depend on the user's own footprint, or on earlier turns of
+        # the conversation, are never shared.
+        questions = get_question_index() if not session.user_id and not has_history(session) else None
+        if questions is not None:
+            data_version = get_snapshot().version
+            with stage("question_index"):
+                match = questions.lookup(message, scope=session.role)
+            if match is not None:
+                remember(session, message, match.answer)
+                _chat_done(chat_metrics, started, match.intent)
+                return jsonify({
+                    "intent": match.intent,
+                    "response": match.answer,
+                    "session_id": session.session_id
+                })
+
+        # Confident local routing already leaves a single LLM call, so only
+        # turns that would need the LLM router use the combined call
+        with stage("classify"):
+            prediction = classify_intent(message)
+        if ROUTE_AND_ANSWER and not is_confident(prediction):
+            routed = route_and_answer(message, session)
+            if routed is not None:
+                if questions is not None:
+                    questions.add(message, routed.intent, routed.answer, session.role, data_version)
+                remember(session, message, routed.answer)
+                _chat_done(chat_metrics, started, routed.intent)
+                return jsonify({
+                    "intent": routed.intent,
+                    "response": routed.answer,
+                    "session_id": session.session_id
+                })
+
+        # Detect intent and build the chosen agent's prompt; agent context is
+        # prefetched while an LLM router call is in flight
+        intent, agent, prompt = prepare_chat(message, session, prediction)
+        with stage("llm"):
+            response = llm_chat(agent.system_prompt, prompt)
+        if questions is not None:
+            questions.add(message, intent, response, session.role, data_version)
+        remember(session, message, response)
+
+        _chat_done(chat_metrics, started, intent)
         return jsonify({
             "intent": intent,
-            "response": response
+            "response": response,
+            "session_id": session.session_id
         })
 
     except Exception as e:
-        print("CHAT ERROR:", str(e))
-        import traceback
-        traceback.print_exc()
+        finish_chat(chat_metrics, "error", time.perf_counter() - started)
+        logger.exception("Chat request failed")
         return jsonify({"error": str(e)}), 500
 
 
 
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route("/chat/stream", methods=["POST"])
+def chat_stream():
+    """Same routing and prompt as /chat, answered as server-sent events.
+
+    Events: `intent` once routing is done, `token` for each streamed chunk,
+    then `done` with time-to-first-token and total latency (or `error`).
+    """
+    started = time.perf_counter()
+    payload = request.get_json(silent=True) or {}
+    message = (payload.get("message") or "").strip()
+    role = (payload.get("role") or "").strip().lower()
+    user_id = (payload.get("user_id") or "").strip()
+
+    if not message:
+        return jsonify({"error": "message is required"}), 400
+
+    session = get_session_store().resolve(payload.get("session_id"), role, user_id)
+    session_seconds = time.perf_counter() - started
+
+    def generate():
+        recorder = get_latency_recorder()
+        ttft_ms = None
+        chat_metrics = start_chat()
+        record_stage("session", session_seconds)
+        try:
+            intent, agent, prompt = prepare_chat(message, session)
+            yield sse_event("intent", {"intent": intent, "session_id": session.session_id})
+
+            chunks = []
+            with stage("llm"):
+                for text in llm_chat_stream(agent.system_prompt, prompt):
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - started) * 1000
+                        recorder.record("chat_stream_ttft", ttft_ms)
+                        record_stage("ttft", ttft_ms / 1000)
+                    chunks.append(text)
+                    yield sse_event("token", {"text": text})
+            remember(session, message, "".join(chunks))
+
+            total_ms = (time.perf_counter() - started) * 1000
+            recorder.record("chat_stream_total", total_ms)
+            finish_chat(chat_metrics, intent, total_ms / 1000)
+            yield sse_event("done", {"intent": intent, "session_id": session.session_id, "ttft_ms": round(ttft_ms or total_ms, 1), "total_ms": round(total_ms, 1)})
+        except Exception as e:
+            finish_chat(chat_metrics, "error", time.perf_counter() - started)
+            # The response is already 200 once streaming has started
+            record_exception(e)
+            logger.exception("Chat stream failed")
+            yield sse_event("error", {"error": str(e)})
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(stream_with_context(generate()), mimetype="text/event-stream", headers=headers)
+
+
+def _listing_page(listing, name: str, whole_collection):
+    # Without any paging or filter parameter, the original response: every document
+    if not wants_page(listing, request.args):
+        return jsonify({name: whole_collection()})
+    try:
+        page = query_listing(listing, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({name: page.items, "next_cursor": page.next_cursor})
+
+
 @app.route("/data/marketplace", methods=["GET"])
 def marketplace_data():
-    return jsonify({"marketplace": get_credits()})
+    """One page of marketplace credits.
+
+    Filters: `project_type`, `seller_id` and `sdg` (comma-separated, any of),
+    `min_price` / `max_price` and `min_demand` / `max_demand`. Paging and
+    shape: `sort` (credit_id, price_usd, demand_score or emissions_offset_tons;
+    prefix `-` for descending), `fields`, `limit` and `cursor` (the previous
+    page's `next_cursor`).
+
+    Without any of these parameters, every credit is returned as before,
+    without `next_cursor`.
+    """
+    return _listing_page(CREDITS, "marketplace", get_credits)
 
 
 @app.route("/data/sellers", methods=["GET"])
 def sellers_data():
-    return jsonify({"sellers": get_sellers()})
+    """One page of sellers, as a list in `sort` order.
+
+    Filters: `seller_id` and `verification_status` (comma-separated) and
+    `min_trust`. `sort` is seller_id, trust_score or past_sales_volume;
+    `fields`, `limit` and `cursor` work as for /data/marketplace. Without any
+    of these parameters, every seller is returned as before, as a dict keyed
+    by seller_id.
+    """
+    return _listing_page(SELLERS, "sellers", get_sellers)
 
 
 @app.route("/data/theory", methods=["GET"])
@@ -175,6 +365,7 @@ def save_footprint():
         payload = request.get_json(silent=True) or {}
         user_id = (payload.get("user_id") or "").strip()
         footprint_data = payload.get("footprint_data", {})
+        org_id = (payload.get("org_id") or "").strip() or None
 
         if not user_id:
             return jsonify({"error": "user_id is required"}), 400
@@ -182,20 +373,35 @@ def save_footprint():
         if not footprint_data:
             return jsonify({"error": "footprint_data is required"}), 400
 
-        result = save_user_footprint(user_id, footprint_data)
+        result = save_user_footprint(user_id, footprint_data, org_id)
         return jsonify({
             "status": "success",
             "message": "Footprint saved successfully",
             "data": result
         })
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        print("FOOTPRINT SAVE ERROR:", str(e))
-        import traceback
-        traceback.print_exc()
+        logger.exception("Footprint save failed")
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/footprint/bulk", methods=["POST"])
+def bulk_footprints():
+    """Upsert many footprints from an NDJSON body.
+
+    One `{"user_id": ..., "footprint_data": {...}}` object per line. The body
+    is read as it streams and the response is NDJSON too: one result per
+    record (`inserted`, `updated` or `error`), then a summary line.
+    """
+    # request.stream is unbuffered and its readline() reads a byte at a time
+    body = io.BufferedReader(request.stream, buffer_size=64 * 1024)
+    lines = read_ndjson_lines(body.readline)
+    results = (json.dumps(result) + "\n" for result in ingest_footprints(lines))
+    return Response(stream_with_context(results), mimetype="application/x-ndjson")
+
+
 @app.route("/footprint/get/<user_id>", methods=["GET"])
 def get_footprint(user_id: str):
     """Retrieve a user's saved carbon footprint."""
@@ -218,13 +424,57 @@ def get_footprint(user_id: str):
         })
 
     except Exception as e:
-        print("FOOTPRINT GET ERROR:", str(e))
-        import traceback
-        traceback.print_exc()
+        logger.exception("Footprint lookup failed")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/footprint/history/<user_id>", methods=["GET"])
+def footprint_history(user_id: str):
+    """A user's saved calculations in a time range.
+
+    Query parameters: `start` and `end` (ISO dates; start inclusive, end
+    exclusive) and `limit` (default 100, at most 1000).
+    """
+    try:
+        start = datetime.fromisoformat(request.args["start"]) if request.args.get("start") else None
+        end = datetime.fromisoformat(request.args["end"]) if request.args.get("end") else None
+        limit = min(max(int(request.args.get("limit", 100)), 1), 1000)
+    except ValueError as e:
+        return jsonify({"error": f"invalid query parameter: {e}"}), 400
+
+    try:
+        return jsonify({"status": "success", "data": get_footprint_history(user_id, start, end, limit)})
+    except Exception as e:
+        logger.exception("Footprint history lookup failed")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/footprint/rollups/<scope>/<key>", methods=["GET"])
+def footprint_rollups(scope: str, key: str):
+    """Monthly or yearly footprint rollups for a user or an organisation.
+
+    `scope` is `user` or `org`. Query parameters: `period` (`month` or `year`)
+    and inclusive `start` / `end` buckets such as `2026-01` or `2026`.
+    """
+    period = request.args.get("period", "month")
+    if scope not in SCOPES:
+        return jsonify({"error": f"scope must be one of {', '.join(SCOPES)}"}), 400
+    if period not in PERIODS:
+        return jsonify({"error": f"period must be one of {', '.join(PERIODS)}"}), 400
+
+    try:
+        rollups = get_rollups(scope, key, period, request.args.get("start"), request.args.get("end"))
+        return jsonify({"status": "success", "data": rollups})
+    except Exception as e:
+        logger.exception("Footprint rollups lookup failed")
         return jsonify({"error": str(e)}), 500
 
 
 if __name__ == "__main__":
+    # Seed once at startup; request handlers never check seeding
+    run_migrations()
+    if SNAPSHOT_CHANGE_STREAM:
+        get_snapshot_store().watch_changes()
     port = int(os.getenv("PORT", "8000"))
     app.run(host="127.0.0.1", port=port, debug=True, use_reloader=False)
 
@@ -0,0 +1,206 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import asyncio
+import logging
+import os
+import time
+
+from quart import Quart, Response, g, jsonify, request
+from quart_cors import cors
+
+from agents.registry import get_agent
+from agents.router_agent import aroute_intent
+from utils.conversation_memory import fit_prompt, has_history, remember
+from utils.async_data_store import get_user_footprint, get_user_footprint_safe, save_user_footprint
+from utils.db import run_migrations
+from utils.helpers import aclose_async_groq_client, allm_chat, get_async_groq_client
+from utils.metrics import CONTENT_TYPE, finish_chat, render_metrics, stage, start_chat
+from utils.question_index import get_question_index
+from utils.session_store import get_session_store
+from utils.snapshot import get_snapshot, get_snapshot_store
+from utils.tracing import TRACE_HEADER, configure_logging, finish_trace, start_trace
+
+# Async serving path for the chat routes: one process holds many in-flight chats
+# because Groq and Mongo calls await instead of blocking a worker thread.
+# Run with:  hypercorn api_async:app --bind 127.0.0.1:8001
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+app = cors(Quart(__name__))
+
+
+@app.before_request
+async def begin_trace():
+    # The request's task keeps this context; asyncio.to_thread carries it into threads
+    rule = request.url_rule.rule if request.url_rule else request.path
+    g.trace = start_trace(f"{request.method} {rule}")
+
+
+@app.after_request
+async def tag_trace(response):
+    trace = g.get("trace")
+    if trace is not None:
+        response.headers[TRACE_HEADER] = trace.trace_id
+        trace.attributes["status"] = response.status_code
+        if response.status_code >= 500 and trace.error is None:
+            trace.error = f"HTTP {response.status_code}"
+    return response
+
+
+@app.teardown_request
+async def end_trace(exc):
+    finish_trace(g.pop("trace", None), exc)
+
+
+@app.before_serving
+async def startup():
+    # Blocking startup work runs in a thread; afterwards the snapshot is
+    # refreshed by a background poller so requests never wait on it.
+    await asyncio.to_thread(run_migrations)
+    await asyncio.to_thread(get_snapshot_store().start_polling)
+
+
+@app.after_serving
+async def shutdown():
+    await aclose_async_groq_client()
+
+
+@app.route("/health", methods=["GET"])
+async def health():
+    try:
+        get_async_groq_client()
+        await asyncio.to_thread(run_migrations)
+        return jsonify({"status": "ok", "details": "ready"})
+    except Exception as exc:
+        return jsonify({"status": "error", "details": str(exc)})
+
+
+@app.route("/metrics", methods=["GET"])
+async def metrics():
+    return Response(render_metrics(), content_type=CONTENT_TYPE)
+
+
+@app.route("/chat", methods=["POST"])
+async def chat():
+    started = time.perf_counter()
+    chat_metrics = None
+    try:
+        payload = await request.get_json(silent=True) or {}
+        message = (payload.get("message") or "").strip()
+        role = (payload.get("role") or "").strip().lower()
+        user_id = (payload.get("user_id") or "").strip()
+
+        if not message:
+            return jsonify({"error": "message is required"}), 400
+        # Each request runs in its own task, so stage timings never mix
+        chat_metrics = start_chat()
+
+        # A known session is reused on the event loop; building one may read
+        # the profile store, so that runs in a thread
+        store = get_session_store()
+        with stage("session"):
+            session = store.reusable(payload.get("session_id"), role, user_id)
+            if session is None:
+                session = await asyncio.to_thread(store.resolve, payload.get("session_id"), role, user_id)
+
+        # Index lookups are sub-millisecond NumPy work, fine on the event loop
+        questions = get_question_index() if not session.user_id and not has_history(session) else None
+        if questions is not None:
+            data_version = get_snapshot().version
+            with stage("question_index"):
+                match = questions.lookup(message, scope=session.role)
+            if match is not None:
+                remember(session, message, match.answer)
+                finish_chat(chat_metrics, match.intent, time.perf_counter() - started)
+                return jsonify({"intent": match.intent, "response": match.answer, "session_id": session.session_id})
+
+        with stage("route"):
+            intent = await aroute_intent(message)
+        agent = get_agent(intent)
+
+        with stage("context"):
+            context = agent.build_context(message)
+        if agent.personalized:
+            with stage("footprint"):
+                footprint = await get_user_footprint_safe(session.user_id, message)
+            prompt = agent.build_prompt(message, session.context, footprint, context=context)
+        else:
+            prompt = agent.build_prompt(message, context=context)
+        prompt = fit_prompt(session, agent.system_prompt, prompt)
+        with stage("llm"):
+            response = await allm_chat(agent.system_prompt, prompt)
+        if questions is not None:
+            questions.add(message, intent, response, session.role, data_version)
+        # Older turns are summarized by background threads, never on the event loop
+        remember(session, message, response)
+
+        finish_chat(chat_metrics, intent, time.perf_counter() - started)
+        return jsonify({
+            "intent": intent,
+            "response": response,
+            "session_id": session.session_id
+        })
+
+    except Exception as e:
+        finish_chat(chat_metrics, "error", time.perf_counter() - started)
+        logger.exception("Chat request failed")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/footprint/save", methods=["POST"])
+async def save_footprint():
+    """Save a user's carbon footprint calculation."""
+    try:
+        payload = await request.get_json(silent=True) or {}
+        user_id = (payload.get("user_id") or "").strip()
+        footprint_data = payload.get("footprint_data", {})
+        org_id = (payload.get("org_id") or "").strip() or None
+
+        if not user_id:
+            return jsonify({"error": "user_id is required"}), 400
+
+        if not footprint_data:
+            return jsonify({"error": "footprint_data is required"}), 400
+
+        result = await save_user_footprint(user_id, footprint_data, org_id)
+        return jsonify({
+            "status": "success",
+            "message": "Footprint saved successfully",
+            "data": result
+        })
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.exception("Footprint save failed")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/footprint/get/<user_id>", methods=["GET"])
+async def get_footprint(user_id: str):
+    """Retrieve a user's saved carbon footprint."""
+    try:
+        footprint = await get_user_footprint(user_id)
+
+        if not footprint:
+            return jsonify({
+                "status": "not_found",
+                "message": "No footprint found for this user",
+                "data": None
+            })
+
+        return jsonify({
+            "status": "success",
+            "data": footprint
+        })
+
+    except Exception as e:
+        logger.exception("Footprint lookup failed")
+        return jsonify({"error": str(e)}), 500
+
+
+if __name__ == "__main__":
+    port = int(os.getenv("ASYNC_PORT", "8001"))
+    app.run(host="127.0.0.1", port=port, debug=False, use_reloader=False)
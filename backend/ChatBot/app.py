@@ -7,8 +7,10 @@ from agents.emission_agent import answer_emission_question
 from agents.theory_agent import answer_theory_question
 from agents.insight_agent import answer_insight_question
 from utils.helpers import get_groq_client
-from utils.db import seed_if_empty
-from utils.data_store import get_session_profile
+from utils.db import run_migrations
+from utils.conversation_memory import remember
+from utils.entity_extractor import extract
+from utils.session_store import Session, build_profile_session
 
 DATA_MISSING_MODE = False
 
@@ -37,22 +39,12 @@ FEATURE_ALIASES = {
     "4": "esg_report",
 }
 
-FEATURE_KEYWORDS = {
-    "retire_credits": ["retire", "retirement", "offset", "offsetting", "offset emissions"],
-    "certificate_auth": ["certificate", "authenticate", "verification", "verify", "validate"],
-    "carbon_footprint": ["footprint", "calculate emissions", "emissions calculator", "carbon calculator"],
-    "esg_report": ["esg", "report", "sustainability report", "esg reporting"],
-}
-
-
 def detect_feature_intent(user_input: str):
     text = user_input.lower().strip()
     if text in FEATURE_ALIASES:
         return FEATURE_ALIASES[text]
-    for feature_key, keywords in FEATURE_KEYWORDS.items():
-        if any(k in text for k in keywords):
-            return feature_key
-    return None
+    features = extract(text).features
+    return features[0] if features else None
 
 
 def feature_response(feature_key: str) -> str:
@@ -88,79 +80,25 @@ def is_thanks_message(user_input: str) -> bool:
     return any(k in text for k in ["thanks", "thank you", "appreciate it", "thx"])
 
 
-def derive_buyer_state(profile: dict) -> str:
-    has_retired = profile.get("credits_retired", 0) > 0
-    has_target = bool(profile.get("net_zero_target_year"))
-    annual_emissions = profile.get("annual_emissions", 0)
-
-    if has_retired and has_target and annual_emissions >= 3000:
-        return (
-            "You have a clear net-zero target and have already retired credits, "
-            "but your emissions scale suggests you will benefit from consistent, high-quality offsets."
-        )
-    if has_retired and has_target:
-        return (
-            "You have a net-zero target and prior retirements, which puts you in a strong position "
-            "to optimize for quality and verification."
-        )
-    if has_target:
-        return (
-            "You have a net-zero target in place, so the next step is aligning purchases to credible "
-            "credits and measurable impact."
-        )
-    return (
-        "You are early in your offset journey, so establishing a baseline and selecting verified credits "
-        "will provide the most value."
-    )
-
-
-def build_session_context(role: str, profile: dict) -> str:
-    if role == "buyer":
-        buyer_state = derive_buyer_state(profile)
-        return (
-            "User role: Buyer\n"
-            f"Company: {profile.get('company')} in {profile.get('industry')} based in {profile.get('location')}.\n"
-            f"ESG maturity: {profile.get('esg_maturity')}.\n"
-            f"Buyer state: {buyer_state}\n"
-            "Personalization guidance: Reference marketplace quality, seller trust, and credit availability. "
-            "Keep the tone advisory and business-friendly."
-        )
-
-    return (
-        "User role: Seller\n"
-        f"Organization: {profile.get('organization')} with {profile.get('project_type')} projects.\n"
-        f"Verification standard: {profile.get('verification_standard')}. "
-        f"Trust score: {profile.get('trust_score')}.\n"
-        f"Market demand: {profile.get('market_demand')}.\n"
-        "Personalization guidance: Reference buyer demand, emissions trends, and offset potential. "
-        "Keep the tone advisory and business-friendly."
-    )
-
-
-def load_profile_for_role(role: str) -> dict:
-    profile = get_session_profile(role)
-    return dict(profile)
-
-
 def has_missing_profile_data(profile: dict) -> bool:
     required_fields = ["role"]
     return any(profile.get(field) in {None, ""} for field in required_fields)
 
 
-def handle_query(user_input: str, session_context: str) -> str:
+def handle_query(user_input: str, session: Session) -> str:
     intent = route_intent(user_input)
     if intent == "market_analysis":
-        return answer_market_question(user_input, session_context)
+        return answer_market_question(user_input, session)
     if intent == "recommendation":
-        return answer_recommendation_question(user_input, session_context)
+        return answer_recommendation_question(user_input, session)
     if intent == "emissions":
-        return answer_emission_question(user_input, session_context)
+        return answer_emission_question(user_input, session)
     if intent == "theory":
-        return answer_theory_question(user_input, session_context)
+        return answer_theory_question(user_input, session)
     if intent == "insights":
-        return answer_insight_question(user_input, session_context)
+        return answer_insight_question(user_input, session)
     # Fallback: treat general as market + recommendation blend
-    return answer_market_question(user_input, session_context)
+    return answer_market_question(user_input, session)
 
 
 def prompt_for_role() -> str:
@@ -177,22 +115,22 @@ def main():
     try:
         # Validate Groq client early for clear errors
         get_groq_client()
-        seed_if_empty()
+        run_migrations()
     except Exception as exc:
         print(f"Configuration error: {exc}")
         print("Set GROQ_API_KEY and MONGODB_URI in your environment before running.")
         sys.exit(1)
 
     role = prompt_for_role()
-    profile = load_profile_for_role(role)
+    # The CLI runs one session per process with the role's demo profile, so it is built directly
+    session = build_profile_session("cli", role)
 
-    if DATA_MISSING_MODE and has_missing_profile_data(profile):
+    if DATA_MISSING_MODE and has_missing_profile_data(session.profile):
         print(
             "Some profile data appears missing. I can still help with general guidance or "
             "guide you to generate the missing data."
         )
 
-    session_context = build_session_context(role, profile)
     print(FEATURE_MENU)
 
     while True:
@@ -213,7 +151,8 @@ def main():
             continue
 
         try:
-            response = handle_query(user_input, session_context)
+            response = handle_query(user_input, session)
+            remember(session, user_input, response)
             print("\nAssistant:\n" + response)
         except Exception as exc:
             print("\nAssistant:\nSorry, I ran into an error.")
@@ -0,0 +1,197 @@
+# Load test: sync Flask /chat vs the async Quart /chat against a fake LLM server
+#
+# Needs a reachable MongoDB for the catalog snapshot (use a scratch database):
+#   MONGODB_URI=mongodb://localhost:27017 MONGODB_DB_NAME=bench_chatbot \
+#     python -m bench.bench_async_load --concurrency 200 --requests 2000 --llm-latency-ms 300
+#
+# The fake LLM server and both app servers run as separate processes so the load
+# generator does not share a GIL with them. Flask is served by a bounded thread
+# pool (--flask-threads), like a threaded gunicorn worker.
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from httpx_aiohttp import HttpxAiohttpClient
+
+from bench.common import CHATBOT_DIR, latency_summary
+
+MESSAGES = [
+    "which credits have the highest demand",
+    "recommend credits for my startup",
+    "how much co2 do 10 credits of CR-003 offset",
+    "what is sdg 13",
+    "which sellers are most trustworthy",
+]
+
+
+def serve_wsgi(app, port: int, threads: int) -> None:
+    """Serve a WSGI app from a bounded thread pool, like a threaded gunicorn worker."""
+    import logging
+
+    from werkzeug.serving import BaseWSGIServer
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    class PooledWSGIServer(BaseWSGIServer):
+        multithread = True
+
+        def __init__(self, host, port, app, threads):
+            super().__init__(host, port, app)
+            self.pool = ThreadPoolExecutor(max_workers=threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._process, request, client_address)
+
+        def _process(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    PooledWSGIServer("127.0.0.1", port, app, threads).serve_forever()
+
+
+def serve_flask(port: int, threads: int) -> None:
+    import api
+    from utils.db import run_migrations
+
+    run_migrations()
+    serve_wsgi(api.app, port, threads)
+
+
+def serve_async(port: int) -> None:
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    import api_async
+
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.accesslog = None
+    config.errorlog = None
+
+    async def run():
+        # Shut down cleanly on terminate() so after_serving hooks close the client pools
+        stop = asyncio.Event()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        await serve(api_async.app, config, shutdown_trigger=stop.wait)
+
+    asyncio.run(run())
+
+
+def spawn(args, env) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m"] + args, cwd=CHATBOT_DIR, env=env)
+
+
+def wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not become ready")
+
+
+async def drive(base_url: str, concurrency: int, total: int):
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(MESSAGES[i % len(MESSAGES)])
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    # aiohttp transport: httpx's default async pool would bottleneck the load generator itself
+    async with HttpxAiohttpClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                message = queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/chat", json={"message": message, "role": "buyer"})
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append((time.perf_counter() - start) * 1000)
+                errors += not ok
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "requests_per_sec": round(total / elapsed, 1),
+        "latency": latency_summary(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test sync vs async /chat")
+    parser.add_argument("--serve", choices=["flask", "async"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--flask-threads", type=int, default=16)
+    parser.add_argument("--llm-port", type=int, default=18808)
+    parser.add_argument("--flask-port", type=int, default=18000)
+    parser.add_argument("--async-port", type=int, default=18001)
+    args = parser.parse_args()
+
+    if args.serve == "flask":
+        serve_flask(args.port, args.flask_threads)
+        return
+    if args.serve == "async":
+        serve_async(args.port)
+        return
+
+    env = dict(os.environ)
+    env.update({
+        "GROQ_API_KEY": env.get("GROQ_API_KEY") or "fake-key",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{args.llm_port}",
+        "GROQ_MAX_CONNECTIONS": str(max(args.concurrency, 20)),
+        # Every request should reach the (fake) LLM
+        "LLM_CACHE_ENABLED": "false",
+    })
+
+    processes = [spawn(["bench.fake_groq_server", "--port", str(args.llm_port),
+                        "--latency-ms", str(args.llm_latency_ms)], env)]
+    results = {}
+    try:
+        processes.append(spawn(["bench.bench_async_load", "--serve", "flask", "--port", str(args.flask_port),
+                                "--flask-threads", str(args.flask_threads)], env))
+        processes.append(spawn(["bench.bench_async_load", "--serve", "async", "--port", str(args.async_port)], env))
+        for name, port in (("flask", args.flask_port), ("async", args.async_port)):
+            base_url = f"http://127.0.0.1:{port}"
+            wait_ready(base_url + "/health")
+            asyncio.run(drive(base_url, min(args.concurrency, 10), 50))  # warm up
+            results[name] = asyncio.run(drive(base_url, args.concurrency, args.requests))
+        results["flask"]["threads"] = args.flask_threads
+        results["llm_latency_ms"] = args.llm_latency_ms
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# Prompt size per turn: full verbatim history vs recent turns plus a rolling summary
+#
+# Usage (from backend/ChatBot):
+#   python -m bench.bench_conversation_memory --conversations 100 --turns 30 --summary-latency-ms 300
+#
+# Conversations are interleaved round-robin, like concurrent chats. Each turn
+# has an agent prompt of --prompt-tokens (estimated) and an answer of up to
+# the completion limit. "verbatim" appends every earlier turn to the prompt;
+# "memory" goes through utils/conversation_memory.py with a stand-in
+# summarizer that sleeps --summary-latency-ms, so folds lag behind the turns.
+# Every fitted prompt must stay under the ceiling, keep the question as its
+# first line and include the previous turn's question. Recording a turn is
+# timed, to show the summary call stays off the request path.
+
+import argparse
+import json
+import random
+import sys
+import time
+
+import bench.common  # noqa: F401  (adds backend/ChatBot to sys.path)
+from bench.common import latency_summary
+
+from config import MAX_TOKENS
+from utils.conversation_memory import ConversationMemory, render_history, with_history
+from utils.tokens import CHARS_PER_TOKEN, estimate_tokens
+
+SYSTEM_PROMPT = "You are a carbon market analyst.\nUse the data provided to answer concisely."
+WORDS = "credit offset verified seller price demand retire project forestry methane solar trust buyer tons".split()
+
+
+def text(rng, tokens):
+    words = []
+    while len(" ".join(words)) < tokens * CHARS_PER_TOKEN:
+        words.append(rng.choice(WORDS))
+    return " ".join(words)
+
+
+def agent_prompt(rng, question, tokens):
+    return "User question: " + question + "\n\nMarket context:\n" + text(rng, tokens) + "\n\nAnswer with data."
+
+
+def stand_in_summary(delay_s, summary_tokens):
+    def summarize(summary, turns):
+        time.sleep(delay_s)
+        merged = " ".join(filter(None, [summary, *("Asked " + t.question for t in turns)]))
+        return merged[-summary_tokens * CHARS_PER_TOKEN:]
+    return summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark token-bounded conversation memory")
+    parser.add_argument("--conversations", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--prompt-tokens", type=int, default=1200)
+    parser.add_argument("--ceiling", type=int, default=3000)
+    parser.add_argument("--recent-turns", type=int, default=4)
+    parser.add_argument("--summary-tokens", type=int, default=250)
+    parser.add_argument("--summary-latency-ms", type=float, default=300.0)
+    args = parser.parse_args()
+
+    rng = random.Random(21)
+    memory = ConversationMemory(
+        args.conversations * 2, 3600, args.recent_turns, args.summary_tokens, args.ceiling,
+        summarize=stand_in_summary(args.summary_latency_ms / 1000.0, args.summary_tokens),
+    )
+    history = {c: [] for c in range(args.conversations)}
+    verbatim_tokens, memory_tokens, fit_ms, record_ms, failures = [], [], [], [], []
+
+    for turn in range(args.turns):
+        for c in range(args.conversations):
+            session_id = f"conversation-{c}"
+            question = f"Turn {turn} of conversation {c}: {text(rng, 12)}?"
+            prompt = agent_prompt(rng, question, args.prompt_tokens)
+
+            # Everything said so far, as a naive implementation would send it
+            naive = with_history(prompt, render_history("", history[c], 10 ** 9))
+            verbatim_tokens.append(estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(naive))
+
+            start = time.perf_counter()
+            fitted = memory.fit(session_id, SYSTEM_PROMPT, prompt)
+            fit_ms.append((time.perf_counter() - start) * 1000)
+            tokens = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(fitted)
+            memory_tokens.append(tokens)
+            if tokens > args.ceiling or not fitted.startswith(prompt.split("\n", 1)[0] + "\n"):
+                failures.append((session_id, turn, "ceiling or first line"))
+            if history[c] and history[c][-1].question not in fitted:
+                failures.append((session_id, turn, "previous question missing"))
+
+            answer = text(rng, rng.randint(50, MAX_TOKENS))
+            start = time.perf_counter()
+            memory.record(session_id, question, answer)
+            record_ms.append((time.perf_counter() - start) * 1000)
+            history[c].append(memory.entries.peek(session_id).recent[-1])
+
+    per_turn = lambda samples: [max(samples[t * args.conversations:(t + 1) * args.conversations]) for t in range(args.turns)]
+    results = {
+        "turns": len(memory_tokens),
+        "verbatim_prompt_tokens": {"max": max(verbatim_tokens), "last_turn_max": per_turn(verbatim_tokens)[-1]},
+        "memory_prompt_tokens": {"max": max(memory_tokens), "last_turn_max": per_turn(memory_tokens)[-1],
+                                 "ceiling": args.ceiling},
+        "max_prompt_tokens_by_turn": {"verbatim": per_turn(verbatim_tokens), "memory": per_turn(memory_tokens)},
+        "fit": latency_summary(fit_ms),
+        "record": latency_summary(record_ms),
+        "memory": memory.stats(),
+        "failures": failures[:5],
+    }
+    print(json.dumps(results, indent=2))
+    if failures:
+        print(f"{len(failures)} fitted prompts broke the ceiling or lost the previous turn", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
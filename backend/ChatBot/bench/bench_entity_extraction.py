@@ -0,0 +1,145 @@
+# Per-message keyword and credit-ID extraction: keyword loops vs the compiled extractor
+#
+# Usage (from backend/ChatBot):
+#   python -m bench.bench_entity_extraction
+#   python -m bench.bench_entity_extraction --catalog-sizes 10 1000 100000 --rounds 5
+#
+# Messages come from the router and paraphrase fixtures, plus as many generated
+# ones that name a credit (in either case) and a quantity. The previous implementations are
+# copied below as the reference: `any(k in text ...)` per keyword table, and a
+# loop over every credit that lower-cases its ID. Before timing, the bench
+# checks that utils/entity_extractor.py returns the same intents, feature,
+# profile, quantity and credit for every message. Extraction is timed without
+# its per-message cache, so each message pays the full scan.
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+
+from bench.common import latency_summary, load_jsonl
+
+from utils.entity_extractor import FEATURE_KEYWORDS, INTENT_KEYWORDS, PROFILE_KEYWORDS, extract, mentioned_credits
+from utils.snapshot import MarketplaceSnapshot
+
+TEMPLATES = [
+    "How much CO2 do {n} credits of {id} offset?",
+    "Is {id} a good buy for my company? Thinking of {n} tons",
+    "compare {id} with the market price, we need {n} credits",
+    "Our NGO wants to retire {n} credits from {id}",
+]
+
+
+def old_keyword_labels(text):
+    text = text.lower()
+    return [label for label, keywords in INTENT_KEYWORDS.items() if any(k in text for k in keywords)]
+
+
+def old_feature(text):
+    text = text.lower().strip()
+    for feature_key, keywords in FEATURE_KEYWORDS.items():
+        if any(k in text for k in keywords):
+            return feature_key
+    return None
+
+
+def old_profile(text):
+    text = text.lower()
+    for profile, keywords in PROFILE_KEYWORDS.items():
+        if any(k in text for k in keywords):
+            return profile
+    return "startup"
+
+
+def old_quantity(text):
+    match = re.search(r"(\d+)\s*(credits|credit|tons|ton)", text.lower())
+    return int(match.group(1)) if match else 1
+
+
+def old_credit(text, credits):
+    for c in credits:
+        if c["credit_id"].lower() in text.lower():
+            return c
+    return None
+
+
+def old_extract(text, credits):
+    return (old_keyword_labels(text), old_feature(text), old_profile(text), old_quantity(text), old_credit(text, credits))
+
+
+def new_extract(text, snapshot):
+    entities = extract(text)
+    named = mentioned_credits(text, snapshot)
+    return (
+        list(entities.intents),
+        entities.features[0] if entities.features else None,
+        entities.profiles[0] if entities.profiles else "startup",
+        entities.quantity or 1,
+        named[0] if named else None,
+    )
+
+
+def catalog(n):
+    # Fixed-width IDs, so no ID is a substring of another
+    return [{"credit_id": f"CR-{i:06d}", "emissions_offset_tons": 100} for i in range(n)]
+
+
+def messages(credits, rng):
+    base = [row["message"] for row in load_jsonl("router_labelled.jsonl")]
+    for group in load_jsonl("question_paraphrases.jsonl"):
+        base.extend([group["question"], *group["paraphrases"], *group["distinct"]])
+    named = []
+    for i in range(len(base)):
+        credit_id = rng.choice(credits)["credit_id"]
+        named.append(rng.choice(TEMPLATES).format(id=credit_id.lower() if i % 2 else credit_id, n=rng.randint(1, 500)))
+    return base + named
+
+
+def time_per_message(run, texts, rounds, cold=False):
+    samples = []
+    for _ in range(rounds):
+        for text in texts:
+            if cold:
+                extract.cache_clear()
+            start = time.perf_counter()
+            run(text)
+            samples.append((time.perf_counter() - start) * 1000)
+    return latency_summary(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-message keyword and credit-ID extraction")
+    parser.add_argument("--catalog-sizes", type=int, nargs="+", default=[10, 1_000, 10_000, 100_000])
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    results = {"catalogs": {}}
+    for size in args.catalog_sizes:
+        credits = catalog(size)
+        snapshot = MarketplaceSnapshot(1, credits, {}, {}, {})
+        texts = messages(credits, rng)
+
+        mismatched = [t for t in texts if old_extract(t, credits) != new_extract(t, snapshot)]
+        if mismatched:
+            print(f"catalog {size}: extractor differs from the keyword loops on {len(mismatched)} messages, "
+                  f"e.g. {mismatched[:3]}", file=sys.stderr)
+            sys.exit(1)
+
+        old = time_per_message(lambda t: old_extract(t, credits), texts, args.rounds)
+        new = time_per_message(lambda t: new_extract(t, snapshot), texts, args.rounds, cold=True)
+        cached = time_per_message(lambda t: new_extract(t, snapshot), texts, args.rounds)
+        results["catalogs"][str(size)] = {
+            "messages": len(texts),
+            "keyword_loops": old,
+            "extractor": new,
+            "extractor_cached": cached,
+            "speedup_p50": round(old["p50_ms"] / new["p50_ms"], 1) if new["p50_ms"] else None,
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
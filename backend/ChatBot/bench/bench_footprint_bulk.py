@@ -0,0 +1,243 @@
+# Footprint ingestion throughput: per-record saves vs the /footprint/bulk NDJSON endpoint
+#
+# Usage (from backend/ChatBot):
+#   python -m bench.bench_footprint_bulk --records 50000 --rtt-ms 0.5
+#   MONGODB_URI=mongodb://localhost:27017 python -m bench.bench_footprint_bulk --records 50000
+#
+# Without MONGODB_URI the bench uses a dict-backed stand-in for the
+# footprint collections. It sleeps --rtt-ms once per command to model the
+# network round trip, which is what bulk writes save. With MONGODB_URI it
+# writes to the --db-name scratch database, never MONGODB_DB_NAME; the
+# application's database is refused.
+#
+# Before reporting, the bench checks that bulk ingestion stores the same
+# documents as per-record saves. It also measures peak Python memory of the
+# ingestion pipeline, with writes discarded, at two upload sizes.
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import bench.common  # noqa: F401  (adds backend/ChatBot to sys.path)
+from bench.common import use_scratch_database
+
+SECTORS = ["transport", "energy", "food", "waste", "travel"]
+
+
+class MemoryFootprints:
+    """The slice of the user_footprints collection API used by the save paths, keyed by user_id."""
+
+    def __init__(self, rtt_ms: float = 0.0):
+        self.docs = {}
+        self._delay = rtt_ms / 1000.0
+
+    def _round_trip(self):
+        if self._delay:
+            time.sleep(self._delay)
+
+    def _upsert(self, user_id, fields):
+        inserted = user_id not in self.docs
+        self.docs.setdefault(user_id, {}).update(fields)
+        return inserted
+
+    def update_one(self, query, update, upsert=False):
+        self._round_trip()
+        self._upsert(query["user_id"], update["$set"])
+
+    def find_one(self, query, projection=None):
+        self._round_trip()
+        doc = self.docs.get(query["user_id"])
+        return dict(doc, _id=query["user_id"]) if doc is not None else None
+
+    def find_one_and_update(self, query, update, upsert=False, projection=None, return_document=None):
+        self._round_trip()
+        self._upsert(query["user_id"], update["$set"])
+        return dict(self.docs[query["user_id"]])
+
+    def bulk_write(self, operations, ordered=True):
+        self._round_trip()
+        upserted = {}
+        for i, op in enumerate(operations):
+            user_id = op._filter["user_id"]
+            if self._upsert(user_id, op._doc["$set"]):
+                upserted[i] = user_id
+        return SimpleNamespace(upserted_ids=upserted)
+
+    def delete_many(self, query):
+        self.docs.clear()
+
+    def find(self, query=None, projection=None):
+        return [dict(doc) for doc in self.docs.values()]
+
+
+class CountingCollection:
+    """footprint_history / footprint_rollups stand-in: one round trip per call, nothing stored."""
+
+    def __init__(self, rtt_ms: float = 0.0):
+        self.writes = 0
+        self._delay = rtt_ms / 1000.0
+
+    def _write(self, items):
+        if self._delay:
+            time.sleep(self._delay)
+        self.writes += len(items)
+        return SimpleNamespace(upserted_ids={})
+
+    def insert_one(self, document):
+        return self._write([document])
+
+    def insert_many(self, documents, ordered=True):
+        return self._write(documents)
+
+    def bulk_write(self, operations, ordered=True):
+        return self._write(operations)
+
+
+def memory_db(rtt_ms: float):
+    return SimpleNamespace(
+        user_footprints=MemoryFootprints(rtt_ms),
+        footprint_history=CountingCollection(rtt_ms),
+        footprint_rollups=CountingCollection(rtt_ms),
+    )
+
+
+def discard_db():
+    # Keeps nothing, so only the pipeline's own memory is measured
+    return SimpleNamespace(
+        user_footprints=CountingCollection(),
+        footprint_history=CountingCollection(),
+        footprint_rollups=CountingCollection(),
+    )
+
+
+def footprint_records(n: int, seed: int = 9):
+    rng = random.Random(seed)
+    for i in range(n):
+        total = round(rng.uniform(1, 40), 2)
+        yield {
+            "user_id": f"employee-{i}",
+            "footprint_data": {
+                "totalEmissions": total,
+                "dominantSector": rng.choice(SECTORS),
+                "suggestedCredits": round(total),
+                "treeEquivalent": round(total * 45),
+                "breakdown": [
+                    {"name": s, "value": round(total / 5, 2), "percentage": 20.0} for s in SECTORS
+                ],
+                "mode": "individual",
+            },
+        }
+
+
+def ndjson_lines(n: int):
+    for record in footprint_records(n):
+        yield (json.dumps(record) + "\n").encode("utf-8")
+
+
+def update_then_find(collection, user_id, footprint_data):
+    # The previous save_user_footprint: update_one, then a separate find_one
+    footprint_data["user_id"] = user_id
+    collection.update_one({"user_id": user_id}, {"$set": footprint_data}, upsert=True)
+    saved = collection.find_one({"user_id": user_id})
+    return {k: v for k, v in saved.items() if k != "_id"}
+
+
+def save_user_footprint(collection, user_id, footprint_data):
+    # The current save path: find_one_and_update, then history and rollup writes
+    from utils.data_store import save_user_footprint
+    return save_user_footprint(user_id, footprint_data)
+
+
+def stored(collection):
+    return {doc["user_id"]: {k: v for k, v in doc.items() if k not in ("_id", "timestamp")}
+            for doc in collection.find({}, {"_id": 0})}
+
+
+def peak_ingest_memory(n: int, batch_size: int) -> int:
+    from utils.footprint_bulk import ingest_footprints
+
+    tracemalloc.start()
+    for _ in ingest_footprints(ndjson_lines(n), batch_size, db=discard_db()):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk footprint ingestion")
+    parser.add_argument("--records", type=int, default=50_000)
+    parser.add_argument("--per-record", type=int, default=5_000,
+                        help="records for the per-record save paths")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--rtt-ms", type=float, default=0.5,
+                        help="simulated round trip per command (stand-in only)")
+    parser.add_argument("--db-name", default="chatbot_bench_footprint_bulk",
+                        help="scratch database used with MONGODB_URI; its footprints are deleted")
+    args = parser.parse_args()
+
+    if os.getenv("MONGODB_URI"):
+        use_scratch_database(args.db_name)
+
+    # Settings are read when config is imported
+    os.environ["FOOTPRINT_BULK_BATCH_SIZE"] = str(args.batch_size)
+    import api
+    from utils import data_store, footprint_bulk
+
+    if os.getenv("MONGODB_URI"):
+        from utils.db import get_db
+        collection = get_db().user_footprints
+        args.rtt_ms = None
+    else:
+        db = memory_db(args.rtt_ms)
+        collection = db.user_footprints
+        footprint_bulk.get_db = data_store.get_db = lambda: db
+
+    results = {"records": args.records, "batch_size": args.batch_size, "rtt_ms": args.rtt_ms}
+    for name, save in (("update_then_find", update_then_find), ("save_user_footprint", save_user_footprint)):
+        collection.delete_many({})
+        start = time.perf_counter()
+        for record in footprint_records(args.per_record):
+            save(collection, record["user_id"], record["footprint_data"])
+        elapsed = time.perf_counter() - start
+        results[name] = {"records": args.per_record, "records_per_s": round(args.per_record / elapsed, 1)}
+    per_record_docs = stored(collection)
+
+    client = api.app.test_client()
+    body = b"".join(ndjson_lines(args.records))
+    collection.delete_many({})
+    start = time.perf_counter()
+    response = client.post("/footprint/bulk", input_stream=io.BytesIO(body),
+                           content_type="application/x-ndjson",
+                           headers={"Content-Length": str(len(body))})
+    lines = response.get_data().splitlines()
+    elapsed = time.perf_counter() - start
+    summary = json.loads(lines[-1])["summary"]
+    results["bulk_endpoint"] = {"records_per_s": round(args.records / elapsed, 1), "summary": summary}
+
+    bulk_docs = stored(collection)
+    mismatched = [uid for uid, doc in per_record_docs.items() if bulk_docs.get(uid) != doc]
+    if summary["failed"] or len(lines) - 1 != args.records or mismatched:
+        print(f"Bulk ingestion differs from per-record saves: {mismatched[:5]}", file=sys.stderr)
+        sys.exit(1)
+    collection.delete_many({})
+
+    for name in ("update_then_find", "save_user_footprint"):
+        results[f"bulk_speedup_vs_{name}"] = round(
+            results["bulk_endpoint"]["records_per_s"] / results[name]["records_per_s"], 1)
+    small = args.records // 10
+    results["pipeline_peak_memory_bytes"] = {
+        str(small): peak_ingest_memory(small, args.batch_size),
+        str(args.records): peak_ingest_memory(args.records, args.batch_size),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
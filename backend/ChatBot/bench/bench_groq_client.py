@@ -0,0 +1,83 @@
+# Benchmark Groq client reuse and retries against the local fake server
+#
+# Usage (from backend/ChatBot):
+#   python -m bench.bench_groq_client --calls 200 --threads 8 --latency-ms 20
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.common import latency_summary, point_groq_at
+from bench.fake_groq_server import FakeGroqServer
+
+
+def timed_calls(fn, calls: int, threads: int):
+    latencies = []
+
+    def one(_):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(calls)))
+    elapsed = time.perf_counter() - start
+    return {"calls_per_sec": round(calls / elapsed, 1), "latency": latency_summary(latencies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Groq client reuse and retries")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    server = FakeGroqServer(latency_ms=args.latency_ms).start()
+    point_groq_at(server.base_url)
+    # Measure the transport, not the response cache
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+
+    from groq import Groq
+    from config import GROQ_API_KEY, GROQ_MAX_CONNECTIONS
+    from utils.helpers import close_groq_client, llm_chat
+
+    def fresh_client_call():
+        # Previous behaviour: a new client (and connection pool) per call
+        client = Groq(api_key=GROQ_API_KEY, base_url=server.base_url)
+        client.chat.completions.create(
+            model="llama-3.1-8b-instant",
+            messages=[{"role": "user", "content": "ping"}],
+        )
+        client.close()
+
+    results = {}
+    server.reset_counters()
+    results["client_per_call"] = timed_calls(fresh_client_call, args.calls, args.threads)
+    results["client_per_call"]["server"] = server.stats()
+
+    server.reset_counters()
+    results["shared_client"] = timed_calls(lambda: llm_chat("system", "ping"), args.calls, args.threads)
+    results["shared_client"]["server"] = server.stats()
+    results["shared_client"]["max_connections"] = GROQ_MAX_CONNECTIONS
+
+    # Retry behaviour: the first two attempts fail with 429, the call still succeeds
+    close_groq_client()
+    server.reset_counters()
+    server.fail_first = 2
+    server.error_status = 429
+    start = time.perf_counter()
+    llm_chat("system", "retry me")
+    results["retry_429"] = {
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        "server": server.stats(),
+    }
+
+    server.stop()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
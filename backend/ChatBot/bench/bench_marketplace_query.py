@@ -0,0 +1,274 @@
+# /data/marketplace response size and latency: whole catalog vs keyset-paginated pages
+#
+# Usage (from backend/ChatBot):
+#   python -m bench.bench_marketplace_query --listings 100000
+#   MONGODB_URI=mongodb://localhost:27017 python -m bench.bench_marketplace_query --listings 100000
+#
+# Without MONGODB_URI the bench uses an in-memory stand-in for the credits
+# collection. It reads listings in sort order and filters them until the page
+# is full, which is the plan a server uses with the sort-field indexes in
+# utils/db.py. It does not model the equality-filter indexes, so sparse filters
+# read more than they would on a server. With MONGODB_URI it replaces the
+# credits collection of the --db-name scratch database, never MONGODB_DB_NAME;
+# the application's database is refused.
+#
+# The baseline is a request without parameters, which still serialises every
+# listing (the endpoint's original response). Each scenario's page is then
+# fetched through the Flask app. Before reporting, the bench walks every page
+# of the filtered scenarios by cursor and checks the result against filtering
+# and sorting the generated listings in Python: no listing missing, repeated
+# or out of order. Some listings lack emissions_offset_tons or hold null, so
+# the walks sorted on it cross null sort values in both directions.
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+from urllib.parse import urlencode
+
+import bench.common  # noqa: F401  (adds backend/ChatBot to sys.path)
+from bench.common import latency_summary, use_scratch_database
+
+PROJECT_TYPES = ["Solar", "Wind", "Forest Conservation", "Mangrove Restoration", "Cookstove Efficiency",
+                 "Landfill Methane Capture", "Direct Air Capture"]
+SDGS = ["SDG 3", "SDG 7", "SDG 9", "SDG 11", "SDG 13", "SDG 14", "SDG 15"]
+
+# name -> (query parameters, reference filter, sort field, descending)
+SCENARIOS = {
+    "first_page": ({"limit": "50"}, lambda c: True, "credit_id", False),
+    "solar_by_price": ({"project_type": "Solar", "sort": "price_usd"},
+                       lambda c: c["project_type"] == "Solar", "price_usd", False),
+    "price_band_top_demand": ({"min_price": "10", "max_price": "20", "sort": "-demand_score"},
+                              lambda c: 10 <= c["price_usd"] <= 20, "demand_score", True),
+    "seller_listings": ({"seller_id": "S-7,S-8"}, lambda c: c["seller_id"] in ("S-7", "S-8"), "credit_id", False),
+    "sdg_projected": ({"sdg": "SDG 14", "min_demand": "60", "fields": "credit_id,price_usd",
+                       "sort": "-emissions_offset_tons"},
+                      lambda c: "SDG 14" in c["sdg_tags"] and c["demand_score"] >= 60, "emissions_offset_tons", True),
+    "wind_by_offset": ({"project_type": "Wind", "sort": "emissions_offset_tons"},
+                       lambda c: c["project_type"] == "Wind", "emissions_offset_tons", False),
+}
+# emissions_offset_tons is missing or null on some listings, so these walks cross null sort values
+WALKED = ("solar_by_price", "price_band_top_demand", "seller_listings", "sdg_projected", "wind_by_offset")
+
+
+def sort_key(doc, field):
+    # Mongo's order: a missing or null value sorts before every number
+    value = doc.get(field)
+    return (value is not None, value if value is not None else 0, doc["credit_id"])
+
+
+def _compare(value, op, operand):
+    if op == "$in":
+        return value in operand
+    if op == "$ne":
+        return value != operand
+    if value is None:
+        # Range operators never match a missing or null field
+        return False
+    if op == "$gt":
+        return value > operand
+    if op == "$gte":
+        return value >= operand
+    if op == "$lt":
+        return value < operand
+    if op == "$lte":
+        return value <= operand
+    raise ValueError(f"unsupported operator {op}")
+
+
+def matches(doc, query) -> bool:
+    for field, condition in query.items():
+        if field == "$and":
+            if not all(matches(doc, clause) for clause in condition):
+                return False
+            continue
+        if field == "$or":
+            if not any(matches(doc, clause) for clause in condition):
+                return False
+            continue
+        value = doc.get(field)
+        # Like Mongo, a condition on an array field matches if any element does
+        values = value if isinstance(value, list) else [value]
+        if isinstance(condition, dict):
+            ok = any(all(_compare(v, op, operand) for op, operand in condition.items()) for v in values)
+        else:
+            ok = condition in values
+        if not ok:
+            return False
+    return True
+
+
+class MemoryCursor:
+    def __init__(self, credits, query, projection):
+        self._credits = credits
+        self._query = query
+        self._projection = projection
+        self._order = [("credit_id", 1)]
+        self._limit = None
+
+    def sort(self, order):
+        self._order = order
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def __iter__(self):
+        field, direction = self._order[0]
+        ordered = self._credits.by_field(field)
+        if direction < 0:
+            ordered = reversed(ordered)
+        include = [f for f, on in self._projection.items() if on and f != "_id"]
+        returned = 0
+        for doc in ordered:
+            if self._limit is not None and returned >= self._limit:
+                return
+            if matches(doc, self._query):
+                returned += 1
+                yield {f: doc[f] for f in include if f in doc} if include else dict(doc)
+
+
+class MemoryCredits:
+    """The slice of the credits collection API used by utils/catalog_query.py.
+
+    Each sort walks a copy presorted by (field, credit_id) and stops at the
+    limit, the way a server reads one of the (field, credit_id) indexes.
+    """
+
+    def __init__(self, docs):
+        self.docs = docs
+        self._sorted = {}
+
+    def by_field(self, field):
+        if field not in self._sorted:
+            self._sorted[field] = sorted(self.docs, key=lambda d: sort_key(d, field))
+        return self._sorted[field]
+
+    def find(self, query, projection):
+        return MemoryCursor(self, query, projection)
+
+
+class MemoryDatabase(SimpleNamespace):
+    """Collections by attribute (utils/data_store.py) and by name (utils/catalog_query.py)."""
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+def listings(n: int, seed: int = 17):
+    rng = random.Random(seed)
+    for i in range(n):
+        listing = {
+            "credit_id": f"CR-{i:06d}",
+            "project_type": rng.choice(PROJECT_TYPES),
+            "price_usd": round(rng.uniform(4, 60), 2),
+            # Few distinct values, so pages break inside runs of equal sort keys
+            "demand_score": rng.randint(0, 100),
+            "emissions_offset_tons": rng.choice([250, 500, 1000, 2500, 5000, None]),
+            "location": rng.choice(["Kenya", "Brazil", "India", "Nevada, USA", "Indonesia"]),
+            "sdg_tags": rng.sample(SDGS, 2),
+            "seller_id": f"S-{rng.randint(1, 400)}",
+        }
+        # Half of the listings without a value lack the field, the others hold null
+        if listing["emissions_offset_tons"] is None and i % 2:
+            del listing["emissions_offset_tons"]
+        yield listing
+
+
+def timed_get(client, url, repeats):
+    samples, response = [], None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        response = client.get(url)
+        body = response.get_data()
+        samples.append((time.perf_counter() - start) * 1000)
+    return body, response.status_code, samples
+
+
+def walk(client, params, page_size):
+    items, cursor, pages = [], None, 0
+    while True:
+        query = dict(params, limit=str(page_size), **({"cursor": cursor} if cursor else {}))
+        payload = client.get("/data/marketplace?" + urlencode(query)).get_json()
+        items.extend(payload["marketplace"])
+        pages += 1
+        cursor = payload["next_cursor"]
+        if not cursor:
+            return items, pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark paginated /data/marketplace queries")
+    parser.add_argument("--listings", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=20, help="requests per scenario")
+    parser.add_argument("--walk-page-size", type=int, default=500)
+    parser.add_argument("--db-name", default="chatbot_bench_marketplace",
+                        help="scratch database used with MONGODB_URI; its credits are replaced")
+    args = parser.parse_args()
+
+    if os.getenv("MONGODB_URI"):
+        use_scratch_database(args.db_name)
+
+    import api
+    from utils import catalog_query, data_store
+
+    docs = list(listings(args.listings))
+    if os.getenv("MONGODB_URI"):
+        from utils.db import INDEXES, ensure_indexes, get_db
+        db = get_db()
+        db.credits.drop()
+        db.credits.insert_many([dict(d) for d in docs])
+        ensure_indexes(db, [spec for spec in INDEXES if spec.collection == "credits"])
+        backend = "mongodb"
+    else:
+        db = MemoryDatabase(credits=MemoryCredits(docs))
+        catalog_query.get_db = data_store.get_db = lambda: db
+        backend = "memory"
+
+    results = {"listings": args.listings, "backend": backend, "scenarios": {}}
+
+    # Without parameters the endpoint keeps its original response: every listing, no cursor
+    client = api.app.test_client()
+    body, status, samples = timed_get(client, "/data/marketplace", max(1, args.repeats // 5))
+    payload = json.loads(body)
+    if status != 200 or len(payload["marketplace"]) != args.listings or "next_cursor" in payload:
+        print("unpaginated: /data/marketplace without parameters no longer returns the whole catalog", file=sys.stderr)
+        sys.exit(1)
+    results["unpaginated"] = {"bytes": len(body), **latency_summary(samples)}
+    for name, (params, _, _, _) in SCENARIOS.items():
+        body, status, samples = timed_get(client, "/data/marketplace?" + urlencode(params), args.repeats)
+        if status != 200:
+            print(f"{name}: HTTP {status} {body[:200]!r}", file=sys.stderr)
+            sys.exit(1)
+        payload = json.loads(body)
+        results["scenarios"][name] = {
+            "bytes": len(body), "items": len(payload["marketplace"]),
+            "bytes_vs_unpaginated": round(len(body) / results["unpaginated"]["bytes"], 5),
+            **latency_summary(samples),
+        }
+
+    for name in WALKED:
+        params, keep, field, descending = SCENARIOS[name]
+        items, pages = walk(client, params, args.walk_page_size)
+        expected = sorted((d for d in docs if keep(d)), key=lambda d: sort_key(d, field), reverse=descending)
+        if [i["credit_id"] for i in items] != [d["credit_id"] for d in expected]:
+            print(f"{name}: paging by cursor differs from the reference ({len(items)} vs {len(expected)} listings)",
+                  file=sys.stderr)
+            sys.exit(1)
+        requested = params.get("fields")
+        if requested and any(set(i) != set(requested.split(",")) for i in items):
+            print(f"{name}: projection returned unrequested fields", file=sys.stderr)
+            sys.exit(1)
+        results["scenarios"][name]["walked"] = {"listings": len(items), "pages": pages}
+
+    if backend == "mongodb":
+        db.credits.drop()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
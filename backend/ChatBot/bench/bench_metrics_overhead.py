@@ -0,0 +1,129 @@
+# Cost of the Prometheus instrumentation per chat request, and a check of its exposition output
+#
+# Usage (from backend/ChatBot):
+#   python -m bench.bench_metrics_overhead --requests 50000 --threads 8
+#
+# A "request" does what /chat records for a turn that reaches the agent:
+# start_chat, six stages, one Groq call with usage, four Mongo command events
+# and finish_chat. It is timed single-threaded, then run from --threads
+# threads at once to check that no observation is lost. /metrics is rendered
+# once every series exists, and the output is parsed back: buckets must be
+# cumulative, +Inf must equal _count, and every count must match the number
+# of observations made.
+
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import bench.common  # noqa: F401  (adds backend/ChatBot to sys.path)
+
+from utils import metrics
+
+INTENTS = ["market_analysis", "recommendation", "emissions", "theory", "insights", "general"]
+STAGES = ["session", "classify", "route", "context", "footprint", "llm"]
+MONGO_COMMANDS = ["find", "find", "aggregate", "update"]
+USAGE = SimpleNamespace(prompt_tokens=1400, completion_tokens=320, total_tokens=1720)
+LINE_RE = re.compile(r'^(\w+?)(_bucket|_sum|_count)\{(.*?)\} (\S+)$')
+
+
+def one_request(i, listener):
+    intent = INTENTS[i % len(INTENTS)]
+    stages = metrics.start_chat()
+    for n, name in enumerate(STAGES):
+        metrics.record_stage(name, 0.0001 * (n + 1) * (i % 7 + 1))
+    metrics.observe_llm_call("llama-3.1-8b-instant", "sync", 0.3, USAGE)
+    for command in MONGO_COMMANDS:
+        listener.succeeded(SimpleNamespace(command_name=command, duration_micros=400 + i % 300))
+    metrics.finish_chat(stages, intent, 0.35)
+
+
+def parse(text):
+    series = {}
+    for line in text.splitlines():
+        if line.startswith("#") or not line:
+            continue
+        match = LINE_RE.match(line)
+        if match is None:
+            raise ValueError(f"unparseable line: {line}")
+        name, suffix, labels, value = match.groups()
+        key = (name, re.sub(r',?le="[^"]*"', "", labels))
+        entry = series.setdefault(key, {"buckets": []})
+        if suffix == "_bucket":
+            entry["buckets"].append(float(value))
+        else:
+            entry[suffix] = float(value)
+    return series
+
+
+def check(series, expected):
+    problems = []
+    for key, entry in series.items():
+        buckets = entry["buckets"]
+        if any(later < earlier for earlier, later in zip(buckets, buckets[1:])):
+            problems.append(f"{key}: buckets not cumulative")
+        if buckets[-1] != entry["_count"]:
+            problems.append(f"{key}: +Inf {buckets[-1]} != count {entry['_count']}")
+    for name, total in expected.items():
+        got = sum(e["_count"] for (n, _), e in series.items() if n == name)
+        if got != total:
+            problems.append(f"{name}: {got} observations, expected {total}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Prometheus metrics overhead")
+    parser.add_argument("--requests", type=int, default=50_000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    if not metrics.METRICS_ENABLED:
+        sys.exit("METRICS_ENABLED is off")
+    listener = metrics.MongoCommandMetrics()
+
+    start = time.perf_counter()
+    for i in range(args.requests):
+        one_request(i, listener)
+    per_request_us = (time.perf_counter() - start) / args.requests * 1e6
+
+    def worker(offset):
+        for i in range(args.requests // args.threads):
+            one_request(offset + i, listener)
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(args.threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    threaded_s = time.perf_counter() - start
+    total = args.requests + (args.requests // args.threads) * args.threads
+
+    start = time.perf_counter()
+    text = metrics.render_metrics()
+    render_ms = (time.perf_counter() - start) * 1000
+    problems = check(parse(text), {
+        "chat_stage_seconds": total * (len(STAGES) + 1),
+        "groq_request_seconds": total,
+        "groq_tokens": total * 3,
+        "mongo_command_seconds": total * len(MONGO_COMMANDS),
+    })
+
+    results = {
+        "requests": total,
+        "per_request_us": round(per_request_us, 2),
+        "threaded_requests_per_s": round(args.requests // args.threads * args.threads / threaded_s),
+        "render_ms": round(render_ms, 2),
+        "exposition_bytes": len(text.encode()),
+        "problems": problems[:5],
+    }
+    print(json.dumps(results, indent=2))
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Count Mongo commands issued per /chat intent, with and without per-read seeding checks
+#
+# Needs a reachable MongoDB (use a scratch database):
+#   MONGODB_URI=mongodb://localhost:27017 MONGODB_DB_NAME=bench_chatbot python -m bench.bench_mongo_commands
+#
+# LLM calls go to the local fake Groq server, so only data access is measured.
+# The "before" run emulates the old read path: every catalog access re-reads the
+# collections from Mongo and each getter runs seed_if_empty() first.
+
+import argparse
+import json
+import os
+import threading
+from collections import Counter
+
+from pymongo import monitoring
+
+from bench.common import point_groq_at
+from bench.fake_groq_server import FakeGroqServer
+
+INTENT_MESSAGES = {
+    "market_analysis": "which credits have the highest demand",
+    "recommendation": "recommend credits for my startup",
+    "emissions": "how much co2 do 10 credits of CR-003 offset",
+    "theory": "what is sdg 13",
+    "insights": "which sellers are most trustworthy",
+}
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.commands = Counter()
+
+    def started(self, event):
+        with self._lock:
+            self.commands[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def reset(self):
+        with self._lock:
+            self.commands = Counter()
+
+    def snapshot(self):
+        with self._lock:
+            return {"total": sum(self.commands.values()), **dict(self.commands)}
+
+
+def install_legacy_reads(data_store, snapshot, seed_if_empty):
+    """Re-install the old behaviour: per-read seeding checks and no shared snapshot."""
+    for name in ("get_credits", "get_sellers", "get_users", "get_theory"):
+        original = getattr(data_store, name)
+
+        def wrapped(*args, _original=original, **kwargs):
+            seed_if_empty()
+            return _original(*args, **kwargs)
+
+        setattr(data_store, name, wrapped)
+        setattr(snapshot, name, wrapped)
+
+    store = snapshot.get_snapshot_store()
+    store.get = lambda: snapshot.MarketplaceSnapshot(
+        0, snapshot.get_credits(), snapshot.get_sellers(), snapshot.get_users(), snapshot.get_theory()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count Mongo commands per chat intent")
+    parser.parse_args()
+
+    server = FakeGroqServer().start()
+    point_groq_at(server.base_url)
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+
+    counter = CommandCounter()
+    from utils import db
+
+    db.register_event_listener(counter)
+    db.run_migrations()
+
+    import api
+
+    def run_intents():
+        results = {}
+        for intent, message in INTENT_MESSAGES.items():
+            counter.reset()
+            with api.app.test_client() as client:
+                response = client.post("/chat", json={"message": message, "role": "buyer"})
+            results[intent] = {"routed_to": response.get_json().get("intent"), "mongo": counter.snapshot()}
+        return results
+
+    run_intents()  # warm the snapshot so "after" shows steady-state turns
+    after = run_intents()
+
+    from utils import data_store, snapshot
+
+    install_legacy_reads(data_store, snapshot, db.seed_if_empty)
+    before = run_intents()
+
+    server.stop()
+    print(json.dumps({"before": before, "after": after}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# Measure critical-path latency saved by prefetching agent context during the LLM router call
+#
+# Usage (from backend/ChatBot):
+#   python -m bench.bench_prefetch --router-latency-ms 300 --footprint-latency-ms 40
+#   python -m bench.bench_prefetch --concurrency 48 --footprint-latency-ms 40
+#
+# Reads the catalog snapshot from MONGODB_URI when it is set (it only reads),
+# otherwise from the in-memory stand-in in bench/mongo_standin.py.
+#
+# Only fixture turns the local classifier is unsure about are used, since those
+# are the ones that wait on the LLM router. --footprint-latency-ms adds a delay
+# to each footprint read to model the round trip to a remote MongoDB.
+# --concurrency runs that many chats at once on the shared prefetch pool. The
+# "prefetch_always" mode then queues every prefetch, as before requests
+# skipped it on a busy pool, to show the latency that queueing adds.
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.common import latency_summary, load_jsonl, point_groq_at
+from bench.fake_groq_server import FakeGroqServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark speculative context prefetch in /chat")
+    parser.add_argument("--router-latency-ms", type=float, default=300.0)
+    parser.add_argument("--footprint-latency-ms", type=float, default=40.0)
+    parser.add_argument("--user-id", default="bench-user")
+    parser.add_argument("--concurrency", type=int, default=1, help="chats prepared at once")
+    args = parser.parse_args()
+
+    rows = load_jsonl("router_labelled.jsonl")
+    labels = {row["message"]: row["label"] for row in rows}
+
+    def responder(messages):
+        user = next(m["content"] for m in messages if m["role"] == "user")
+        return json.dumps({"label": labels.get(user, "general"), "reason": "fixture label"})
+
+    server = FakeGroqServer(latency_ms=args.router_latency_ms, responder=responder).start()
+    # Every chat pays its own router call: no response cache, no coalescing of the repeated turns
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+    os.environ["LLM_SINGLE_FLIGHT_ENABLED"] = "false"
+    point_groq_at(server.base_url)
+    if not os.getenv("MONGODB_URI"):
+        from bench import mongo_standin
+
+        mongo_standin.install()
+
+    import agents.pipeline as pipeline
+    import utils.session_store as session_store
+    from agents.router_agent import is_confident
+    from utils.db import run_migrations
+    from utils.intent_classifier import classify_intent
+    from utils.snapshot import get_snapshot
+
+    run_migrations()
+    get_snapshot()  # load outside the timed section
+
+    fetch_footprint = session_store.get_user_footprint_safe
+
+    def remote_footprint(user_id, question=""):
+        time.sleep(args.footprint_latency_ms / 1000.0)
+        return fetch_footprint(user_id, question)
+
+    session_store.get_user_footprint_safe = remote_footprint
+
+    unsure = [row for row in rows if not is_confident(classify_intent(row["message"]))]
+    session = session_store.build_session("bench", "buyer", args.user_id)
+
+    def prepare(row):
+        start = time.perf_counter()
+        prepared = pipeline.prepare_chat(row["message"], session)
+        return (time.perf_counter() - start) * 1000, prepared
+
+    turns = unsure * args.concurrency
+    modes = [("sequential", False, None), ("prefetch", True, None)]
+    if args.concurrency > 1:
+        modes.append(("prefetch_always", True, len(turns) * (pipeline.CHAT_PREFETCH_INTENTS + 1)))
+
+    results = {}
+    prompts = {}
+    pool_workers = pipeline._slots.workers
+    with ThreadPoolExecutor(max_workers=args.concurrency) as chats:
+        for name, enabled, slots in modes:
+            pipeline.CHAT_PREFETCH_ENABLED = enabled
+            pipeline._slots.workers = slots or pool_workers
+            pipeline._stats = pipeline.PrefetchStats()
+            timed = list(chats.map(prepare, turns))
+            for row, (_, prepared) in zip(turns, timed):
+                prompts.setdefault(row["message"], set()).add((prepared.intent, prepared.prompt))
+            results[name] = {"prepare_latency": latency_summary([ms for ms, _ in timed])}
+            if enabled:
+                results[name]["stats"] = pipeline.get_prefetch_stats().stats()
+    pipeline._slots.workers = pool_workers
+    # Discarded prefetches may still be running; every slot must come back once they finish
+    pipeline._executor.shutdown(wait=True)
+
+    results["identical_prompts"] = all(len(variants) == 1 for variants in prompts.values())
+    results["turns"] = len(turns)
+    results["concurrency"] = args.concurrency
+    results["prefetch_workers"] = pool_workers
+    results["slots_leaked"] = pipeline._slots.busy
+    server.stop()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
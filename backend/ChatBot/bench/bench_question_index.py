@@ -0,0 +1,124 @@
+# Hit rate, false hits and lookup cost of the near-duplicate question index
+#
+# Usage (from backend/ChatBot):
+#   python -m bench.bench_question_index --entries 5000
+#
+# Runs offline. Each fixture group has a seed question, rewordings that should
+# reuse its answer, and near-misses that must not (different SDG, quantity,
+# credit ID, negation, reversed comparison, ...). Reports both rates for
+# several thresholds, then the lookup latency and memory of a full index.
+# Exits 1 if any near-miss is answered at the configured threshold.
+
+import argparse
+import json
+import random
+import sys
+import time
+
+import bench.common  # noqa: F401  (adds backend/ChatBot to sys.path)
+from bench.common import latency_summary, load_jsonl
+from config import QUESTION_INDEX_DIMENSIONS, QUESTION_INDEX_THRESHOLD
+from utils.question_index import QuestionIndex
+
+THRESHOLDS = [0.8, 0.85, 0.9, 0.95]
+
+WORDS = (
+    "carbon credit credits project projects price buy sell retire verify registry vintage "
+    "forestry solar wind cookstove methane offset footprint emissions seller buyer market "
+    "fees standard verra gold removal avoidance permanence leakage baseline sdg net zero"
+).split()
+
+
+def seeded_index(groups, threshold: float) -> QuestionIndex:
+    index = QuestionIndex(lambda: 1, max_entries=len(groups), threshold=threshold)
+    for i, group in enumerate(groups):
+        index.add(group["question"], "general", f"answer-{i}", version=1)
+    return index
+
+
+def score_threshold(groups, threshold: float):
+    index = seeded_index(groups, threshold)
+    paraphrases = hits = wrong = 0
+    distinct = 0
+    misses, false_hits = [], []
+    for i, group in enumerate(groups):
+        for text in group["paraphrases"]:
+            paraphrases += 1
+            match = index.lookup(text)
+            if match is None:
+                misses.append(text)
+            elif match.answer == f"answer-{i}":
+                hits += 1
+            else:
+                wrong += 1
+        for text in group["distinct"]:
+            distinct += 1
+            if index.lookup(text) is not None:
+                false_hits.append(text)
+    return {
+        "paraphrase_hit_rate": round(hits / paraphrases, 3),
+        "paraphrase_wrong_answer": wrong,
+        "distinct_false_hit_rate": round(len(false_hits) / distinct, 3),
+        "false_hits": len(false_hits),
+    }, misses, false_hits
+
+
+def random_question(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12))) + f" {rng.randint(1, 999)}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the near-duplicate question index")
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--dimensions", type=int, default=QUESTION_INDEX_DIMENSIONS)
+    args = parser.parse_args()
+
+    groups = load_jsonl("question_paraphrases.jsonl")
+    results = {"groups": len(groups)}
+    default_false_hits = []
+    for threshold in THRESHOLDS:
+        stats, misses, false_hits = score_threshold(groups, threshold)
+        if threshold == QUESTION_INDEX_THRESHOLD:
+            stats["missed_paraphrases"] = misses
+            stats["false_hit_questions"] = default_false_hits = false_hits
+        results[f"threshold_{threshold}"] = stats
+
+    # A version change must empty the index
+    version = [1]
+    index = QuestionIndex(lambda: version[0], max_entries=8)
+    index.add(groups[0]["question"], "general", "old", version=1)
+    version[0] = 2
+    if index.lookup(groups[0]["question"]) is not None:
+        print("Index served an answer from an older data version", file=sys.stderr)
+        sys.exit(1)
+
+    rng = random.Random(7)
+    index = QuestionIndex(lambda: 1, max_entries=args.entries, dimensions=args.dimensions)
+    start = time.perf_counter()
+    for i in range(args.entries):
+        index.add(random_question(rng), "general", "x" * 400, version=1)
+    fill_ms = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    for _ in range(args.lookups):
+        question = random_question(rng)
+        start = time.perf_counter()
+        index.lookup(question)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    results.update({
+        "entries": args.entries,
+        "dimensions": args.dimensions,
+        "fill_ms": round(fill_ms, 1),
+        "lookup_latency_at_capacity": latency_summary(latencies),
+        "memory_bytes": index.memory_bytes(),
+    })
+    print(json.dumps(results, indent=2))
+    # A near-miss served another question's answer at the shipped threshold
+    if default_false_hits:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
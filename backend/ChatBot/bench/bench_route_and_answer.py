@@ -0,0 +1,123 @@
+# Compare the two-call chat pipeline (router, then agent) with single-call route-and-answer
+#
+# Needs a reachable MongoDB for the catalog snapshot (use a scratch database):
+#   MONGODB_URI=mongodb://localhost:27017 MONGODB_DB_NAME=bench_chatbot \
+#     python -m bench.bench_route_and_answer --llm-latency-ms 300 --bad-json-rate 0.05
+#   ... python -m bench.bench_route_and_answer --live     # real Groq (needs GROQ_API_KEY)
+#
+# Offline, the fake server answers the router and the combined call with the
+# fixture label, so label agreement only checks the plumbing; use --live for
+# the model's real agreement rate. Token counts are the fake server's
+# estimates (4 characters per token) unless --live is set.
+
+import argparse
+import json
+import os
+import random
+import time
+
+from bench.common import latency_summary, load_jsonl, point_groq_at
+from bench.fake_groq_server import FakeGroqServer
+
+
+def run_turns(rows, answer_turn, usage):
+    latencies, labels, fallbacks = [], [], 0
+    before = usage.stats()
+    for row in rows:
+        start = time.perf_counter()
+        intent, fell_back = answer_turn(row["message"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        labels.append(intent)
+        fallbacks += fell_back
+    after = usage.stats()
+    turns = len(rows)
+    return labels, {
+        "turns": turns,
+        "latency": latency_summary(latencies),
+        "llm_calls_per_turn": round((after["calls"] - before["calls"]) / turns, 2),
+        "prompt_tokens_per_turn": round((after["prompt_tokens"] - before["prompt_tokens"]) / turns, 1),
+        "completion_tokens_per_turn": round((after["completion_tokens"] - before["completion_tokens"]) / turns, 1),
+        "fallbacks": fallbacks,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark single-call route-and-answer")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--bad-json-rate", type=float, default=0.05,
+                        help="fraction of combined replies the fake server returns as plain text")
+    parser.add_argument("--live", action="store_true")
+    args = parser.parse_args()
+
+    rows = load_jsonl("router_labelled.jsonl")
+    labels = {row["message"]: row["label"] for row in rows}
+    rng = random.Random(11)
+
+    def responder(messages):
+        system = next(m["content"] for m in messages if m["role"] == "system")
+        user = next(m["content"] for m in messages if m["role"] == "user")
+        if "routing agent" in system:
+            return json.dumps({"label": labels.get(user, "general"), "reason": "fixture label"})
+        if "Context by label" in user:
+            question = user.splitlines()[0][len("User question: "):]
+            answer = "Fake answer: " + question
+            if rng.random() < args.bad_json_rate:
+                return answer
+            return json.dumps({"label": labels.get(question, "general"), "reason": "fixture label", "answer": answer})
+        return "Fake answer: " + user.splitlines()[0][:120]
+
+    # Every turn should reach the LLM
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+    server = None
+    if not args.live:
+        server = FakeGroqServer(latency_ms=args.llm_latency_ms, responder=responder).start()
+        point_groq_at(server.base_url)
+
+    from agents.pipeline import prepare_chat
+    from agents.route_and_answer import route_and_answer
+    from agents.router_agent import is_confident
+    from utils.db import run_migrations
+    from utils.helpers import get_token_usage, llm_chat
+    from utils.intent_classifier import classify_intent
+    from utils.session_store import build_session
+    from utils.snapshot import get_snapshot
+
+    run_migrations()
+    get_snapshot()
+    session = build_session("bench", "buyer")
+
+    def two_call(message):
+        intent, agent, prompt = prepare_chat(message, session)
+        llm_chat(agent.system_prompt, prompt)
+        return intent, False
+
+    def single_call(message):
+        routed = route_and_answer(message, session)
+        if routed is None:
+            return two_call(message)[0], True
+        return routed.intent, False
+
+    def hybrid(message):
+        # What /chat does with ROUTE_AND_ANSWER=true
+        prediction = classify_intent(message)
+        if is_confident(prediction):
+            return two_call(message)
+        return single_call(message)
+
+    usage = get_token_usage()
+    unsure = [row for row in rows if not is_confident(classify_intent(row["message"]))]
+    results = {"turns": len(rows), "unsure_turns": len(unsure)}
+    for name, turns in (("all_turns", rows), ("unsure_turns_only", unsure)):
+        baseline, results[name + ".two_call"] = run_turns(turns, two_call, usage)
+        for mode, fn in (("single_call", single_call), ("hybrid", hybrid)):
+            got, stats = run_turns(turns, fn, usage)
+            stats["label_agreement"] = round(sum(a == b for a, b in zip(baseline, got)) / len(turns), 3)
+            results[f"{name}.{mode}"] = stats
+
+    if server is not None:
+        server.stop()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Benchmark the tiered intent router against the labelled fixture set
+#
+# Usage (from backend/ChatBot):
+#   python -m bench.bench_router
+#   python -m bench.bench_router --thresholds 0.4 0.5 0.6 0.7 --llm-latency-ms 350
+#   python -m bench.bench_router --live    # also runs route_intent end to end (needs GROQ_API_KEY)
+
+import argparse
+import json
+import time
+
+from bench.common import latency_summary, load_jsonl
+
+from config import ROUTER_CONFIDENCE_THRESHOLD
+from utils.intent_classifier import classify_intent
+
+
+def run_local(rows, threshold: float, llm_latency_ms: float):
+    local_ms = []
+    end_to_end_ms = []
+    skipped = 0
+    skipped_correct = 0
+    local_correct = 0
+    for row in rows:
+        start = time.perf_counter()
+        prediction = classify_intent(row["message"])
+        elapsed = (time.perf_counter() - start) * 1000
+        local_ms.append(elapsed)
+
+        correct = prediction.label == row["label"]
+        local_correct += correct
+        if prediction.confidence >= threshold:
+            skipped += 1
+            skipped_correct += correct
+            end_to_end_ms.append(elapsed)
+        else:
+            # Turns below the threshold pay for the LLM router call as well
+            end_to_end_ms.append(elapsed + llm_latency_ms)
+
+    total = len(rows)
+    return {
+        "threshold": threshold,
+        "turns": total,
+        "skipped_llm_fraction": round(skipped / total, 3),
+        "local_accuracy_all_turns": round(local_correct / total, 3),
+        "local_accuracy_skipped_turns": round(skipped_correct / skipped, 3) if skipped else None,
+        "local_latency": latency_summary(local_ms),
+        "simulated_router_latency": latency_summary(end_to_end_ms),
+    }
+
+
+def run_live(rows):
+    from agents.router_agent import route_intent
+
+    latencies = []
+    correct = 0
+    for row in rows:
+        start = time.perf_counter()
+        label = route_intent(row["message"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        correct += label == row["label"]
+    return {
+        "threshold": ROUTER_CONFIDENCE_THRESHOLD,
+        "router_accuracy": round(correct / len(rows), 3),
+        "router_latency": latency_summary(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tiered intent router")
+    parser.add_argument("--fixture", default="router_labelled.jsonl")
+    parser.add_argument("--thresholds", type=float, nargs="*", default=[ROUTER_CONFIDENCE_THRESHOLD])
+    parser.add_argument("--llm-latency-ms", type=float, default=400.0,
+                        help="assumed latency of one LLM router call for the simulated end-to-end figures")
+    parser.add_argument("--live", action="store_true", help="also run route_intent end to end")
+    args = parser.parse_args()
+
+    rows = load_jsonl(args.fixture)
+    classify_intent("warm up")
+    results = {"local": [run_local(rows, t, args.llm_latency_ms) for t in args.thresholds]}
+    if args.live:
+        results["live"] = run_live(rows)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
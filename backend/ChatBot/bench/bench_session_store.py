@@ -0,0 +1,143 @@
+# Per-turn session setup: rebuilding the profile context every turn vs the server-side session store
+#
+# Usage (from backend/ChatBot):
+#   python -m bench.bench_session_store --sessions 500 --turns 10 --rtt-ms 0.5
+#
+# Sessions are built with the role's profile (build_profile_session, as the
+# CLI does). Profiles come from a dict-backed session_profiles collection that
+# sleeps --rtt-ms per query to model the Mongo round trip. "rebuild" resolves
+# the role's profile and renders the prompt context on every turn; "store"
+# does it on a session's first turn and then finds the session by the ID the
+# first reply returned. Every turn's context is checked against the rebuilt
+# one. API sessions (build_session) must read no profile and carry only the
+# role and user_id. Last, the SQLite backend is opened from a second process,
+# which must see the sessions the first one wrote.
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import bench.common  # noqa: F401  (adds backend/ChatBot to sys.path)
+from bench.common import latency_summary
+
+PROFILES = [
+    {"role": "buyer", "company": "Northwind Foods", "industry": "food processing", "location": "Pune",
+     "esg_maturity": "developing", "credits_retired": 120, "net_zero_target_year": 2040, "annual_emissions": 5400},
+    {"role": "seller", "organization": "Western Ghats Restoration", "project_type": "reforestation",
+     "verification_standard": "Verra VCS", "trust_score": 0.91, "market_demand": "high"},
+]
+
+
+class SlowProfiles:
+    """session_profiles with a round trip per query, counting them."""
+
+    def __init__(self, rtt_ms):
+        self._delay = rtt_ms / 1000.0
+        self.reads = 0
+
+    def find(self, query=None, projection=None):
+        self.reads += 1
+        time.sleep(self._delay)
+        return [dict(p) for p in PROFILES]
+
+
+def turns(args):
+    rng = random.Random(3)
+    sessions = [(f"s{i}", rng.choice(["buyer", "seller"]), f"user-{i}" if i % 3 else "") for i in range(args.sessions)]
+    # Interleaved like concurrent conversations, each session's turns in order
+    order = [s for s in sessions for _ in range(args.turns)]
+    rng.shuffle(order)
+    return order
+
+
+def run(args, mode, order):
+    from utils import data_store, session_store
+
+    db = SimpleNamespace(session_profiles=SlowProfiles(args.rtt_ms))
+    data_store.get_db = lambda: db
+    store = session_store.SessionStore(session_store.MemorySessionBackend(args.sessions * 2, 3600),
+                                       session_store.build_profile_session)
+    issued, samples, mismatched = {}, [], 0
+    for key, role, user_id in order:
+        start = time.perf_counter()
+        if mode == "rebuild":
+            session = session_store.build_profile_session(key, role, user_id)
+        else:
+            session = store.resolve(issued.get(key), role, user_id)
+            issued[key] = session.session_id
+        samples.append((time.perf_counter() - start) * 1000)
+        expected = session_store.build_session_context(role, next(p for p in PROFILES if p["role"] == role))
+        mismatched += session.context != expected or session.role != role or session.user_id != (user_id or None)
+    result = {"turns": len(order), "profile_reads": db.session_profiles.reads, "mismatched": mismatched,
+              **latency_summary(samples)}
+    if mode == "store":
+        result["store"] = store.stats()
+    return result
+
+
+def check_api_sessions(order):
+    """API sessions are built from the request alone: no profile read, no demo profile."""
+    from utils import data_store, session_store
+
+    db = SimpleNamespace(session_profiles=SlowProfiles(0))
+    data_store.get_db = lambda: db
+    wrong = 0
+    for key, role, user_id in order:
+        session = session_store.build_session(key, role, user_id)
+        expected = f"User role: {role}\n" + (f"user_id: {user_id}\n" if user_id else "")
+        wrong += session.context != expected or bool(session.profile)
+    return {"sessions": len(order), "profile_reads": db.session_profiles.reads, "wrong_context": wrong}
+
+
+def read_back(path, expected, queue):
+    from utils.session_store import SQLiteSessionBackend
+
+    backend = SQLiteSessionBackend(path, 3600)
+    queue.put(sum(backend.get(s["session_id"]) != tuple(s.values()) for s in expected))
+
+
+def run_shared(args):
+    from utils import data_store, session_store
+
+    data_store.get_db = lambda: SimpleNamespace(session_profiles=SlowProfiles(0))
+    path = os.path.join(tempfile.mkdtemp(), "sessions.db")
+    store = session_store.SessionStore(session_store.SQLiteSessionBackend(path, 3600))
+    written = [store.resolve(None, role)._asdict() for role in ("buyer", "seller") * 50]
+
+    queue = multiprocessing.Queue()
+    child = multiprocessing.Process(target=read_back, args=(path, written, queue))
+    child.start()
+    missing = queue.get(timeout=30)
+    child.join()
+    return {"sessions": len(written), "missing_in_other_process": missing}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the server-side session store")
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--rtt-ms", type=float, default=0.5)
+    args = parser.parse_args()
+
+    order = turns(args)
+    results = {mode: run(args, mode, order) for mode in ("rebuild", "store")}
+    results["profile_reads_saved"] = round(1 - results["store"]["profile_reads"] / results["rebuild"]["profile_reads"], 3)
+    results["api_sessions"] = check_api_sessions(order)
+    results["sqlite_shared"] = run_shared(args)
+
+    print(json.dumps(results, indent=2))
+    api = results["api_sessions"]
+    if results["rebuild"]["mismatched"] or results["store"]["mismatched"] or results["sqlite_shared"]["missing_in_other_process"] \
+            or api["profile_reads"] or api["wrong_context"]:
+        print("A session's context differs from the one expected for its role", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
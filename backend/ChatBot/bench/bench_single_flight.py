@@ -0,0 +1,151 @@
+# Groq requests and latency for bursts of identical questions, with and without single-flight
+#
+# Usage (from backend/ChatBot):
+#   python -m bench.bench_single_flight --callers 200 --questions 5 --latency-ms 200
+#
+# A burst is --callers concurrent llm_chat calls (threads) or allm_chat calls
+# (one event loop) spread over --questions distinct prompts, the way a
+# marketing email makes many users ask the same thing at once. The response
+# cache is off, so only in-flight coalescing can save requests. Each mode is
+# run with single-flight disabled and enabled, and the fake server counts the
+# requests it received. Then two edge cases: an upstream error must reach
+# every caller that shared the request, and cancelling the async caller that
+# started a request must not cancel it for the others.
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+from bench.common import latency_summary, point_groq_at
+from bench.fake_groq_server import FakeGroqServer
+
+
+def prompts(callers, questions):
+    return [f"What is a carbon credit? (variant {i % questions})" for i in range(callers)]
+
+
+def thread_burst(llm_chat, user_prompts):
+    barrier = threading.Barrier(len(user_prompts))
+    latencies, errors = [], []
+
+    def one(prompt):
+        barrier.wait()
+        start = time.perf_counter()
+        try:
+            llm_chat("system", prompt)
+        except Exception as exc:
+            errors.append(type(exc).__name__)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=one, args=(p,)) for p in user_prompts]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors
+
+
+async def async_burst(allm_chat, user_prompts):
+    async def one(prompt):
+        start = time.perf_counter()
+        try:
+            await allm_chat("system", prompt)
+            error = None
+        except Exception as exc:
+            error = type(exc).__name__
+        return (time.perf_counter() - start) * 1000, error
+
+    results = await asyncio.gather(*(one(p) for p in user_prompts))
+    return [r[0] for r in results], [r[1] for r in results if r[1]]
+
+
+async def cancelled_leader(allm_chat):
+    leader = asyncio.ensure_future(allm_chat("system", "cancel the first caller"))
+    await asyncio.sleep(0)
+    followers = [asyncio.ensure_future(allm_chat("system", "cancel the first caller")) for _ in range(10)]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    answers = await asyncio.gather(*followers, return_exceptions=True)
+    return sum(isinstance(a, str) for a in answers), len(answers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark single-flight coalescing of LLM calls")
+    parser.add_argument("--callers", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    args = parser.parse_args()
+
+    server = FakeGroqServer(latency_ms=args.latency_ms).start()
+    point_groq_at(server.base_url)
+    # Measure coalescing, not the response cache
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+
+    from utils import metrics, single_flight
+    from utils.helpers import aclose_async_groq_client, allm_chat, llm_chat
+
+    async def run_async(user_prompts):
+        try:
+            return await async_burst(allm_chat, user_prompts)
+        finally:
+            await aclose_async_groq_client()
+
+    user_prompts = prompts(args.callers, args.questions)
+    results = {}
+    problems = []
+    for enabled in (False, True):
+        single_flight.LLM_SINGLE_FLIGHT_ENABLED = enabled
+        for mode, run in (("threads", lambda: thread_burst(llm_chat, user_prompts)),
+                          ("asyncio", lambda: asyncio.run(run_async(user_prompts)))):
+            server.reset_counters()
+            start = time.perf_counter()
+            latencies, errors = run()
+            name = f"{mode}_{'single_flight' if enabled else 'off'}"
+            results[name] = {
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+                "groq_requests": server.stats()["requests"],
+                "latency": latency_summary(latencies),
+                "errors": len(errors),
+            }
+            if errors:
+                problems.append(f"{name}: {len(errors)} errors")
+            if enabled and server.stats()["requests"] != args.questions:
+                problems.append(f"{name}: {server.stats()['requests']} Groq requests for {args.questions} questions")
+
+    # A 400 is not retried: one failed request, and every caller sees the failure
+    server.reset_counters()
+    server.fail_first, server.error_status = 1, 400
+    _, errors = thread_burst(llm_chat, ["fails for everyone"] * 20)
+    results["shared_error"] = {"callers": 20, "errors": len(errors), "groq_requests": server.stats()["requests"]}
+    if len(errors) != 20 or server.stats()["requests"] != 1:
+        problems.append("shared_error: the failure did not reach every caller exactly once")
+    server.fail_first = 0
+
+    async def run_cancel():
+        try:
+            return await cancelled_leader(allm_chat)
+        finally:
+            await aclose_async_groq_client()
+
+    server.reset_counters()
+    answered, followers = asyncio.run(run_cancel())
+    results["cancelled_leader"] = {"followers_answered": f"{answered}/{followers}", "groq_requests": server.stats()["requests"]}
+    if answered != followers:
+        problems.append("cancelled_leader: followers lost their answer")
+
+    results["health"] = single_flight.get_flight_stats().stats()
+    results["metrics"] = [line for line in metrics.render_metrics().splitlines()
+                          if line.startswith(("llm_calls_total", "llm_coalesced_ratio"))]
+    results["problems"] = problems
+    server.stop()
+    print(json.dumps(results, indent=2))
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
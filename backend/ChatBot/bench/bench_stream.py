@@ -0,0 +1,103 @@
+# Compare time-to-first-token on /chat/stream with the full-response latency of /chat
+#
+# Needs a reachable MongoDB for the catalog snapshot (use a scratch database):
+#   MONGODB_URI=mongodb://localhost:27017 MONGODB_DB_NAME=bench_chatbot \
+#     python -m bench.bench_stream --requests 30 --ttft-ms 250 --token-delay-ms 15 --answer-words 200
+#
+# The fake server waits --ttft-ms before the first chunk and --token-delay-ms
+# between chunks, so a non-streamed answer costs ttft + words * token delay.
+
+import argparse
+import json
+import os
+import time
+
+from bench.common import latency_summary, point_groq_at
+from bench.fake_groq_server import FakeGroqServer
+
+MESSAGES = [
+    "which credits have the highest demand",
+    "recommend credits for my startup",
+    "how much co2 do 10 credits of CR-003 offset",
+    "what is sdg 13",
+]
+
+
+def parse_sse(lines):
+    event = None
+    for line in lines:
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            yield event, json.loads(line[len("data: "):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streamed vs buffered /chat responses")
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--ttft-ms", type=float, default=250.0)
+    parser.add_argument("--token-delay-ms", type=float, default=15.0)
+    parser.add_argument("--answer-words", type=int, default=200)
+    args = parser.parse_args()
+
+    answer = " ".join(f"word{i}" for i in range(args.answer_words))
+    server = FakeGroqServer(
+        latency_ms=args.ttft_ms,
+        token_delay_ms=args.token_delay_ms,
+        responder=lambda messages: answer,
+    ).start()
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+    point_groq_at(server.base_url)
+
+    import api
+    from utils.db import run_migrations
+
+    run_migrations()
+    client = api.app.test_client()
+
+    buffered, stream_ttft, stream_total, server_ttft = [], [], [], []
+    for i in range(args.requests):
+        body = {"message": MESSAGES[i % len(MESSAGES)], "role": "buyer"}
+
+        start = time.perf_counter()
+        client.post("/chat", json=body).get_json()
+        buffered.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        response = client.post("/chat/stream", json=body, buffered=False)
+        first = None
+        text = []
+
+        def lines():
+            pending = ""
+            for chunk in response.response:
+                pending += chunk.decode("utf-8")
+                *complete, pending = pending.split("\n")
+                yield from complete
+
+        for event, data in parse_sse(lines()):
+            if event == "token":
+                if first is None:
+                    first = (time.perf_counter() - start) * 1000
+                text.append(data["text"])
+            elif event == "done":
+                server_ttft.append(data["ttft_ms"])
+            elif event == "error":
+                raise RuntimeError(data["error"])
+        stream_total.append((time.perf_counter() - start) * 1000)
+        stream_ttft.append(first)
+        if "".join(text).strip() != answer:
+            raise RuntimeError("streamed answer does not match the buffered answer")
+
+    server.stop()
+    print(json.dumps({
+        "chat_total": latency_summary(buffered),
+        "chat_stream_ttft": latency_summary(stream_ttft),
+        "chat_stream_ttft_server": latency_summary(server_ttft),
+        "chat_stream_total": latency_summary(stream_total),
+        "fake_llm": {"ttft_ms": args.ttft_ms, "token_delay_ms": args.token_delay_ms, "answer_words": args.answer_words},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# Prompt-size reduction and retrieval latency of the theory BM25 index
+#
+# Usage (from backend/ChatBot):
+#   python -m bench.bench_theory_retrieval --docs 10000 --budget 600
+#
+# Runs offline on a synthetic library. Before timing, it checks that an
+# index updated incrementally returns the same results as one built from scratch.
+
+import argparse
+import json
+import random
+import sys
+import time
+
+import bench.common  # noqa: F401  (adds backend/ChatBot to sys.path)
+from bench.common import latency_summary
+from data.theory_knowledge import THEORY_KNOWLEDGE
+from utils.theory_index import TheoryIndex
+from utils.tokens import estimate_tokens
+
+SUBJECTS = [
+    "additionality", "permanence", "leakage", "baseline", "verification", "registry", "vintage",
+    "methodology", "monitoring", "buffer pool", "double counting", "corresponding adjustment",
+    "article 6", "removal", "avoidance", "cookstove", "afforestation", "blue carbon", "biochar",
+    "direct air capture", "methane", "landfill gas", "renewable energy", "scope 3", "net zero",
+]
+FILLER = [
+    "Projects must document", "Auditors review", "Standards require", "Buyers should check",
+    "Registries record", "Developers estimate", "Validators confirm", "Regulators limit",
+]
+QUERIES = [
+    "what is additionality",
+    "explain permanence and the buffer pool",
+    "how does article 6 avoid double counting",
+    "what is a corresponding adjustment",
+    "explain blue carbon removal credits",
+    "how is landfill gas methane verified",
+    "what does vintage mean for a credit",
+    "explain scope 3 and net zero targets",
+]
+
+
+def synthetic_library(n_docs: int, seed: int = 3):
+    rng = random.Random(seed)
+    docs = {}
+    for i in range(n_docs):
+        subject = rng.choice(SUBJECTS)
+        sentences = [
+            f"{rng.choice(FILLER)} {subject} evidence for {rng.choice(SUBJECTS)} under rule {rng.randint(1, 500)}."
+            for _ in range(rng.randint(2, 12))
+        ]
+        docs[f"{subject.replace(' ', '_')}_{i}"] = " ".join(sentences)
+    return docs
+
+
+def check_incremental(docs) -> bool:
+    rng = random.Random(5)
+    topics = list(docs)
+    incremental = TheoryIndex()
+    current = {}
+    for topic in topics:
+        incremental.upsert(topic, docs[topic])
+        current[topic] = docs[topic]
+    for _ in range(len(topics)):
+        topic = rng.choice(topics)
+        if rng.random() < 0.3:
+            incremental.remove(topic)
+            current.pop(topic, None)
+        else:
+            current[topic] = docs[rng.choice(topics)]
+            incremental.upsert(topic, current[topic])
+
+    rebuilt = TheoryIndex()
+    for topic, content in current.items():
+        rebuilt.upsert(topic, content)
+    for query in QUERIES:
+        got = incremental.search(query, 10)
+        want = rebuilt.search(query, 10)
+        if [round(s, 9) for s, _ in got] != [round(s, 9) for s, _ in want]:
+            return False
+    return incremental.corpus_tokens == rebuilt.corpus_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark theory retrieval")
+    parser.add_argument("--docs", type=int, default=10_000)
+    parser.add_argument("--budget", type=int, default=600, help="token budget for retrieved context")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=400)
+    args = parser.parse_args()
+
+    # The seed library fits in the budget, so it must come back whole and in order
+    small = TheoryIndex()
+    for topic, content in THEORY_KNOWLEDGE.items():
+        small.upsert(topic, content)
+    legacy = [f"{topic}: {content}" for topic, content in THEORY_KNOWLEDGE.items()]
+    if small.context("what is sdg 13", args.budget, args.k) != legacy:
+        print("Small library context differs from the full listing", file=sys.stderr)
+        sys.exit(1)
+
+    if not check_incremental(synthetic_library(400)):
+        print("Incremental index diverges from a full rebuild", file=sys.stderr)
+        sys.exit(1)
+
+    docs = synthetic_library(args.docs)
+    index = TheoryIndex()
+    start = time.perf_counter()
+    for topic, content in docs.items():
+        index.upsert(topic, content)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    topic = next(iter(docs))
+    start = time.perf_counter()
+    index.upsert(topic, docs[topic] + " Registries record permanence evidence.")
+    update_ms = (time.perf_counter() - start) * 1000
+    index.search(QUERIES[0], args.k)  # build the scoring arrays once
+
+    latencies, context_tokens = [], []
+    for i in range(args.queries):
+        query = QUERIES[i % len(QUERIES)]
+        start = time.perf_counter()
+        passages = index.context(query, args.budget, args.k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        context_tokens.append(estimate_tokens("\n".join(passages)))
+
+    full_tokens = estimate_tokens("\n".join(f"{t}: {c}" for t, c in docs.items()))
+    avg_context = sum(context_tokens) / len(context_tokens)
+    print(json.dumps({
+        "docs": args.docs,
+        "passages": len(index),
+        "build_ms": round(build_ms, 1),
+        "single_doc_update_ms": round(update_ms, 3),
+        "retrieval_latency": latency_summary(latencies),
+        "full_context_tokens": full_tokens,
+        "retrieved_context_tokens_avg": round(avg_context, 1),
+        "token_budget": args.budget,
+        "prompt_size_reduction": round(full_tokens / max(avg_context, 1), 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# Cost of request tracing per chat request, and a check of the exported trace file
+#
+# Usage (from backend/ChatBot):
+#   python -m bench.bench_tracing_overhead --requests 20000 --disk-delay-ms 5
+#
+# A "request" has the shape of a traced /chat turn: a root trace, six stage
+# spans, data_store, snapshot and Groq spans nested under them, and four
+# Mongo commands reported through the driver listener. It is timed with no
+# trace (spans are no-ops), sampled at 1% and sampled at 100%. Then every
+# trace is kept while the file handler sleeps --disk-delay-ms per write, to
+# show that a slow disk drops traces instead of slowing requests. Last, the
+# file is parsed back: every trace must start with its root span and every
+# parent must be a span of the same trace.
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+import bench.common  # noqa: F401  (adds backend/ChatBot to sys.path)
+from bench.common import latency_summary
+
+from utils import tracing
+
+STAGES = ["session", "classify", "route", "context", "footprint", "llm"]
+MONGO_COMMANDS = [("find", "session_profiles"), ("find", "credits"), ("aggregate", "footprint_rollups"), ("find", "user_footprints")]
+
+
+@tracing.traced("data_store.get_user_footprint")
+def get_footprint(listener, i):
+    for n, (command, collection) in enumerate(MONGO_COMMANDS):
+        event_id = i * 10 + n
+        listener.started(SimpleNamespace(request_id=event_id, command_name=command, command={command: collection}))
+        listener.succeeded(SimpleNamespace(request_id=event_id, command_name=command, duration_micros=400))
+
+
+def one_request(i, listener):
+    trace = tracing.start_trace("POST /chat") if i is not None else None
+    for name in STAGES:
+        with tracing.span(name) as attributes:
+            if name == "context":
+                with tracing.span("snapshot.load"):
+                    pass
+            elif name == "footprint":
+                get_footprint(listener, i or 0)
+            elif name == "llm":
+                with tracing.span("groq.completion", model="llama-3.1-8b-instant", mode="sync") as groq:
+                    groq["prompt_tokens"], groq["completion_tokens"] = 1400, 320
+            attributes["n"] = i
+    tracing.finish_trace(trace, status=200)
+
+
+def timed(requests, listener, traced=True):
+    samples = []
+    for i in range(requests):
+        start = time.perf_counter()
+        one_request(i if traced else None, listener)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return {"per_request_us": round(sum(samples) / len(samples), 2), "p99_us": round(sorted(samples)[int(len(samples) * 0.99)], 2)}
+
+
+def check_file(path):
+    traces = defaultdict(list)
+    for name in sorted(os.listdir(os.path.dirname(path))):
+        with open(os.path.join(os.path.dirname(path), name), encoding="utf-8") as f:
+            for line in f:
+                span = json.loads(line)
+                traces[span["trace_id"]].append(span)
+    problems = []
+    for trace_id, spans in traces.items():
+        ids = {span["span_id"] for span in spans}
+        if spans[0]["parent_id"] is not None:
+            problems.append(f"{trace_id}: root span is not first")
+        if any(span["parent_id"] is not None and span["parent_id"] not in ids for span in spans):
+            problems.append(f"{trace_id}: span with a parent outside the trace")
+        if spans[0]["name"] == "POST /chat" and len(spans) != 1 + len(STAGES) + 3 + len(MONGO_COMMANDS):
+            problems.append(f"{trace_id}: {len(spans)} spans")
+    return len(traces), problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark request tracing overhead")
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--disk-delay-ms", type=float, default=5.0)
+    parser.add_argument("--queue-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    if not tracing.TRACING_ENABLED:
+        sys.exit("TRACING_ENABLED is off")
+    path = os.path.join(tempfile.mkdtemp(), "traces.jsonl")
+    exporter = tracing._exporter = tracing.SpanExporter(path, 5 * 1024 * 1024, 3, args.queue_size)
+    listener = tracing.MongoCommandSpans()
+
+    results = {"untraced": timed(args.requests, listener, traced=False)}
+    for rate in (0.01, 1.0):
+        tracing.TRACE_SAMPLE_RATE = rate
+        results[f"sampled_{rate:g}"] = timed(args.requests, listener)
+        exporter.flush()
+    results["kept"] = tracing.get_tracing_stats().stats()["kept"]
+
+    # A disk slower than the request rate: traces are dropped, requests are not held up
+    handler = exporter._listener.handlers[0]
+    emit = handler.emit
+    handler.emit = lambda record: (time.sleep(args.disk_delay_ms / 1000.0), emit(record))
+    before = tracing.get_tracing_stats().stats()["dropped_queue_full"]
+    finish_us = []
+    for i in range(args.requests):
+        trace = tracing.start_trace("POST /chat/slow-disk")
+        with tracing.span("llm"):
+            pass
+        start = time.perf_counter()
+        tracing.finish_trace(trace)
+        finish_us.append((time.perf_counter() - start) * 1e6)
+    dropped = tracing.get_tracing_stats().stats()["dropped_queue_full"] - before
+    exporter.close()
+    handler.emit = emit
+    results["slow_disk"] = {
+        "disk_delay_ms": args.disk_delay_ms,
+        "finish_trace": {k.replace("_ms", "_us"): v for k, v in latency_summary(finish_us).items()},
+        "dropped": dropped,
+    }
+
+    exported, problems = check_file(path)
+    results["file"] = {"traces": exported, "bytes": sum(os.path.getsize(os.path.join(os.path.dirname(path), n))
+                                                        for n in os.listdir(os.path.dirname(path))),
+                       "problems": problems[:5]}
+    print(json.dumps(results, indent=2))
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# Footprint reads per chat message with and without the per-user context cache
+#
+# Usage (from backend/ChatBot):
+#   python -m bench.bench_user_context_cache --users 2000 --messages 20000 --rtt-ms 0.5
+#
+# Runs against the dict-backed footprint collections from bench_footprint_bulk,
+# which sleep --rtt-ms per command to model the Mongo round trip. Each message
+# does what an agent does for a user with a user_id: get_user_footprint_safe
+# followed by footprint_prompt_section. Users are drawn from a skewed
+# distribution, some never save a footprint, and --save-ratio of the operations
+# are saves. Every read is checked against the stored document, so a stale
+# cache entry fails the bench. Then reader and writer threads run on a few
+# users, alternating single saves with bulk ingestion, and every read must see
+# at least the last save that finished before it started.
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+
+import bench.common  # noqa: F401  (adds backend/ChatBot to sys.path)
+from bench.bench_footprint_bulk import memory_db
+from bench.common import latency_summary
+
+
+class CountingReads:
+    """Wraps MemoryFootprints and counts find_one round trips."""
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.reads = 0
+
+    def find_one(self, *args, **kwargs):
+        self.reads += 1
+        return self._collection.find_one(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+class LateReplies:
+    """Reads the document first and then waits, like a reply still in flight while a save lands."""
+
+    def __init__(self, collection, rtt_ms):
+        self._collection = collection
+        self._delay = rtt_ms / 1000.0
+
+    def find_one(self, query, projection=None):
+        doc = self._collection.docs.get(query["user_id"])
+        doc = dict(doc) if doc is not None else None
+        time.sleep(self._delay)
+        return doc
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+def footprint(total):
+    return {"totalEmissions": float(total), "dominantSector": "energy", "suggestedCredits": total,
+            "treeEquivalent": total * 45, "breakdown": [{"name": "energy", "value": float(total), "percentage": 100.0}]}
+
+
+def as_stored(result):
+    return {k: v for k, v in (result or {}).items() if k not in ("_chat_text", "trend")} or None
+
+
+def run_workload(args, data_store, collection, use_cache):
+    rng = random.Random(11)
+    users = [f"user-{i}" for i in range(args.users)]
+    weights = [1.0 / (rank + 1) for rank in range(args.users)]
+    samples, stale, saves = [], 0, 0
+    for step in range(args.messages):
+        user_id = rng.choices(users, weights)[0]
+        # Every tenth user never saves, so their reads exercise negative entries
+        if rng.random() < args.save_ratio and not user_id.endswith("0"):
+            data_store.save_user_footprint(user_id, footprint(step))
+            saves += 1
+            continue
+        start = time.perf_counter()
+        result = data_store.get_user_footprint_safe(user_id, "which credits suit me?")
+        data_store.footprint_prompt_section(result)
+        samples.append((time.perf_counter() - start) * 1000)
+        stored = collection.docs.get(user_id)
+        if as_stored(result) != (dict(stored) if stored else None):
+            stale += 1
+    return {"cache": use_cache, "reads": len(samples), "saves": saves, "mongo_reads": collection.reads,
+            "stale_reads": stale, **latency_summary(samples)}
+
+
+def run_concurrent(data_store, db, seconds):
+    from utils.footprint_bulk import ingest_footprints
+
+    collection = db.user_footprints
+    users = [f"hot-{i}" for i in range(4)]
+    finished = {u: -1 for u in users}
+    violations, reads = [], [0]
+    stop = time.monotonic() + seconds
+
+    def writer(user_id):
+        n = 0
+        while time.monotonic() < stop:
+            if n % 2:
+                # Bulk ingestion invalidates, so readers miss and race with the next save
+                line = json.dumps({"user_id": user_id, "footprint_data": footprint(n)}).encode()
+                list(ingest_footprints([line], db=db))
+            else:
+                data_store.save_user_footprint(user_id, footprint(n))
+            finished[user_id] = n
+            n += 1
+
+    def reader():
+        rng = random.Random(threading.get_ident())
+        while time.monotonic() < stop:
+            user_id = rng.choice(users)
+            floor = finished[user_id]
+            result = data_store.get_user_footprint_safe(user_id)
+            seen = result["totalEmissions"] if result else -1
+            reads[0] += 1
+            if seen < floor:
+                violations.append((user_id, floor, seen))
+
+    threads = [threading.Thread(target=writer, args=(u,)) for u in users]
+    threads += [threading.Thread(target=reader) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    final_mismatch = [u for u in users
+                      if as_stored(data_store.get_user_footprint_safe(u)) != dict(collection.docs[u])]
+    return {"reads": reads[0], "stale_reads": len(violations), "final_mismatch": final_mismatch}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the per-user context cache")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--save-ratio", type=float, default=0.02)
+    parser.add_argument("--rtt-ms", type=float, default=0.5)
+    parser.add_argument("--concurrent-seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    from utils import data_store
+    from utils.user_context_cache import get_user_context_cache
+
+    cache = get_user_context_cache()
+    if cache is None:
+        sys.exit("USER_CONTEXT_CACHE_ENABLED is off")
+
+    results = {}
+    for use_cache in (False, True):
+        db = memory_db(args.rtt_ms)
+        collection = db.user_footprints = CountingReads(db.user_footprints)
+        data_store.get_db = lambda: db
+        cache.entries.clear()
+        data_store.get_user_context_cache = (lambda: cache) if use_cache else (lambda: None)
+        results["cached" if use_cache else "uncached"] = run_workload(args, data_store, collection, use_cache)
+    results["cached"]["cache"] = cache.stats()
+    results["mongo_reads_saved"] = round(1 - results["cached"]["mongo_reads"] / results["uncached"]["mongo_reads"], 3)
+
+    db = memory_db(args.rtt_ms)
+    db.user_footprints = LateReplies(db.user_footprints, args.rtt_ms)
+    data_store.get_db = lambda: db
+    results["concurrent"] = run_concurrent(data_store, db, args.concurrent_seconds)
+
+    print(json.dumps(results, indent=2))
+    if results["cached"]["stale_reads"] or results["concurrent"]["stale_reads"] or results["concurrent"]["final_mismatch"]:
+        print("The cache served a footprint older than the latest save", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Compare the per-dict scoring functions with the NumPy columnar engine
+#
+# Usage (from backend/ChatBot):
+#   python -m bench.bench_vector_scoring --sizes 1000 100000 1000000
+#
+# Every run first checks that the vectorized scores match utils/scoring.py on
+# a synthetic catalog and on the edge cases in bench/check_vector_scoring.py,
+# and exits non-zero if they diverge.
+
+import argparse
+import json
+import sys
+import time
+
+import bench.common  # noqa: F401  (adds backend/ChatBot to sys.path)
+from bench.check_vector_scoring import compare, edge_case_catalog, synthetic_catalog
+from data.user_profiles import USER_PROFILES
+from utils.scoring import compute_recommendation_score, compute_trust_score, compute_value_score, recommendation_weights
+from utils.vector_scoring import CreditColumns, profile_weight_matrix
+
+
+def python_scores(credits, sellers, profiles):
+    value = [compute_value_score(c) for c in credits]
+    trust = {seller_id: compute_trust_score(s) for seller_id, s in sellers.items()}
+    recs = []
+    for profile in profiles.values():
+        weights = recommendation_weights(profile)
+        recs.append([compute_recommendation_score(c, sellers.get(c["seller_id"], {}), weights) for c in credits])
+    return value, trust, recs
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, round((time.perf_counter() - start) * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized credit scoring")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--profiles", type=int, default=len(USER_PROFILES),
+                        help="number of buyer profiles scored at once (cycled from USER_PROFILES)")
+    args = parser.parse_args()
+
+    base = list(USER_PROFILES.items())
+    profiles = {f"{base[i % len(base)][0]}_{i}": base[i % len(base)][1] for i in range(args.profiles)}
+
+    for credits, sellers in (synthetic_catalog(2_000), edge_case_catalog()):
+        problems = compare(credits, sellers, profiles)
+        if problems:
+            print("Vectorized scores do not match utils/scoring.py:", *problems[:10], sep="\n  ", file=sys.stderr)
+            sys.exit(1)
+
+    results = []
+    for size in args.sizes:
+        credits, sellers = synthetic_catalog(size)
+        _, python_ms = timed(lambda: python_scores(credits, sellers, profiles))
+        columns, build_ms = timed(lambda: CreditColumns.from_catalog(credits, sellers))
+        _, weights = profile_weight_matrix(profiles)
+
+        def score_all():
+            columns.value_scores()
+            columns.recommendation_scores(weights)
+
+        _, vector_ms = timed(score_all)
+        results.append({
+            "credits": size,
+            "profiles": len(profiles),
+            "python_ms": python_ms,
+            "vector_column_build_ms": build_ms,
+            "vector_score_ms": vector_ms,
+            "speedup_scoring_only": round(python_ms / max(vector_ms, 1e-6), 1),
+            "speedup_including_build": round(python_ms / max(build_ms + vector_ms, 1e-6), 1),
+        })
+    print(json.dumps({"equivalent": True, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
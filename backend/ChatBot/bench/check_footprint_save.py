@@ -0,0 +1,108 @@
+# Footprint save check: invalid footprints are rejected before any write, stored saves never fail
+#
+# Usage (from backend/ChatBot):
+#   python -m bench.check_footprint_save
+#
+# Runs offline: /footprint/save is driven through the Flask test client on the
+# in-memory stand-in in bench/mongo_standin.py. Each rejected payload must get
+# a 400 from /footprint/save and leave no footprint, history row or rollup
+# behind, and /footprint/bulk must report it as a failed line. A valid save
+# must store one footprint, one history row and a formattable cache entry.
+# A cache formatting failure must still leave a 200 with its history row and
+# no cache entry. Exits 1 on any failure.
+
+import json
+import sys
+
+import bench.common  # noqa: F401  (adds backend/ChatBot to sys.path)
+
+VALID = {
+    "totalEmissions": 6.5,
+    "dominantSector": "Transport",
+    "suggestedCredits": 7,
+    "treeEquivalent": 300,
+    "breakdown": [
+        {"name": "Transport", "value": 4.0, "percentage": 61.5},
+        {"name": "Food", "value": 2.5, "percentage": 38.5},
+    ],
+}
+
+
+def with_breakdown(**item):
+    return {**VALID, "breakdown": [{"name": "Transport", "value": 4.0, "percentage": 61.5, **item}]}
+
+
+REJECTED = {
+    "total_emissions_null": {**VALID, "totalEmissions": None},
+    "total_emissions_string": {**VALID, "totalEmissions": "6.5"},
+    "suggested_credits_negative": {**VALID, "suggestedCredits": -1},
+    "breakdown_value_null": with_breakdown(value=None),
+    "breakdown_value_string": with_breakdown(value="4"),
+    "breakdown_percentage_string": with_breakdown(percentage="61.5"),
+    "breakdown_percentage_null": with_breakdown(percentage=None),
+    "breakdown_item_not_object": {**VALID, "breakdown": ["Transport"]},
+}
+
+
+def main():
+    from bench import mongo_standin
+
+    mongo_standin.install()
+    import api
+    from utils.db import get_db
+    from utils.user_context_cache import get_user_context_cache
+
+    db = get_db()
+    client = api.app.test_client()
+    cache = get_user_context_cache()
+    results = {}
+    problems = []
+
+    def written(user_id):
+        return {
+            "footprints": db.user_footprints.count_documents({"user_id": user_id}),
+            "history": db.footprint_history.count_documents({"user_id": user_id}),
+            "rollups": db.footprint_rollups.count_documents({"key": user_id}),
+        }
+
+    for name, footprint_data in REJECTED.items():
+        user_id = f"check-{name}"
+        response = client.post("/footprint/save", json={"user_id": user_id, "footprint_data": footprint_data})
+        line = json.dumps({"user_id": user_id, "footprint_data": footprint_data})
+        bulk = client.post("/footprint/bulk", data=line + "\n", content_type="application/x-ndjson")
+        summary = json.loads(bulk.get_data(as_text=True).splitlines()[-1])["summary"]
+        results[name] = {"status": response.status_code, "bulk_failed": summary["failed"], **written(user_id)}
+        if response.status_code != 400 or any(written(user_id).values()) or summary["failed"] != 1:
+            problems.append(f"{name}: {results[name]}")
+
+    response = client.post("/footprint/save", json={"user_id": "check-valid", "footprint_data": VALID})
+    context = cache.get("check-valid") if cache else None
+    results["valid"] = {"status": response.status_code, "cached": context is not None, **written("check-valid")}
+    if response.status_code != 200 or written("check-valid") != {"footprints": 1, "history": 1, "rollups": 2} or \
+            (cache and not (context and context.footprint_text)):
+        problems.append(f"valid: {results['valid']}")
+
+    if cache is not None:
+        # A document that passed validation but still cannot be formatted must not fail the save
+        def broken(footprint):
+            raise TypeError("cannot format")
+
+        cache._format, formatter = broken, cache._format
+        try:
+            response = client.post("/footprint/save", json={"user_id": "check-unformattable", "footprint_data": VALID})
+        finally:
+            cache._format = formatter
+        context = cache.get("check-unformattable")
+        results["unformattable"] = {"status": response.status_code, "cached": context is not None,
+                                    **written("check-unformattable")}
+        if response.status_code != 200 or context is not None or written("check-unformattable")["history"] != 1:
+            problems.append(f"unformattable: {results['unformattable']}")
+
+    results["problems"] = problems
+    print(json.dumps(results, indent=2))
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
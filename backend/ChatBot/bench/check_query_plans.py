@@ -0,0 +1,235 @@
+# Query-plan diagnostic: lists data access queries whose plan falls back to a collection scan
+#
+# Not yet run against a real MongoDB, so it is not a verified regression
+# guard: a first run must exit 0 with the registered indexes and exit 1 with
+# --skip-indexes before anything relies on it.
+#
+# Needs a reachable MongoDB. The check seeds and then drops its own database:
+#   MONGODB_URI=mongodb://localhost:27017 python -m bench.check_query_plans --scale 20000
+#   ... python -m bench.check_query_plans --skip-indexes   # shows the failures it catches
+#
+# It records every command that utils/data_store.py, utils/footprint_history.py,
+# utils/footprint_bulk.py and utils/catalog_query.py send, through a pymongo CommandListener, while
+# calling each of their functions. It then explains every distinct query shape.
+# The check exits 1 if any filtered query's winning plan contains a COLLSCAN.
+# Unfiltered reads that return a whole collection (the catalog loads) scan by
+# design and are listed as full loads. A query whose explain has no winning
+# plan also fails the check, so a server without a query planner cannot pass.
+
+import argparse
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+
+from bson.son import SON
+from pymongo import monitoring
+
+import bench.common  # noqa: F401  (adds backend/ChatBot to sys.path)
+from bench.common import use_scratch_database
+
+# Commands whose plans are checked, and where each keeps its filter
+FILTER_PATHS = {
+    "find": lambda c: c.get("filter", {}),
+    "findAndModify": lambda c: c.get("query", {}),
+    "update": lambda c: c["updates"][0].get("q", {}),
+    "delete": lambda c: c["deletes"][0].get("q", {}),
+    "count": lambda c: c.get("query", {}),
+    "aggregate": lambda c: next((s["$match"] for s in c.get("pipeline", []) if "$match" in s), {}),
+}
+SESSION_FIELDS = {"lsid", "txnNumber", "$clusterTime", "$db", "$readPreference", "writeConcern", "readConcern"}
+
+
+class CommandRecorder(monitoring.CommandListener):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.step = "setup"
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name in FILTER_PATHS:
+            command = {k: v for k, v in event.command.items() if k not in SESSION_FIELDS}
+            with self._lock:
+                self.commands.append((self.step, event.command_name, command))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def shape(value):
+    """Query shape: field names and operators, with values replaced."""
+    if isinstance(value, dict):
+        return {k: shape(v) for k, v in sorted(value.items())}
+    if isinstance(value, list):
+        return [shape(v) for v in value[:1]]
+    return "?"
+
+
+def explainable(name: str, command: dict) -> SON:
+    command = SON(command)
+    # Explain covers one write statement; the first one stands for the batch
+    if name == "update":
+        command["updates"] = command["updates"][:1]
+    elif name == "delete":
+        command["deletes"] = command["deletes"][:1]
+    return SON([("explain", command), ("verbosity", "queryPlanner")])
+
+
+def plan_stages(plan) -> list:
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for key in ("inputStage", "queryPlan", "winningPlan"):
+            stages.extend(plan_stages(plan.get(key)))
+        for child in plan.get("inputStages", []):
+            stages.extend(plan_stages(child))
+    return stages
+
+
+def winning_plan(explain: dict) -> dict:
+    planner = explain.get("queryPlanner")
+    if planner is None:
+        # aggregate explains nest the planner under the first stage
+        for stage in explain.get("stages", []):
+            planner = stage.get("$cursor", {}).get("queryPlanner")
+            if planner:
+                break
+    return (planner or {}).get("winningPlan", {})
+
+
+def seed_large_dataset(db, scale: int) -> None:
+    from data.marketplace_data import MARKETPLACE_CREDITS
+    from data.seller_profiles import SELLER_PROFILES
+    from utils.footprint_history import history_entry, record_history
+
+    # Seeding gives the module-level seed dicts an _id, so copy without it
+    template_credits = [{k: v for k, v in credit.items() if k != "_id"} for credit in MARKETPLACE_CREDITS]
+    template_seller = {k: v for k, v in next(iter(SELLER_PROFILES.values())).items() if k != "_id"}
+    db.credits.insert_many([
+        dict(template_credits[i % len(template_credits)], credit_id=f"CR-S{i}", seller_id=f"S-S{i % 500}",
+             price_usd=round(5 + (i * 7919 % 4000) / 100, 2), demand_score=i * 31 % 100)
+        for i in range(scale)
+    ])
+    db.sellers.insert_many([dict(template_seller, seller_id=f"S-S{i}") for i in range(scale)])
+    db.users.insert_many([{"profile_key": f"profile-{i}", "name": f"User {i}"} for i in range(scale)])
+
+    start = datetime(2025, 1, 1)
+    footprints, history = [], []
+    for i in range(scale):
+        recorded_at = start + timedelta(hours=7 * i)
+        document = {"user_id": f"user-{i % (scale // 4 or 1)}", "totalEmissions": float(i % 40),
+                    "timestamp": recorded_at.isoformat()}
+        history.append(history_entry(document, recorded_at, f"org-{i % 50}"))
+        if i < scale // 4:
+            footprints.append(document)
+    db.user_footprints.insert_many(footprints)
+    for offset in range(0, len(history), 1000):
+        record_history(history[offset:offset + 1000], db)
+
+
+def exercise_data_access(recorder: CommandRecorder) -> None:
+    from utils import data_store, footprint_history
+    from utils.catalog_query import CREDITS, SELLERS, query_listing
+    from utils.db import bump_data_version, get_data_version
+    from utils.footprint_bulk import ingest_footprints
+
+    line = json.dumps({"user_id": "user-7", "org_id": "org-1", "footprint_data": {"totalEmissions": 3.5}}).encode()
+    steps = [
+        ("data_store.get_credits", data_store.get_credits),
+        ("data_store.get_sellers", data_store.get_sellers),
+        ("data_store.get_users", data_store.get_users),
+        ("data_store.get_theory", data_store.get_theory),
+        ("data_store.get_session_profile", lambda: data_store.get_session_profile("buyer")),
+        ("data_store.get_user_footprint", lambda: data_store.get_user_footprint("user-3")),
+        ("data_store.get_user_footprint_safe(trend)", lambda: data_store.get_user_footprint_safe("user-3", "my trend over time")),
+        ("data_store.save_user_footprint", lambda: data_store.save_user_footprint("user-5", {"totalEmissions": 4.0}, "org-2")),
+        ("footprint_history.get_footprint_history", lambda: footprint_history.get_footprint_history(
+            "user-3", datetime(2025, 2, 1), datetime(2025, 9, 1))),
+        ("footprint_history.get_rollups(user)", lambda: footprint_history.get_rollups("user", "user-3", "month", "2025-01", "2025-12")),
+        ("footprint_history.get_rollups(org)", lambda: footprint_history.get_rollups("org", "org-3", "year")),
+        ("footprint_history.get_recent_rollups", lambda: footprint_history.get_recent_rollups("user", "user-3")),
+        ("catalog_query(credits)", lambda: query_listing(CREDITS, {"limit": "20"})),
+        ("catalog_query(credits, price sort)", lambda: query_listing(CREDITS, {
+            "sort": "-price_usd", "min_price": "10", "fields": "credit_id,price_usd"})),
+        ("catalog_query(credits, project_type)", lambda: query_listing(CREDITS, {
+            "project_type": "Solar,Wind", "max_price": "40", "sort": "price_usd"})),
+        ("catalog_query(credits, seller_id)", lambda: query_listing(CREDITS, {"seller_id": "S-S7"})),
+        ("catalog_query(credits, sdg)", lambda: query_listing(CREDITS, {"sdg": "SDG 13", "min_demand": "50"})),
+        ("catalog_query(credits, next page)", lambda: query_listing(CREDITS, {
+            "sort": "demand_score", "cursor": query_listing(CREDITS, {"sort": "demand_score"}).next_cursor})),
+        ("catalog_query(sellers)", lambda: query_listing(SELLERS, {"sort": "-trust_score", "min_trust": "80"})),
+        ("catalog_query(sellers, verification_status)", lambda: query_listing(SELLERS, {
+            "verification_status": "Verified"})),
+        ("footprint_bulk.ingest_footprints", lambda: list(ingest_footprints([line, line.replace(b"user-7", b"user-8")]))),
+        ("db.get_data_version", get_data_version),
+        ("db.bump_data_version", bump_data_version),
+    ]
+    for name, call in steps:
+        recorder.step = name
+        call()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when a data access query falls back to a collection scan")
+    parser.add_argument("--scale", type=int, default=20_000, help="documents per seeded collection")
+    parser.add_argument("--db-name", default="chatbot_query_plans", help="scratch database, dropped afterwards")
+    parser.add_argument("--skip-indexes", action="store_true", help="drop the registry's indexes first")
+    args = parser.parse_args()
+
+    if not os.getenv("MONGODB_URI"):
+        sys.exit("MONGODB_URI must point at a MongoDB server (explain is not available in-memory)")
+    use_scratch_database(args.db_name)
+
+    recorder = CommandRecorder()
+    from utils import db as db_module
+
+    db_module.register_event_listener(recorder)
+    db = db_module.get_db()
+    db.client.drop_database(args.db_name)
+    try:
+        db_module.run_migrations()
+        seed_large_dataset(db, args.scale)
+        if args.skip_indexes:
+            for spec in db_module.INDEXES:
+                db[spec.collection].drop_index(spec.name)
+
+        recorder.commands.clear()
+        exercise_data_access(recorder)
+
+        seen, report, failures = set(), [], 0
+        for step, name, command in list(recorder.commands):
+            collection = command[name]
+            query = FILTER_PATHS[name](command)
+            key = (step, name, collection, json.dumps(shape(query), sort_keys=True))
+            if key in seen:
+                continue
+            seen.add(key)
+            stages = plan_stages(winning_plan(db.command(explainable(name, command))))
+            if not stages:
+                # No query planner behind the server (an in-memory stand-in): nothing was checked
+                status = "no_plan"
+                failures += 1
+            elif "COLLSCAN" not in stages:
+                status = "indexed"
+            elif not query:
+                status = "full_load"
+            else:
+                status = "COLLSCAN"
+                failures += 1
+            report.append({"caller": step, "command": name, "collection": collection,
+                           "filter": shape(query), "stages": stages, "status": status})
+    finally:
+        db.client.drop_database(args.db_name)
+
+    print(json.dumps({"scale": args.scale, "queries": len(report), "failures": failures, "plans": report}, indent=2))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# Equivalence check: the NumPy columnar scores must match utils/scoring.py
+#
+# Usage (from backend/ChatBot):
+#   python -m bench.check_vector_scoring
+#
+# Runs without the benchmark and without MongoDB. Scores a clean synthetic
+# catalog plus edge cases where the two paths could drift: prices below 1
+# (and zero), credits missing price_usd, demand_score or emissions_offset_tons,
+# credits whose seller_id is not in the sellers, and sellers missing
+# trust_score or past_sales_volume. RankingIndex builds with the columns and
+# applies updates with the per-dict functions, so it also checks that a full
+# build and credit-by-credit upserts end with the same scores. Exits 1 on any
+# mismatch.
+
+import json
+import random
+import sys
+
+import numpy as np
+
+import bench.common  # noqa: F401  (adds backend/ChatBot to sys.path)
+from data.user_profiles import USER_PROFILES
+from utils.ranking_index import RankingIndex
+from utils.scoring import compute_recommendation_score, compute_trust_score, compute_value_score, recommendation_weights
+from utils.snapshot import MarketplaceSnapshot
+from utils.vector_scoring import CreditColumns, profile_weight_matrix, seller_trust_scores, top_k_indices
+
+PROJECT_TYPES = ["Solar", "Wind", "Forest Conservation", "Direct Air Capture", "Cookstove Efficiency"]
+
+
+def synthetic_catalog(n_credits: int, n_sellers: int = 500, seed: int = 7):
+    rng = random.Random(seed)
+    sellers = {
+        f"S-{i}": {
+            "name": f"Seller {i}",
+            "trust_score": rng.randint(50, 99),
+            "past_sales_volume": rng.randint(0, 20000),
+        }
+        for i in range(n_sellers)
+    }
+    seller_ids = list(sellers)
+    credits = [
+        {
+            "credit_id": f"CR-{i}",
+            "project_type": rng.choice(PROJECT_TYPES),
+            "price_usd": round(rng.uniform(0.5, 150.0), 2),
+            "demand_score": rng.randint(0, 100),
+            "emissions_offset_tons": rng.randint(10, 6000),
+            "seller_id": rng.choice(seller_ids),
+        }
+        for i in range(n_credits)
+    ]
+    return credits, sellers
+
+
+def edge_case_catalog():
+    sellers = {
+        "S-full": {"trust_score": 80, "past_sales_volume": 3200},
+        "S-capped": {"trust_score": 60, "past_sales_volume": 90000},
+        "S-no-trust": {"past_sales_volume": 1500},
+        "S-no-volume": {"trust_score": 70},
+        "S-empty": {},
+    }
+    base = {"price_usd": 10.0, "demand_score": 55, "emissions_offset_tons": 1200, "seller_id": "S-full"}
+    variants = [
+        {"price_usd": 0},
+        {"price_usd": 0.01},
+        {"price_usd": 0.3},
+        {"price_usd": 0.999},
+        {"price_usd": 1.0},
+        {"price_usd": 1.5},
+        {"price_usd": 42.0},
+        {"price_usd": 0.5, "drop": ["demand_score"]},
+        {"price_usd": 0.5, "drop": ["emissions_offset_tons"]},
+        {"drop": ["price_usd"]},
+        {"drop": ["price_usd", "demand_score", "emissions_offset_tons"]},
+        {"price_usd": 12.0, "seller_id": "S-unknown"},
+        {"price_usd": 0.2, "seller_id": "S-unknown", "drop": ["demand_score"]},
+        {"price_usd": 3.0, "seller_id": "S-capped"},
+        {"price_usd": 3.0, "seller_id": "S-no-trust"},
+        {"price_usd": 3.0, "seller_id": "S-no-volume"},
+        {"price_usd": 0.7, "seller_id": "S-empty"},
+        {"price_usd": 8.0, "demand_score": 0, "emissions_offset_tons": 0},
+        {"price_usd": 5.0, "demand_score": 55.5, "emissions_offset_tons": 1200.25},
+    ]
+    credits = []
+    for i, variant in enumerate(variants):
+        variant = dict(variant)
+        credit = {"credit_id": f"EDGE-{i}", **base}
+        for field in variant.pop("drop", []):
+            credit.pop(field)
+        credit.update(variant)
+        credits.append(credit)
+    return credits, sellers
+
+
+def compare(credits, sellers, profiles):
+    """Return a list of the scores where the columnar path disagrees with utils/scoring.py."""
+    problems = []
+    columns = CreditColumns.from_catalog(credits, sellers)
+    _, weights = profile_weight_matrix(profiles)
+
+    value = [compute_value_score(c) for c in credits]
+    v_value = columns.value_scores()
+    for credit, expected, got in zip(credits, value, v_value.tolist()):
+        if expected != got:
+            problems.append(f"value {credit['credit_id']}: {expected} != {got}")
+
+    trust = [compute_trust_score(s) for s in sellers.values()]
+    for seller_id, expected, got in zip(sellers, trust, seller_trust_scores(list(sellers.values())).tolist()):
+        if not np.isclose(expected, got, rtol=0, atol=1e-12):
+            problems.append(f"trust {seller_id}: {expected} != {got}")
+
+    v_recs = columns.recommendation_scores(weights)
+    for row, (profile_key, profile) in enumerate(profiles.items()):
+        profile_weights = recommendation_weights(profile)
+        for col, credit in enumerate(credits):
+            expected = compute_recommendation_score(credit, sellers.get(credit["seller_id"], {}), profile_weights)
+            got = v_recs[row, col]
+            if not np.isclose(expected, got, rtol=1e-12, atol=1e-9):
+                problems.append(f"recommendation {profile_key}/{credit['credit_id']}: {expected} != {got}")
+
+    # Top-k must agree with a full Python sort
+    k = min(10, len(credits))
+    expected = sorted(range(len(credits)), key=lambda i: value[i], reverse=True)[:k]
+    if [value[i] for i in expected] != v_value[top_k_indices(v_value, k)].tolist():
+        problems.append("top_k_indices does not match a full sort by value")
+    return problems
+
+
+def compare_ranking_index(credits, sellers, profiles):
+    """A vectorized build and per-dict upserts of the same catalog must give the same scores."""
+    problems = []
+    built = RankingIndex()
+    built.build(MarketplaceSnapshot(1, credits, sellers, profiles, {}))
+    updated = RankingIndex()
+    for profile_key, profile in profiles.items():
+        updated.upsert_profile(profile_key, profile)
+    for seller_id, seller in sellers.items():
+        updated.upsert_seller(seller_id, seller)
+    for credit in credits:
+        updated.upsert_credit(credit)
+
+    pairs = [("value", built.value, updated.value), ("demand", built.demand, updated.demand)]
+    pairs += [(f"recommendation {k}", built.recommendations[k], updated.recommendations[k]) for k in profiles]
+    for name, a, b in pairs:
+        for credit in credits:
+            key = credit["credit_id"]
+            if not np.isclose(a.score(key), b.score(key), rtol=1e-12, atol=1e-9):
+                problems.append(f"index {name} {key}: build {a.score(key)} != upsert {b.score(key)}")
+    return problems
+
+
+def main():
+    profiles = dict(USER_PROFILES)
+    results = {}
+    problems = []
+    for name, (credits, sellers) in (("synthetic", synthetic_catalog(2_000)), ("edge_cases", edge_case_catalog())):
+        found = compare(credits, sellers, profiles) + compare_ranking_index(credits, sellers, profiles)
+        results[name] = {"credits": len(credits), "sellers": len(sellers), "mismatches": len(found)}
+        problems += [f"{name}: {p}" for p in found]
+    results["problems"] = problems[:50]
+    print(json.dumps(results, indent=2))
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Shared helpers for the offline benchmark scripts
+
+import json
+import os
+import sys
+from typing import Dict, List
+
+# Bench scripts only run as `python -m bench.<script>` from backend/ChatBot: a
+# direct `python bench/<script>.py` fails on its first `import bench...`, before
+# this module could fix sys.path. CHATBOT_DIR is also the working directory of
+# the subprocesses the load benchmarks start.
+CHATBOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if CHATBOT_DIR not in sys.path:
+    sys.path.insert(0, CHATBOT_DIR)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Default MONGODB_DB_NAME in config.py: the database the chatbot itself serves from
+APP_DB_NAME = "green_earth_chatbot"
+
+
+def load_jsonl(name: str) -> List[Dict]:
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def latency_summary(samples_ms: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(samples_ms),
+        "p50_ms": round(percentile(samples_ms, 50), 3),
+        "p95_ms": round(percentile(samples_ms, 95), 3),
+        "p99_ms": round(percentile(samples_ms, 99), 3),
+        "max_ms": round(max(samples_ms), 3) if samples_ms else 0.0,
+    }
+
+
+def use_scratch_database(name: str) -> None:
+    """Point the chatbot's Mongo client at the scratch database `name`.
+
+    For benchmarks that delete or replace documents: they write to their own
+    database even when MONGODB_DB_NAME is exported for the app, and refuse to
+    run against the app's database. Must run before `config` is imported.
+    """
+    if "config" in sys.modules:
+        raise RuntimeError("use_scratch_database() must be called before importing config")
+    if name == APP_DB_NAME:
+        sys.exit(f"Refusing to write benchmark data to the application database {name!r}; pass another --db-name")
+    os.environ["MONGODB_DB_NAME"] = name
+
+
+def point_groq_at(base_url: str) -> None:
+    """Route the chatbot's Groq client to a local fake server.
+
+    Must run before `config` is imported, since settings are read at import time.
+    """
+    if "config" in sys.modules:
+        raise RuntimeError("point_groq_at() must be called before importing config")
+    os.environ["GROQ_BASE_URL"] = base_url
+    os.environ.setdefault("GROQ_API_KEY", "fake-key")
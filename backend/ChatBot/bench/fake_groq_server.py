@@ -0,0 +1,257 @@
+# Local fake of the OpenAI-compatible Groq chat completions API
+#
+# Used by the benchmark scripts so connection reuse, retries and latency can be
+# measured offline. Run standalone with:
+#   python -m bench.fake_groq_server --port 8808 --latency-ms 200
+# and point the chatbot at it with GROQ_BASE_URL=http://127.0.0.1:8808
+
+import argparse
+import json
+import random
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+
+
+class _Server(ThreadingHTTPServer):
+    # Load tests open hundreds of connections at once; the default backlog of 5 drops SYNs
+    request_queue_size = 1024
+
+
+def default_responder(messages: List[Dict]) -> str:
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    user = next((m["content"] for m in messages if m["role"] == "user"), "")
+    if "routing agent" in system:
+        return json.dumps({"label": "general", "reason": "fake router"})
+    if "Context by label" in user:
+        answer = "Fake answer: " + user.splitlines()[0][:120]
+        return json.dumps({"label": "general", "reason": "fake router", "answer": answer})
+    return "Fake answer: " + user.splitlines()[0][:120]
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class FakeGroqServer:
+    """Threaded HTTP/1.1 server speaking the chat completions protocol.
+
+    latency_ms / jitter_ms: added before each response.
+    error_rate / error_status: random failures (e.g. 429 or 503).
+    fail_first: number of initial requests that fail with error_status.
+    token_delay_ms: generation time per word. Streamed responses send a chunk
+    per word after latency_ms; non-streamed ones wait for the whole answer.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        fail_first: int = 0,
+        retry_after_ms: int = 10,
+        responder: Optional[Callable[[List[Dict]], str]] = None,
+        token_delay_ms: float = 0.0,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.fail_first = fail_first
+        self.retry_after_ms = retry_after_ms
+        self.responder = responder or default_responder
+        self.token_delay_ms = token_delay_ms
+        self._lock = threading.Lock()
+        self.reset_counters()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out in separate writes; without this Nagle's
+                # algorithm holds the body back until the client's delayed ACK
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                # One handler instance serves one TCP connection (keep-alive loop)
+                with server._lock:
+                    server.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                server._handle(self)
+
+        self._httpd = _Server((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.connections = 0
+            self.requests = 0
+            self.errors = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"connections": self.connections, "requests": self.requests, "errors": self.errors}
+
+    def start(self) -> "FakeGroqServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeGroqServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            fail = self.requests <= self.fail_first or random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+            return fail
+
+    def _handle(self, handler: BaseHTTPRequestHandler) -> None:
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = json.loads(handler.rfile.read(length) or b"{}")
+
+        if handler.path != COMPLETIONS_PATH:
+            self._send_json(handler, 404, {"error": {"message": "not found"}})
+            return
+
+        delay = self.latency_ms + (random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay:
+            time.sleep(delay / 1000.0)
+
+        if self._should_fail():
+            headers = {"retry-after-ms": str(self.retry_after_ms)}
+            self._send_json(handler, self.error_status, {"error": {"message": "fake failure"}}, headers)
+            return
+
+        messages = body.get("messages", [])
+        content = self.responder(messages)
+        prompt_tokens = sum(_estimate_tokens(m.get("content", "")) for m in messages)
+        completion_tokens = _estimate_tokens(content)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        pieces = re.findall(r"\S+\s*", content) or [content]
+        if body.get("stream"):
+            self._send_stream(handler, body.get("model", "fake"), pieces, usage)
+            return
+        if self.token_delay_ms:
+            time.sleep(self.token_delay_ms * (len(pieces) - 1) / 1000.0)
+        payload = {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+            ],
+            "usage": usage,
+        }
+        self._send_json(handler, 200, payload)
+
+    def _send_stream(self, handler: BaseHTTPRequestHandler, model: str, pieces: List[str], usage: Dict) -> None:
+        # OpenAI-style SSE chunks over chunked transfer encoding, so the connection stays reusable
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        def chunk(delta: Dict, finish_reason: Optional[str] = None, extra: Optional[Dict] = None) -> Dict:
+            event = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            event.update(extra or {})
+            return event
+
+        events = [chunk({"role": "assistant", "content": ""})]
+        events += [chunk({"content": piece}) for piece in pieces]
+        events.append(chunk({}, "stop", {"x_groq": {"usage": usage}}))
+        for i, event in enumerate(events):
+            if i > 1 and self.token_delay_ms:
+                time.sleep(self.token_delay_ms / 1000.0)
+            self._write_chunk(handler, "data: " + json.dumps(event) + "\n\n")
+        self._write_chunk(handler, "data: [DONE]\n\n")
+        handler.wfile.write(b"0\r\n\r\n")
+
+    @staticmethod
+    def _write_chunk(handler: BaseHTTPRequestHandler, text: str) -> None:
+        data = text.encode("utf-8")
+        handler.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    @staticmethod
+    def _send_json(handler: BaseHTTPRequestHandler, status: int, payload: Dict, headers: Optional[Dict] = None):
+        data = json.dumps(payload).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the fake Groq chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--token-delay-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+
+    server = FakeGroqServer(
+        host=args.host,
+        port=args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        token_delay_ms=args.token_delay_ms,
+    )
+    print(f"Fake Groq server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
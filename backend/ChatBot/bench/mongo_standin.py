@@ -0,0 +1,38 @@
+# In-memory MongoDB stand-in for the offline benchmarks (mongomock, a bench-only dependency)
+#
+#   pip install mongomock
+#
+# install() must run before anything calls utils.db.get_client(); the chatbot
+# then reads and writes a mongomock client instead of a server. Command
+# monitoring does not fire, so mongo_command_seconds stays empty.
+
+import os
+
+import bench.common  # noqa: F401  (adds backend/ChatBot to sys.path)
+
+
+def _accept_unsorted(method):
+    # pymongo >= 4.11 passes sort=None for every UpdateOne/ReplaceOne; mongomock 4.3 has no such argument
+    def wrapper(self, *args, sort=None, **kwargs):
+        if sort is not None:
+            raise NotImplementedError("mongomock does not support sort in bulk updates")
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+def install():
+    """Point utils.db at a fresh in-memory client and return it."""
+    import mongomock
+    from mongomock.collection import BulkOperationBuilder
+
+    if not getattr(BulkOperationBuilder, "_sort_compat", False):
+        BulkOperationBuilder.add_update = _accept_unsorted(BulkOperationBuilder.add_update)
+        BulkOperationBuilder.add_replace = _accept_unsorted(BulkOperationBuilder.add_replace)
+        BulkOperationBuilder._sort_compat = True
+
+    # config requires a URI to be set; nothing connects to it
+    os.environ.setdefault("MONGODB_URI", "mongodb://standin")
+    from utils import db
+
+    db._client = mongomock.MongoClient()
+    return db._client
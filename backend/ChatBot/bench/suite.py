@@ -0,0 +1,421 @@
+# Offline benchmark suite: HTTP load per endpoint plus microbenchmarks, saved as JSON
+#
+# Usage (from backend/ChatBot):
+#   python -m bench.suite --concurrency 32 --requests 300 --llm-latency-ms 50 --catalog-size 1000
+#   python -m bench.suite --skip-load --sizes 100 1000 10000 --compare bench/results/suite-20260101-120000.json
+#
+# Needs nothing outside this machine. The fake Groq server (--llm-latency-ms,
+# --llm-error-rate) and the Flask API run as separate processes, so the load
+# generator does not share a GIL with either. Without MONGODB_URI the API
+# reads and writes the in-memory stand-in in bench/mongo_standin.py. With it,
+# the API uses the --db-name database (a scratch one, since the catalog is
+# replaced), never MONGODB_DB_NAME; the application's database is refused.
+#
+# Each scenario sends --requests requests at --concurrency and reports
+# throughput, p50/p95/p99 latency and failures. /chat is driven once per intent
+# (so the general one adds an LLM router call), and a reply for another
+# intent counts as a failure. The footprint scenarios run in order, so
+# reads find the users the saves wrote.
+#
+# Microbenchmarks run in this process on a seeded catalog of each --sizes:
+# rank_credits over the catalog, build_recommendations and build_insights
+# after the ranking index has synced with the snapshot, and safe_parse_json
+# on clean, prose-wrapped and truncated model output of that many credits.
+#
+# Results go to --output (default bench/results/suite-<timestamp>.json).
+# --compare prints the change against an earlier results file.
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import httpx
+from httpx_aiohttp import HttpxAiohttpClient
+
+from bench.common import CHATBOT_DIR, latency_summary, use_scratch_database
+
+RESULTS_DIR = os.path.join(CHATBOT_DIR, "bench", "results")
+
+# Messages per intent. All but the general ones are routed by the local classifier;
+# those reach the LLM router, which the fake server answers with `general`.
+CHAT_MESSAGES = {
+    "market_analysis": ["which credits have the highest demand", "show me marketplace prices for solar credits"],
+    "recommendation": ["recommend credits for my startup", "what should an ngo buy"],
+    "emissions": ["how much co2 do 10 credits of CR-003 offset", "what is the impact of 40 credits of CR-001"],
+    "theory": ["what is sdg 13", "explain additionality"],
+    "insights": ["give me insights on market trends", "which sellers are most trustworthy"],
+    "general": ["hello", "thanks"],
+}
+PROJECT_TYPES = ["Solar", "Wind", "Forest Conservation", "Direct Air Capture", "Cookstove Efficiency",
+                 "Mangrove Restoration", "Methane Capture"]
+SDGS = ["SDG 3", "SDG 6", "SDG 7", "SDG 8", "SDG 11", "SDG 13", "SDG 14", "SDG 15"]
+SECTORS = ["transport", "energy", "food", "waste", "travel"]
+
+
+def scaled_catalog(n_credits: int, seed: int = 23):
+    """The seed catalog plus synthetic credits up to `n_credits`, one seller per ten credits."""
+    from data.marketplace_data import MARKETPLACE_CREDITS
+    from data.seller_profiles import SELLER_PROFILES
+
+    rng = random.Random(seed)
+    sellers = {seller_id: dict(profile) for seller_id, profile in SELLER_PROFILES.items()}
+    for i in range(max(0, n_credits - len(MARKETPLACE_CREDITS)) // 10):
+        sellers[f"S-{1000 + i}"] = {
+            "name": f"Seller {1000 + i}",
+            "past_sales_volume": rng.randint(0, 20000),
+            "trust_score": rng.randint(50, 99),
+            "verification_status": rng.choice(["Verified", "Verified", "Pending"]),
+            "past_performance": "Synthetic benchmark seller",
+        }
+    seller_ids = list(sellers)
+    credits = [dict(c) for c in MARKETPLACE_CREDITS]
+    for i in range(len(credits), n_credits):
+        credits.append({
+            "credit_id": f"CR-{i + 1:06d}",
+            "project_type": rng.choice(PROJECT_TYPES),
+            "price_usd": round(rng.uniform(0.5, 150.0), 2),
+            "demand_score": rng.randint(0, 100),
+            "emissions_offset_tons": rng.randint(10, 6000),
+            "location": "Synthetic",
+            "sdg_tags": rng.sample(SDGS, 2),
+            "seller_id": rng.choice(seller_ids),
+        })
+    return credits, sellers
+
+
+def seed_catalog(n_credits: int) -> None:
+    """Seed the database, then replace the catalog with a scaled one and bump the data version."""
+    from utils.db import bump_data_version, get_db, run_migrations
+
+    run_migrations()
+    credits, sellers = scaled_catalog(n_credits)
+    db = get_db()
+    db.credits.delete_many({})
+    db.sellers.delete_many({})
+    db.credits.insert_many(credits)
+    db.sellers.insert_many([{"seller_id": seller_id, **profile} for seller_id, profile in sellers.items()])
+    bump_data_version(db)
+
+
+def connect_database() -> str:
+    if os.getenv("MONGODB_URI"):
+        return "mongodb"
+    from bench import mongo_standin
+
+    mongo_standin.install()
+    return "mongomock"
+
+
+def serve(args) -> None:
+    from bench.bench_async_load import serve_wsgi
+
+    connect_database()
+    seed_catalog(args.catalog_size)
+    import api
+
+    serve_wsgi(api.app, args.port, args.flask_threads)
+
+
+def footprint(rng):
+    # Same shape as the footprint calculator's output
+    values = {sector: round(rng.uniform(0.1, 8.0), 2) for sector in SECTORS}
+    total = round(sum(values.values()), 2)
+    return {
+        "totalEmissions": total,
+        "dominantSector": max(values, key=values.get),
+        "suggestedCredits": round(total),
+        "breakdown": [{"name": sector, "value": value, "percentage": round(value / total * 100, 1)}
+                      for sector, value in values.items()],
+        "mode": "individual",
+    }
+
+
+def scenarios(args):
+    """(name, method, path or factory, json factory, check) for every scenario, in run order."""
+    rng = random.Random(5)
+    users = [f"bench-user-{i}" for i in range(args.users)]
+    user = lambda i: users[i % len(users)]
+    bulk_size = 50
+
+    def chat(intent):
+        messages = CHAT_MESSAGES[intent]
+        body = lambda i: {"message": messages[i % len(messages)], "role": "buyer", "user_id": user(i)}
+        check = lambda response: response.json().get("intent") == intent
+        return (f"chat:{intent}", "POST", lambda i: "/chat", body, check)
+
+    def bulk_body(i):
+        lines = (json.dumps({"user_id": user(i * bulk_size + n), "footprint_data": footprint(rng)}) for n in range(bulk_size))
+        return "\n".join(lines) + "\n"
+
+    def bulk_check(response):
+        summary = json.loads(response.text.strip().rsplit("\n", 1)[-1])["summary"]
+        return summary["failed"] == 0
+
+    ok = lambda response: True
+    found = lambda response: response.json().get("status") == "success"
+    return [
+        *(chat(intent) for intent in CHAT_MESSAGES),
+        ("data:marketplace", "GET", lambda i: "/data/marketplace?sort=-demand_score&limit=50", None, ok),
+        ("data:marketplace_filtered", "GET",
+         lambda i: f"/data/marketplace?project_type={PROJECT_TYPES[i % len(PROJECT_TYPES)]}&max_price=60&limit=50", None, ok),
+        ("data:sellers", "GET", lambda i: "/data/sellers?sort=-trust_score&limit=50", None, ok),
+        ("data:theory", "GET", lambda i: "/data/theory", None, ok),
+        ("footprint:save", "POST", lambda i: "/footprint/save",
+         lambda i: {"user_id": user(i), "footprint_data": footprint(rng)}, found),
+        ("footprint:get", "GET", lambda i: f"/footprint/get/{user(i)}", None, found),
+        ("footprint:history", "GET", lambda i: f"/footprint/history/{user(i)}?limit=20", None, found),
+        ("footprint:rollups", "GET", lambda i: f"/footprint/rollups/user/{user(i)}?period=month", None, found),
+        (f"footprint:bulk_{bulk_size}", "POST_NDJSON", lambda i: "/footprint/bulk", bulk_body, bulk_check),
+    ]
+
+
+async def drive(client, scenario, concurrency: int, total: int):
+    name, method, path, body, check = scenario
+    latencies, failures, statuses = [], 0, {}
+    next_index = iter(range(total))
+
+    async def worker():
+        nonlocal failures
+        for i in next_index:
+            start = time.perf_counter()
+            try:
+                if method == "GET":
+                    response = await client.get(path(i))
+                elif method == "POST":
+                    response = await client.post(path(i), json=body(i))
+                else:
+                    response = await client.post(path(i), content=body(i), headers={"Content-Type": "application/x-ndjson"})
+                status = response.status_code
+                ok = status == 200 and check(response)
+            except (httpx.HTTPError, ValueError, KeyError):
+                status, ok = "error", False
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            failures += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": total,
+        "failures": failures,
+        "statuses": statuses,
+        "requests_per_sec": round(total / elapsed, 1),
+        "latency": latency_summary(latencies),
+    }
+
+
+async def run_scenarios(base_url: str, args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with HttpxAiohttpClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+        for scenario in scenarios(args):
+            if args.only and not any(scenario[0].startswith(prefix) for prefix in args.only):
+                continue
+            await drive(client, scenario, min(args.concurrency, 4), min(args.requests, 20))  # warm up
+            results[scenario[0]] = await drive(client, scenario, args.concurrency, args.requests)
+            print(f"{scenario[0]}: {results[scenario[0]]['requests_per_sec']} req/s, "
+                  f"p95 {results[scenario[0]]['latency']['p95_ms']} ms", file=sys.stderr)
+    return results
+
+
+def run_load(args):
+    from bench.bench_async_load import wait_ready
+
+    env = dict(os.environ)
+    env.update({
+        "GROQ_API_KEY": env.get("GROQ_API_KEY") or "fake-key",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{args.llm_port}",
+        "GROQ_MAX_CONNECTIONS": str(max(args.flask_threads, 20)),
+        # Every chat request should reach the (fake) LLM
+        "LLM_CACHE_ENABLED": "false",
+        "QUESTION_INDEX_ENABLED": "false",
+    })
+    fake_groq = ["bench.fake_groq_server", "--port", str(args.llm_port), "--latency-ms", str(args.llm_latency_ms),
+                 "--error-rate", str(args.llm_error_rate)]
+    server = ["bench.suite", "--serve", "--port", str(args.api_port), "--flask-threads", str(args.flask_threads),
+              "--catalog-size", str(args.catalog_size), "--db-name", args.db_name]
+    # The API prints a line per chat request; its stderr still shows errors
+    processes = [subprocess.Popen([sys.executable, "-m"] + command, cwd=CHATBOT_DIR, env=env, stdout=subprocess.DEVNULL)
+                 for command in (fake_groq, server)]
+    try:
+        base_url = f"http://127.0.0.1:{args.api_port}"
+        wait_ready(base_url + "/health", timeout=60.0)
+        return asyncio.run(run_scenarios(base_url, args))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def per_call(fn, rounds: int):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return round((time.perf_counter() - start) / rounds * 1e6, 2)
+
+
+def model_outputs(credits):
+    clean = json.dumps({"intent": "market_analysis", "credits": credits})
+    wrapped = "Here is the data you asked for:\n```json\n" + clean + "\n```\nLet me know if you need more."
+    return {"clean": clean, "wrapped": wrapped, "truncated": clean[: len(clean) // 2]}
+
+
+def run_micro(args):
+    from agents.insight_agent import build_insights
+    from agents.recommendation_agent import build_recommendations
+    from utils.helpers import safe_parse_json
+    from utils.ranking_index import get_ranking_index
+    from utils.scoring import rank_credits
+    from utils.snapshot import get_snapshot_store
+
+    results = []
+    for size in args.sizes:
+        seed_catalog(size)
+        start = time.perf_counter()
+        snapshot = get_snapshot_store().refresh()
+        load_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        get_ranking_index()
+        sync_ms = (time.perf_counter() - start) * 1000
+
+        credits = snapshot.credits
+        rounds = max(3, args.micro_rounds * 100 // max(size, 100))
+        profiles = list(snapshot.profiles)
+        outputs = model_outputs(credits)
+        parsed = {kind: len(safe_parse_json(text).get("credits", [])) for kind, text in outputs.items()}
+        if parsed["clean"] != size or parsed["wrapped"] != size or parsed["truncated"] != 0:
+            raise RuntimeError(f"safe_parse_json returned {parsed} for {size} credits")
+
+        results.append({
+            "credits": size,
+            "sellers": len(snapshot.sellers),
+            "snapshot_load_ms": round(load_ms, 2),
+            "ranking_index_sync_ms": round(sync_ms, 2),
+            "rank_credits_us": per_call(lambda: rank_credits(credits), rounds),
+            "build_recommendations_us": round(per_call(
+                lambda: [build_recommendations(key) for key in profiles], args.micro_rounds) / len(profiles), 2),
+            "build_insights_us": per_call(build_insights, args.micro_rounds),
+            "safe_parse_json_us": {kind: per_call(lambda: safe_parse_json(text), rounds) for kind, text in outputs.items()},
+            "model_output_bytes": len(outputs["clean"]),
+        })
+        print(f"micro {size}: done", file=sys.stderr)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=CHATBOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _change(old, new):
+    if not isinstance(old, (int, float)) or not isinstance(new, (int, float)) or not old:
+        return None
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def compare(old, new):
+    """Relative change of throughput, tail latency and microbenchmark times per scenario and size."""
+    changes = {}
+    for name, result in new.get("load", {}).items():
+        before = old.get("load", {}).get(name)
+        if before:
+            changes[name] = {
+                "requests_per_sec": _change(before["requests_per_sec"], result["requests_per_sec"]),
+                "p95_ms": _change(before["latency"]["p95_ms"], result["latency"]["p95_ms"]),
+                "p99_ms": _change(before["latency"]["p99_ms"], result["latency"]["p99_ms"]),
+            }
+    before_micro = {entry["credits"]: entry for entry in old.get("micro", [])}
+    for entry in new.get("micro", []):
+        before = before_micro.get(entry["credits"])
+        if before:
+            changed = {}
+            for key, value in entry.items():
+                if key == "safe_parse_json_us":
+                    for kind, us in value.items():
+                        changed[f"safe_parse_json_{kind}_us"] = _change(before.get(key, {}).get(kind), us)
+                elif key.endswith("_us"):
+                    changed[key] = _change(before.get(key), value)
+            changes[f"micro:{entry['credits']}"] = changed
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline load test and microbenchmarks")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=300, help="requests per scenario")
+    parser.add_argument("--only", nargs="*", help="scenario name prefixes to run, e.g. chat: footprint:get")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--catalog-size", type=int, default=1000, help="credits in the catalog the API serves")
+    parser.add_argument("--users", type=int, default=200, help="distinct users in the footprint scenarios")
+    parser.add_argument("--flask-threads", type=int, default=16)
+    parser.add_argument("--llm-port", type=int, default=18808)
+    parser.add_argument("--api-port", type=int, default=18010)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[100, 1_000, 10_000])
+    parser.add_argument("--micro-rounds", type=int, default=200)
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--output", help="results file (default bench/results/suite-<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--db-name", default="chatbot_bench_suite",
+                        help="scratch database used with MONGODB_URI; its catalog is replaced")
+    args = parser.parse_args()
+
+    # Before config is imported here or in the API process, which inherits it
+    if os.getenv("MONGODB_URI"):
+        use_scratch_database(args.db_name)
+    if args.serve:
+        serve(args)
+        return
+
+    started = datetime.now()
+    results = {
+        "meta": {
+            "started_at": started.isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": "mongodb" if os.getenv("MONGODB_URI") else "mongomock",
+            "args": {key: value for key, value in vars(args).items() if key not in {"serve", "port", "output", "compare"}},
+        },
+    }
+    if not args.skip_load:
+        results["load"] = run_load(args)
+    if not args.skip_micro:
+        connect_database()
+        results["micro"] = run_micro(args)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"suite-{started:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            results["compared_to"] = {"file": args.compare, "changes": compare(json.load(f), results)}
+    print(json.dumps(results, indent=2))
+    print(f"Saved to {output}", file=sys.stderr)
+
+    failures = sum(result["failures"] for result in results.get("load", {}).values())
+    # With injected LLM errors some failures are the point; Groq client retries absorb most
+    if failures and not args.llm_error_rate:
+        print(f"{failures} requests failed or answered with the wrong intent", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
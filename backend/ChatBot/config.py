@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 # Centralized model configuration
 MODEL_NAME = os.getenv("GROQ_MODEL", "groq/compound")
@@ -8,6 +9,99 @@ MAX_TOKENS = int(os.getenv("GROQ_MAX_TOKENS", "800"))
 # Groq API key (must be provided in environment)
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
+# Groq HTTP client: one pooled client per process
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "20"))
+GROQ_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+GROQ_READ_TIMEOUT = float(os.getenv("GROQ_READ_TIMEOUT", "60"))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "2"))
+
 # MongoDB configuration
 MONGODB_URI = os.getenv("MONGODB_URI")
 MONGODB_DB_NAME = os.getenv("MONGODB_DB_NAME", "green_earth_chatbot")
+
+# Router: minimum local classifier confidence before skipping the LLM router call
+ROUTER_CONFIDENCE_THRESHOLD = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.6"))
+
+# /chat: build context for the likeliest intents (and fetch the footprint) while the LLM router runs
+CHAT_PREFETCH_ENABLED = os.getenv("CHAT_PREFETCH_ENABLED", "true").lower() in {"1", "true", "yes"}
+CHAT_PREFETCH_INTENTS = int(os.getenv("CHAT_PREFETCH_INTENTS", "2"))
+# Shared by all chats; a request prefetches only what fits on the free workers, so raise it with server threads
+CHAT_PREFETCH_WORKERS = int(os.getenv("CHAT_PREFETCH_WORKERS", "8"))
+
+# Answer /chat with one LLM call that both routes and answers (falls back to two calls on bad output)
+ROUTE_AND_ANSWER = os.getenv("ROUTE_AND_ANSWER", "false").lower() in {"1", "true", "yes"}
+
+# Theory agent: estimated-token budget and passage count for retrieved theory context
+THEORY_CONTEXT_TOKENS = int(os.getenv("THEORY_CONTEXT_TOKENS", "600"))
+THEORY_TOP_K = int(os.getenv("THEORY_TOP_K", "5"))
+
+# Near-duplicate question index: reuse answers to reworded questions (same data version and role); opt-in
+QUESTION_INDEX_ENABLED = os.getenv("QUESTION_INDEX_ENABLED", "false").lower() in {"1", "true", "yes"}
+QUESTION_INDEX_THRESHOLD = float(os.getenv("QUESTION_INDEX_THRESHOLD", "0.9"))
+QUESTION_INDEX_MAX_ENTRIES = int(os.getenv("QUESTION_INDEX_MAX_ENTRIES", "5000"))
+QUESTION_INDEX_DIMENSIONS = int(os.getenv("QUESTION_INDEX_DIMENSIONS", "512"))
+
+# /footprint/bulk: records per unordered bulk_write, and the largest accepted NDJSON line
+FOOTPRINT_BULK_BATCH_SIZE = int(os.getenv("FOOTPRINT_BULK_BATCH_SIZE", "500"))
+FOOTPRINT_BULK_MAX_RECORD_BYTES = int(os.getenv("FOOTPRINT_BULK_MAX_RECORD_BYTES", "65536"))
+
+# Per-user context cache (latest footprint and its chat text); absent footprints are cached for less time
+USER_CONTEXT_CACHE_ENABLED = os.getenv("USER_CONTEXT_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}
+USER_CONTEXT_CACHE_MAX_ENTRIES = int(os.getenv("USER_CONTEXT_CACHE_MAX_ENTRIES", "10000"))
+USER_CONTEXT_CACHE_TTL_SECONDS = float(os.getenv("USER_CONTEXT_CACHE_TTL_SECONDS", "600"))
+USER_CONTEXT_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("USER_CONTEXT_CACHE_NEGATIVE_TTL_SECONDS", "60"))
+
+# Chat sessions: "memory" (per process) or "sqlite" (shared by the workers on one host, at SESSION_SQLITE_PATH)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+# Outside the working tree by default, so a run never leaves a database in the repo
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "green_earth_chat_sessions.db"))
+
+# Conversation memory: the last CONVERSATION_RECENT_TURNS turns verbatim, older ones folded into a rolling summary
+CONVERSATION_MEMORY_ENABLED = os.getenv("CONVERSATION_MEMORY_ENABLED", "true").lower() in {"1", "true", "yes"}
+CONVERSATION_RECENT_TURNS = int(os.getenv("CONVERSATION_RECENT_TURNS", "4"))
+CONVERSATION_SUMMARY_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "250"))
+CONVERSATION_SUMMARY_WORKERS = int(os.getenv("CONVERSATION_SUMMARY_WORKERS", "2"))
+# Estimated tokens of system prompt plus user prompt; history is trimmed to stay under it
+CONVERSATION_PROMPT_TOKEN_CEILING = int(os.getenv("CONVERSATION_PROMPT_TOKEN_CEILING", "3000"))
+CONVERSATION_MAX_ENTRIES = int(os.getenv("CONVERSATION_MAX_ENTRIES", "10000"))
+CONVERSATION_TTL_SECONDS = float(os.getenv("CONVERSATION_TTL_SECONDS", "1800"))
+
+# Prometheus metrics on /metrics: chat stage latency by intent, Groq tokens, Mongo commands
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in {"1", "true", "yes"}
+
+# Request tracing: every request gets a trace ID; whole traces are kept when they
+# errored, took at least TRACE_SLOW_MS, or win the TRACE_SAMPLE_RATE draw
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() in {"1", "true", "yes"}
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "2000"))
+# Kept traces are written as JSON lines to a size-rotated file by a background thread,
+# outside the working tree by default
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(tempfile.gettempdir(), "green_earth_chatbot_traces.jsonl"))
+TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_BYTES", str(20 * 1024 * 1024)))
+TRACE_FILE_BACKUPS = int(os.getenv("TRACE_FILE_BACKUPS", "5"))
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "1000"))
+
+# Log level of the API servers' logs, which carry the request's trace ID
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# /data/marketplace and /data/sellers: default and largest page size
+DATA_PAGE_SIZE = int(os.getenv("DATA_PAGE_SIZE", "50"))
+DATA_MAX_PAGE_SIZE = int(os.getenv("DATA_MAX_PAGE_SIZE", "500"))
+
+# How often the marketplace snapshot checks the data version document in Mongo
+DATA_VERSION_POLL_SECONDS = float(os.getenv("DATA_VERSION_POLL_SECONDS", "5"))
+# Refresh the snapshot from a Mongo change stream instead of polling (replica sets only)
+SNAPSHOT_CHANGE_STREAM = os.getenv("SNAPSHOT_CHANGE_STREAM", "false").lower() in {"1", "true", "yes"}
+
+# LLM response cache (exact match on model, params and prompts)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+# Optional SQLite file for a cache tier that survives restarts (disabled when empty)
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")
+
+# Single-flight: concurrent LLM calls with the same model, params and prompts share one Groq request
+LLM_SINGLE_FLIGHT_ENABLED = os.getenv("LLM_SINGLE_FLIGHT_ENABLED", "true").lower() in {"1", "true", "yes"}
@@ -0,0 +1,112 @@
+# Labelled example messages used to train the local intent classifier
+
+INTENT_EXAMPLES = {
+    "market_analysis": [
+        "what are the current prices for carbon credits",
+        "which credits have the highest demand right now",
+        "show me the top selling credits",
+        "how is the market performing this month",
+        "compare credit prices across project types",
+        "which project type is cheapest per ton",
+        "what is the average price of solar credits",
+        "top credits by demand",
+        "is demand for forest credits going up",
+        "which sellers are selling the most credits",
+        "give me a market overview",
+        "how do wind credit prices compare to solar",
+        "what is the price trend for direct air capture",
+        "which listings are most popular",
+        "market analysis of cookstove credits",
+        "best value credits on the marketplace",
+    ],
+    "recommendation": [
+        "recommend credits for my company",
+        "what should i buy as a startup",
+        "suggest the best option for an ngo",
+        "which credit should i purchase with a small budget",
+        "i want to buy credits for my enterprise",
+        "what do you recommend for an individual buyer",
+        "help me choose credits that fit my goals",
+        "which credits fit a corporate buyer",
+        "suggest something cost effective for my small business",
+        "what is the best option for personal offsetting",
+        "pick the right credits for our foundation",
+        "recommend high impact credits for me",
+        "what should our nonprofit buy",
+        "give me buying suggestions under 2000 dollars",
+        "which project would you suggest for my company",
+        "can you recommend a trustworthy credit to buy",
+    ],
+    "emissions": [
+        "how much co2 do 10 credits offset",
+        "calculate the emissions offset for 50 tons",
+        "what is the impact of buying 5 credits of CR-003",
+        "how many tons of emissions will this remove",
+        "estimate the offset of 100 credits",
+        "what is the climate impact of my purchase",
+        "how many credits do i need to offset my footprint",
+        "convert 20 credits into tons of co2",
+        "emissions reduction from cookstove credits",
+        "how much carbon does CR-001 offset",
+        "calculate my total offset",
+        "what offset would 3 credits give me",
+        "how do my emissions compare to the offset",
+        "impact of retiring 200 credits",
+        "how much co2 equivalent is removed per credit",
+        "estimate emissions avoided by the mangrove project",
+    ],
+    "theory": [
+        "what is a carbon credit",
+        "explain voluntary vs compliance markets",
+        "what is sdg 13",
+        "how do carbon markets work",
+        "explain emissions accounting",
+        "what are scope 1 2 and 3 emissions",
+        "what does net zero mean",
+        "explain how verification standards work",
+        "what is the difference between offsetting and reducing",
+        "define additionality",
+        "what is a compliance market",
+        "explain the concept of carbon removal",
+        "teach me the basics of carbon trading",
+        "what is the voluntary carbon market",
+        "why do credits need third party verification",
+        "explain what co-benefits are",
+    ],
+    "insights": [
+        "which sellers are most trustworthy",
+        "give me insights on project types",
+        "what patterns do you see in the data",
+        "which project types have the most listings",
+        "show me seller trust scores",
+        "what are the risks with provisional sellers",
+        "give me project-specific insights",
+        "which seller has the best track record",
+        "analyse the distribution of listings",
+        "what does the data say about seller performance",
+        "are there any risks in the current listings",
+        "insights about high demand projects",
+        "which sellers have verified status",
+        "summarise the marketplace data",
+        "how reliable is arcticair dac",
+        "what stands out about the sellers",
+    ],
+    "general": [
+        "hello",
+        "hi there",
+        "good morning",
+        "who are you",
+        "what can you do",
+        "help",
+        "how are you today",
+        "tell me a joke",
+        "what is the weather like",
+        "ok",
+        "cool",
+        "can you help me",
+        "what features do you have",
+        "hey",
+        "who built this chatbot",
+        "i have a question",
+    ],
+}
@@ -0,0 +1,87 @@
+# Async counterparts of utils/data_store.py for the async serving path
+
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pymongo import DESCENDING, ReturnDocument
+
+from utils.async_db import get_async_db
+from utils.data_store import footprint_document, with_chat_text
+from utils.footprint_history import (
+    history_entry,
+    is_trend_question,
+    rollup_updates,
+    rollup_view,
+    validate_footprint_data,
+)
+from utils.tracing import traced
+from utils.user_context_cache import get_user_context_cache
+
+logger = logging.getLogger(__name__)
+
+
+@traced("data_store.save_user_footprint")
+async def save_user_footprint(user_id: str, footprint_data: Dict, org_id: Optional[str] = None) -> Dict:
+    """Save a user's calculated carbon footprint and append it to their history (see utils/data_store.py)."""
+    validate_footprint_data(footprint_data)
+    db = get_async_db()
+    recorded_at = datetime.utcnow()
+    document = footprint_document(user_id, footprint_data, recorded_at)
+    saved = await db.user_footprints.find_one_and_update(
+        {"user_id": user_id},
+        {"$set": document},
+        upsert=True,
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    entry = history_entry(document, recorded_at, org_id)
+    try:
+        await db.footprint_history.insert_one(entry)
+        await db.footprint_rollups.bulk_write(rollup_updates([entry]), ordered=False)
+    except Exception as exc:
+        logger.warning("Footprint history not recorded for %s: %s", user_id, exc)
+    cache = get_user_context_cache()
+    if cache is not None:
+        cache.store(user_id, saved)
+    return saved
+
+
+@traced("data_store.get_user_footprint")
+async def get_user_footprint(user_id: str) -> Optional[Dict]:
+    """Retrieve a user's latest carbon footprint calculation."""
+    db = get_async_db()
+    return await db.user_footprints.find_one({"user_id": user_id}, {"_id": 0})
+
+
+async def get_recent_rollups(scope: str, key: str, period: str = "month", limit: int = 12) -> List[Dict]:
+    db = get_async_db()
+    query = {"scope": scope, "key": key, "period": period}
+    docs = await db.footprint_rollups.find(query).sort("bucket", DESCENDING).limit(limit).to_list(None)
+    return [rollup_view(doc) for doc in reversed(docs)]
+
+
+async def cached_footprint(user_id: str) -> Optional[Dict]:
+    """get_user_footprint through the user context cache (see utils/data_store.py)."""
+    cache = get_user_context_cache()
+    if cache is None:
+        return await get_user_footprint(user_id)
+    context = cache.get(user_id)
+    if context is None:
+        token = cache.read_token(user_id)
+        context = cache.fill(user_id, await get_user_footprint(user_id), token)
+    return with_chat_text(context)
+
+
+@traced("data_store.footprint_for_prompt")
+async def get_user_footprint_safe(user_id: Optional[str], question: str = "") -> Optional[Dict]:
+    if not user_id:
+        return None
+    try:
+        footprint = await cached_footprint(user_id)
+        if footprint and is_trend_question(question):
+            footprint["trend"] = await get_recent_rollups("user", user_id)
+        return footprint
+    except Exception as e:
+        logger.warning("Could not retrieve user footprint: %s", e)
+        return None
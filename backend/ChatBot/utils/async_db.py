@@ -0,0 +1,25 @@
+# Async MongoDB access for the async serving path (pymongo's native asyncio driver)
+
+from typing import Optional
+
+from pymongo import AsyncMongoClient
+
+from config import MONGODB_URI, MONGODB_DB_NAME
+from utils.metrics import mongo_listeners
+from utils import tracing
+
+_client: Optional[AsyncMongoClient] = None
+
+
+def get_async_client() -> AsyncMongoClient:
+    global _client
+    if _client is None:
+        if not MONGODB_URI:
+            raise ValueError("MONGODB_URI is not set in the environment.")
+        _client = AsyncMongoClient(MONGODB_URI, event_listeners=mongo_listeners() + tracing.mongo_listeners())
+    return _client
+
+
+def get_async_db():
+    client = get_async_client()
+    return client[MONGODB_DB_NAME]
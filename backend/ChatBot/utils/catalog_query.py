@@ -0,0 +1,182 @@
+# Keyset-paginated, filtered and projected catalog queries for the /data endpoints
+
+import base64
+import json
+from typing import Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING
+
+from config import DATA_MAX_PAGE_SIZE, DATA_PAGE_SIZE
+from utils.db import get_db
+
+
+# Parameters that ask for a page; a request with none of them gets the whole collection
+PAGE_PARAMS = ("sort", "fields", "limit", "cursor")
+
+
+class Page(NamedTuple):
+    items: List[Dict]
+    next_cursor: Optional[str]
+
+
+class Listing(NamedTuple):
+    collection: str
+    # Unique field that breaks sort ties and anchors the cursor
+    key: str
+    sorts: Tuple[str, ...]
+    fields: Tuple[str, ...]
+    # query parameter -> builder of a Mongo filter clause from the raw value
+    filters: Mapping[str, Callable[[str], Dict]]
+
+
+def _names(value: str) -> List[str]:
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def _number(name: str) -> Callable[[str], float]:
+    def parse(value: str) -> float:
+        try:
+            return float(value)
+        except ValueError:
+            raise ValueError(f"{name} must be a number") from None
+    return parse
+
+
+def _in(field: str) -> Callable[[str], Dict]:
+    return lambda value: {field: {"$in": _names(value)}}
+
+
+def _range(field: str, op: str, name: str) -> Callable[[str], Dict]:
+    parse = _number(name)
+    return lambda value: {field: {op: parse(value)}}
+
+
+CREDITS = Listing(
+    collection="credits",
+    key="credit_id",
+    sorts=("credit_id", "price_usd", "demand_score", "emissions_offset_tons"),
+    fields=("credit_id", "project_type", "price_usd", "demand_score", "emissions_offset_tons",
+            "location", "sdg_tags", "seller_id"),
+    filters={
+        "project_type": _in("project_type"),
+        "seller_id": _in("seller_id"),
+        # Any of the listed SDGs
+        "sdg": _in("sdg_tags"),
+        "min_price": _range("price_usd", "$gte", "min_price"),
+        "max_price": _range("price_usd", "$lte", "max_price"),
+        "min_demand": _range("demand_score", "$gte", "min_demand"),
+        "max_demand": _range("demand_score", "$lte", "max_demand"),
+    },
+)
+
+SELLERS = Listing(
+    collection="sellers",
+    key="seller_id",
+    sorts=("seller_id", "trust_score", "past_sales_volume"),
+    fields=("seller_id", "name", "past_sales_volume", "trust_score", "verification_status", "past_performance"),
+    filters={
+        "seller_id": _in("seller_id"),
+        "verification_status": _in("verification_status"),
+        "min_trust": _range("trust_score", "$gte", "min_trust"),
+    },
+)
+
+
+def encode_cursor(sort: str, last: Dict, key: str) -> str:
+    payload = json.dumps({"s": sort, "v": last.get(sort.lstrip("-")), "k": last[key]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(payload, dict) or {"s", "v", "k"} - set(payload):
+            raise ValueError
+        return payload
+    except ValueError:
+        raise ValueError("cursor is not valid") from None
+
+
+def _after(field: str, value, key: str, key_value, direction: int) -> Dict:
+    """Filter for the rows after (value, key_value) in (field, key) order.
+
+    Mongo sorts a missing or null field before every value, so nulls come
+    first ascending and last descending; {field: None} matches both.
+    """
+    op = "$gt" if direction == ASCENDING else "$lt"
+    same = {field: value, key: {op: key_value}}
+    if value is None:
+        return {"$or": [same, {field: {"$ne": None}}]} if direction == ASCENDING else same
+    branches = [{field: {op: value}}, same]
+    if direction == DESCENDING:
+        branches.append({field: None})
+    return {"$or": branches}
+
+
+def build_query(listing: Listing, params: Mapping[str, str]) -> Tuple[Dict, List[Tuple[str, int]], Dict, int, str]:
+    """Translate request parameters into (filter, sort, projection, limit, sort name).
+
+    Parameters: the listing's filters; `sort` (a sort field, "-" prefix for
+    descending; default the key field); `fields` (comma-separated, default
+    all); `limit`; and `cursor` from a previous page. Raises ValueError for
+    anything unknown or malformed.
+    """
+    clauses = []
+    for name, build in listing.filters.items():
+        value = params.get(name)
+        if value:
+            clauses.append(build(value))
+
+    sort = params.get("sort") or listing.key
+    field = sort.lstrip("-")
+    if field not in listing.sorts:
+        raise ValueError(f"sort must be one of {', '.join(listing.sorts)} (prefix - for descending)")
+    direction = DESCENDING if sort.startswith("-") else ASCENDING
+
+    cursor = params.get("cursor")
+    if cursor:
+        position = decode_cursor(cursor)
+        if position["s"] != sort:
+            raise ValueError("cursor was issued for a different sort")
+        op = "$gt" if direction == ASCENDING else "$lt"
+        if field == listing.key:
+            clauses.append({listing.key: {op: position["k"]}})
+        else:
+            clauses.append(_after(field, position["v"], listing.key, position["k"], direction))
+
+    try:
+        limit = int(params.get("limit") or DATA_PAGE_SIZE)
+    except ValueError:
+        raise ValueError("limit must be an integer") from None
+    limit = min(max(limit, 1), DATA_MAX_PAGE_SIZE)
+
+    fields = _names(params.get("fields") or "") or list(listing.fields)
+    unknown = set(fields) - set(listing.fields)
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+    # The sort and key fields are always read so the next cursor can be built
+    projection = {"_id": 0, **{f: 1 for f in {*fields, field, listing.key}}}
+
+    query = {"$and": clauses} if len(clauses) > 1 else (clauses[0] if clauses else {})
+    order = [(field, direction)] if field == listing.key else [(field, direction), (listing.key, direction)]
+    return query, order, projection, limit, sort
+
+
+def wants_page(listing: Listing, params: Mapping[str, str]) -> bool:
+    return any(name in params for name in (*PAGE_PARAMS, *listing.filters))
+
+
+def query_listing(listing: Listing, params: Mapping[str, str], db=None) -> Page:
+    """One page of `listing`; pass `next_cursor` back as `cursor` for the next one."""
+    query, order, projection, limit, sort = build_query(listing, params)
+    db = db if db is not None else get_db()
+    # One extra document tells whether another page exists
+    docs = list(db[listing.collection].find(query, projection).sort(order).limit(limit + 1))
+    more = len(docs) > limit
+    docs = docs[:limit]
+    next_cursor = encode_cursor(sort, docs[-1], listing.key) if more else None
+
+    requested = set(_names(params.get("fields") or "")) or set(listing.fields)
+    items = [{k: v for k, v in doc.items() if k in requested} for doc in docs]
+    return Page(items, next_cursor)
@@ -0,0 +1,256 @@
+# Per-session conversation memory: recent turns verbatim, older ones folded into a rolling summary
+
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional
+
+from config import (
+    CONVERSATION_MAX_ENTRIES,
+    CONVERSATION_MEMORY_ENABLED,
+    CONVERSATION_PROMPT_TOKEN_CEILING,
+    CONVERSATION_RECENT_TURNS,
+    CONVERSATION_SUMMARY_TOKENS,
+    CONVERSATION_SUMMARY_WORKERS,
+    CONVERSATION_TTL_SECONDS,
+)
+from utils.prompt_templates import CONVERSATION_SUMMARY_SYSTEM
+from utils.session_store import Session
+from utils.tokens import CHARS_PER_TOKEN, estimate_tokens
+from utils.ttl_cache import MISSING, TTLCache
+
+HISTORY_HEADER = "Conversation so far (oldest first):\n"
+SUMMARY_PREFIX = "Summary of earlier turns: "
+logger = logging.getLogger(__name__)
+
+# A clipped turn or summary shorter than this is left out
+MIN_SECTION_CHARS = 32
+# Turn text quoted to the summarizer; the summary keeps decisions, not whole answers
+SUMMARY_INPUT_CHARS = 1500
+
+
+class Turn(NamedTuple):
+    question: str
+    answer: str
+
+
+class Conversation:
+    """One session's history. Fields are read and written under the memory's lock."""
+
+    def __init__(self):
+        self.summary = ""
+        self.recent: Deque[Turn] = deque()
+        # Turns past the verbatim window, waiting for the background fold
+        self.folding: List[Turn] = []
+        self.summarizing = False
+
+
+def _clip(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    return text[:max(0, max_chars - 3)].rstrip() + "..."
+
+
+def _turn_text(turn: Turn) -> str:
+    return f"User: {turn.question}\nAssistant: {turn.answer}\n"
+
+
+def render_history(summary: str, turns: List[Turn], budget: int) -> str:
+    """History section within `budget` estimated tokens: newest turns first, then the summary."""
+    header = "\n\n" + HISTORY_HEADER
+    remaining = budget - estimate_tokens(header)
+    if remaining <= 0 or (not summary and not turns):
+        return ""
+
+    picked = []
+    for turn in reversed(turns):
+        text = _turn_text(turn)
+        cost = estimate_tokens(text)
+        if cost > remaining:
+            if not picked and remaining * CHARS_PER_TOKEN > MIN_SECTION_CHARS:
+                # Even the last turn alone is too long: keep its beginning
+                text = _clip(text, remaining * CHARS_PER_TOKEN - 1) + "\n"
+                picked.append(text)
+                remaining -= estimate_tokens(text)
+            break
+        picked.append(text)
+        remaining -= cost
+
+    lines = []
+    if summary and remaining * CHARS_PER_TOKEN > len(SUMMARY_PREFIX) + MIN_SECTION_CHARS:
+        lines.append(_clip(SUMMARY_PREFIX + summary, remaining * CHARS_PER_TOKEN - 1) + "\n")
+    lines.extend(reversed(picked))
+    if not lines:
+        return ""
+    return header + "".join(lines)
+
+
+def with_history(prompt: str, history: str) -> str:
+    # Right after the "User question: ..." line, which stays the prompt's first line
+    if not history:
+        return prompt
+    question, newline, rest = prompt.partition("\n")
+    return question + history.rstrip("\n") + newline + rest
+
+
+def llm_summary(summary: str, turns: List[Turn], max_tokens: int = CONVERSATION_SUMMARY_TOKENS) -> str:
+    # Imported here so the memory can be used without a Groq client configured
+    from utils.helpers import llm_chat
+
+    quoted = "".join(_clip(_turn_text(turn), SUMMARY_INPUT_CHARS) + "\n" for turn in turns)
+    prompt = (
+        "Earlier summary:\n" + (summary or "(none)") + "\n\n" +
+        "New turns:\n" + quoted + "\n" +
+        f"Write the updated summary in at most {max_tokens * 3 // 4} words."
+    )
+    return llm_chat(CONVERSATION_SUMMARY_SYSTEM, prompt, max_tokens=max_tokens)
+
+
+def fallback_summary(summary: str, turns: List[Turn], max_chars: int) -> str:
+    """Without the LLM: the earlier summary plus the questions, keeping the most recent text."""
+    text = " ".join(filter(None, [summary, *("User asked: " + t.question for t in turns)]))
+    return text if len(text) <= max_chars else "..." + text[-(max_chars - 3):]
+
+
+class ConversationMemory:
+    """Conversation history per session_id, bounded in prompt tokens.
+
+    The last `recent_turns` turns are kept verbatim. Older turns are folded
+    into a rolling summary by a background worker, so recording a turn never
+    waits on the LLM; until the fold lands they are still shown verbatim when
+    the budget allows. `fit()` adds the history to a prompt, trimmed so the
+    system and user prompts together stay within `ceiling` estimated tokens,
+    and records the resulting size. History is per process.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        recent_turns: int,
+        summary_tokens: int,
+        ceiling: int,
+        summarize: Optional[Callable[[str, List[Turn]], str]] = None,
+        workers: int = CONVERSATION_SUMMARY_WORKERS,
+    ):
+        self.entries = TTLCache(max_entries, ttl_seconds)
+        self.recent_turns = recent_turns
+        self.summary_tokens = summary_tokens
+        self.ceiling = ceiling
+        self._summarize = summarize or (lambda summary, turns: llm_summary(summary, turns, summary_tokens))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chat-summary")
+        self._lock = threading.Lock()
+        self.folds = 0
+        self.fold_failures = 0
+        self.over_ceiling = 0
+        self._prompt_tokens: Deque[int] = deque(maxlen=1000)
+
+    def has_history(self, session_id: str) -> bool:
+        return self.entries.peek(session_id) is not MISSING
+
+    def fit(self, session_id: str, system_prompt: str, prompt: str) -> str:
+        """`prompt` with as much of the session's history as fits under the ceiling."""
+        conversation = self.entries.get(session_id)
+        base = estimate_tokens(system_prompt) + estimate_tokens(prompt)
+        history = ""
+        if conversation is not MISSING:
+            with self._lock:
+                summary = conversation.summary
+                turns = conversation.folding + list(conversation.recent)
+            history = render_history(summary, turns, self.ceiling - base)
+        fitted = with_history(prompt, history)
+        tokens = estimate_tokens(system_prompt) + estimate_tokens(fitted)
+        with self._lock:
+            self._prompt_tokens.append(tokens)
+            # Only possible when the prompt without history is already too long
+            self.over_ceiling += tokens > self.ceiling
+        return fitted
+
+    def record(self, session_id: str, question: str, answer: str) -> None:
+        with self._lock:
+            conversation = self.entries.peek(session_id)
+            if conversation is MISSING:
+                conversation = Conversation()
+            conversation.recent.append(Turn(question, answer))
+            while len(conversation.recent) > self.recent_turns:
+                conversation.folding.append(conversation.recent.popleft())
+            start = bool(conversation.folding) and not conversation.summarizing
+            conversation.summarizing = conversation.summarizing or start
+            # Re-put to restart the TTL on every turn
+            self.entries.put(session_id, conversation)
+        if start:
+            self._executor.submit(self._fold, conversation)
+
+    def _fold(self, conversation: Conversation) -> None:
+        max_chars = self.summary_tokens * CHARS_PER_TOKEN
+        while True:
+            with self._lock:
+                if not conversation.folding:
+                    conversation.summarizing = False
+                    return
+                summary, batch = conversation.summary, list(conversation.folding)
+            failed = False
+            try:
+                folded = _clip(self._summarize(summary, batch).strip(), max_chars)
+            except Exception as exc:
+                logger.warning("Conversation summary failed, using the fallback: %s", exc)
+                folded, failed = fallback_summary(summary, batch, max_chars), True
+            with self._lock:
+                conversation.summary = folded
+                # Turns recorded during the call stay queued for the next pass
+                del conversation.folding[:len(batch)]
+                self.folds += 1
+                self.fold_failures += failed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            ordered = sorted(self._prompt_tokens)
+            counters = {"folds": self.folds, "fold_failures": self.fold_failures, "over_ceiling": self.over_ceiling}
+
+        def pct(p: float) -> int:
+            return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))] if ordered else 0
+
+        prompt_tokens = {"count": len(ordered), "p50": pct(50), "p95": pct(95), "max": ordered[-1] if ordered else 0,
+                         "ceiling": self.ceiling}
+        return {**self.entries.stats(), **counters, "prompt_tokens": prompt_tokens}
+
+
+_memory: Optional[ConversationMemory] = None
+_memory_lock = threading.Lock()
+
+
+def get_conversation_memory() -> Optional[ConversationMemory]:
+    """Return the process-wide conversation memory, or None when it is disabled."""
+    global _memory
+    if not CONVERSATION_MEMORY_ENABLED:
+        return None
+    if _memory is None:
+        with _memory_lock:
+            if _memory is None:
+                _memory = ConversationMemory(
+                    CONVERSATION_MAX_ENTRIES,
+                    CONVERSATION_TTL_SECONDS,
+                    CONVERSATION_RECENT_TURNS,
+                    CONVERSATION_SUMMARY_TOKENS,
+                    CONVERSATION_PROMPT_TOKEN_CEILING,
+                )
+    return _memory
+
+
+def fit_prompt(session: Optional[Session], system_prompt: str, prompt: str) -> str:
+    memory = get_conversation_memory()
+    if memory is None or session is None:
+        return prompt
+    return memory.fit(session.session_id, system_prompt, prompt)
+
+
+def remember(session: Optional[Session], question: str, answer: str) -> None:
+    memory = get_conversation_memory()
+    if memory is not None and session is not None and answer:
+        memory.record(session.session_id, question, answer)
+
+
+def has_history(session: Optional[Session]) -> bool:
+    memory = get_conversation_memory()
+    return memory is not None and session is not None and memory.has_history(session.session_id)
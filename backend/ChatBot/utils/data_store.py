@@ -1,42 +1,53 @@
+import logging
 from typing import List, Dict, Optional
 
-from utils.db import get_db, seed_if_empty
+from pymongo import ReturnDocument
+
+from utils.db import get_db
+from utils.footprint_history import (
+    format_footprint_trend,
+    get_recent_rollups,
+    history_entry,
+    is_trend_question,
+    record_history,
+    validate_footprint_data,
+)
+from utils.tracing import traced
+from utils.user_context_cache import get_user_context_cache
 from datetime import datetime
 
-
-def ensure_seeded():
-    seed_if_empty()
+logger = logging.getLogger(__name__)
 
 
+@traced("data_store.get_credits")
 def get_credits() -> List[Dict]:
-    ensure_seeded()
     db = get_db()
     return list(db.credits.find({}, {"_id": 0}))
 
 
+@traced("data_store.get_sellers")
 def get_sellers() -> Dict[str, Dict]:
-    ensure_seeded()
     db = get_db()
     sellers = list(db.sellers.find({}, {"_id": 0}))
     return {s["seller_id"]: s for s in sellers}
 
 
+@traced("data_store.get_users")
 def get_users() -> Dict[str, Dict]:
-    ensure_seeded()
     db = get_db()
     users = list(db.users.find({}, {"_id": 0}))
     return {u["profile_key"]: u for u in users}
 
 
+@traced("data_store.get_theory")
 def get_theory() -> Dict[str, str]:
-    ensure_seeded()
     db = get_db()
     theory = list(db.theory.find({}, {"_id": 0}))
     return {t["topic"]: t["content"] for t in theory}
 
 
+@traced("data_store.get_session_profiles")
 def get_session_profiles() -> Dict[str, Dict]:
-    ensure_seeded()
     db = get_db()
     profiles = list(db.session_profiles.find({}, {"_id": 0}))
     return {p["role"]: p for p in profiles if p.get("role")}
@@ -47,26 +58,44 @@ def get_session_profile(role: str) -> Dict:
     return profiles.get(role, {"role": role})
 
 
-def save_user_footprint(user_id: str, footprint_data: Dict) -> Dict:
-    """Save a user's calculated carbon footprint to the database."""
+def footprint_document(user_id: str, footprint_data: Dict, recorded_at: Optional[datetime] = None) -> Dict:
+    """Stored shape of a footprint: a copy of the data plus user_id and timestamp."""
+    document = dict(footprint_data)
+    document["user_id"] = user_id
+    document["timestamp"] = (recorded_at or datetime.utcnow()).isoformat()
+    return document
+
+
+@traced("data_store.save_user_footprint")
+def save_user_footprint(user_id: str, footprint_data: Dict, org_id: Optional[str] = None) -> Dict:
+    """Save a user's calculated carbon footprint and append it to their history.
+
+    Raises ValueError, before anything is written, for data the rollups cannot take.
+    """
+    validate_footprint_data(footprint_data)
     db = get_db()
-    
-    # Add timestamp
-    footprint_data["user_id"] = user_id
-    footprint_data["timestamp"] = datetime.utcnow().isoformat()
-    
-    # Replace if exists, insert if new (upsert)
-    result = db.user_footprints.update_one(
+    recorded_at = datetime.utcnow()
+    document = footprint_document(user_id, footprint_data, recorded_at)
+    # Upsert and read back the latest document in one round trip
+    saved = db.user_footprints.find_one_and_update(
         {"user_id": user_id},
-        {"$set": footprint_data},
-        upsert=True
+        {"$set": document},
+        upsert=True,
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
     )
-    
-    # Return the saved document
-    saved = db.user_footprints.find_one({"user_id": user_id})
-    return {k: v for k, v in saved.items() if k != "_id"}
-
-
+    # The footprint is stored; a history failure is logged rather than failing the save
+    try:
+        record_history([history_entry(document, recorded_at, org_id)], db)
+    except Exception as exc:
+        logger.warning("Footprint history not recorded for %s: %s", user_id, exc)
+    cache = get_user_context_cache()
+    if cache is not None:
+        cache.store(user_id, saved)
+    return saved
+
+
+@traced("data_store.get_user_footprint")
 def get_user_footprint(user_id: str) -> Optional[Dict]:
     """Retrieve a user's latest carbon footprint calculation."""
     db = get_db()
@@ -76,6 +105,57 @@ def get_user_footprint(user_id: str) -> Optional[Dict]:
     return None
 
 
+@traced("data_store.footprint_for_prompt")
+def get_user_footprint_safe(user_id: Optional[str], question: str = "") -> Optional[Dict]:
+    """Footprint lookup for prompt building: missing user or lookup errors yield None.
+
+    For a trend question the user's recent monthly rollups are attached under "trend".
+    """
+    if not user_id:
+        return None
+    try:
+        footprint = cached_footprint(user_id)
+        if footprint and is_trend_question(question):
+            footprint["trend"] = get_recent_rollups("user", user_id)
+        return footprint
+    except Exception as e:
+        logger.warning("Could not retrieve user footprint: %s", e)
+        return None
+
+
+def cached_footprint(user_id: str) -> Optional[Dict]:
+    """get_user_footprint through the user context cache.
+
+    Returns a copy that also carries the preformatted chat text under
+    "_chat_text", so callers may add keys without touching the cached entry.
+    """
+    cache = get_user_context_cache()
+    if cache is None:
+        return get_user_footprint(user_id)
+    context = cache.get(user_id)
+    if context is None:
+        token = cache.read_token(user_id)
+        context = cache.fill(user_id, get_user_footprint(user_id), token)
+    return with_chat_text(context)
+
+
+def with_chat_text(context) -> Optional[Dict]:
+    if context.footprint is None:
+        return None
+    return dict(context.footprint, _chat_text=context.footprint_text)
+
+
+def footprint_prompt_section(footprint: Optional[Dict]) -> str:
+    """Prompt block describing the user's footprint, or an empty string."""
+    if not footprint:
+        return ""
+    text = footprint.get("_chat_text") or format_footprint_for_chat(footprint)
+    section = f"\nUser's Carbon Footprint:\n{text}\n"
+    if footprint.get("trend"):
+        section += f"\nFootprint Trend by Month:\n{format_footprint_trend(footprint['trend'])}\n"
+    return section
+
+
 def format_footprint_for_chat(footprint: Dict) -> str:
     """Format a footprint dictionary into a readable string for chat agents."""
     if not footprint:
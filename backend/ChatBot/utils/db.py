@@ -1,7 +1,11 @@
-import os
-from typing import Dict
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Tuple
 
-from pymongo import MongoClient
+from pymongo import ASCENDING, IndexModel, MongoClient, ReturnDocument
+from pymongo.errors import OperationFailure
 
 from config import MONGODB_URI, MONGODB_DB_NAME
 from data.marketplace_data import MARKETPLACE_CREDITS
@@ -9,8 +13,67 @@ from data.seller_profiles import SELLER_PROFILES
 from data.user_profiles import USER_PROFILES
 from data.theory_knowledge import THEORY_KNOWLEDGE
 from data.session_profiles import BUYER_PROFILE, SELLER_PROFILE
+from utils.metrics import mongo_listeners
+from utils import tracing
+
+logger = logging.getLogger(__name__)
 
 _client = None
+_event_listeners: List = []
+
+# Document in the `meta` collection holding the marketplace data version
+DATA_VERSION_ID = "marketplace_version"
+
+# Bump when the seed data or its document shape changes; run_migrations re-applies it
+SEED_VERSION = 2
+SEED_MARKER_ID = "seed_version"
+
+# Server error codes for an existing index with the same name but different options/keys
+INDEX_CONFLICT_CODES = {85, 86}
+
+
+class IndexSpec(NamedTuple):
+    collection: str
+    keys: Tuple[Tuple[str, int], ...]
+    unique: bool = False
+
+    @property
+    def name(self) -> str:
+        return "_".join(f"{field}_{direction}" for field, direction in self.keys)
+
+
+# Every index the data access code relies on. run_migrations applies this list
+# whenever it changes; bench/check_query_plans.py checks that every filtered
+# query in utils/data_store.py, utils/footprint_history.py and
+# utils/catalog_query.py uses one of them.
+INDEXES = [
+    IndexSpec("credits", (("credit_id", ASCENDING),), unique=True),
+    # Catalog pages (utils/catalog_query.py): each sort field, with the key as tie-breaker,
+    # and each equality filter followed by the key so a filtered page is read in key order
+    IndexSpec("credits", (("price_usd", ASCENDING), ("credit_id", ASCENDING))),
+    IndexSpec("credits", (("demand_score", ASCENDING), ("credit_id", ASCENDING))),
+    IndexSpec("credits", (("emissions_offset_tons", ASCENDING), ("credit_id", ASCENDING))),
+    IndexSpec("credits", (("project_type", ASCENDING), ("price_usd", ASCENDING), ("credit_id", ASCENDING))),
+    IndexSpec("credits", (("seller_id", ASCENDING), ("credit_id", ASCENDING))),
+    IndexSpec("credits", (("sdg_tags", ASCENDING), ("credit_id", ASCENDING))),
+    IndexSpec("sellers", (("seller_id", ASCENDING),), unique=True),
+    IndexSpec("sellers", (("trust_score", ASCENDING), ("seller_id", ASCENDING))),
+    IndexSpec("sellers", (("past_sales_volume", ASCENDING), ("seller_id", ASCENDING))),
+    IndexSpec("sellers", (("verification_status", ASCENDING), ("seller_id", ASCENDING))),
+    IndexSpec("users", (("profile_key", ASCENDING),), unique=True),
+    IndexSpec("theory", (("topic", ASCENDING),), unique=True),
+    IndexSpec("session_profiles", (("role", ASCENDING),), unique=True),
+    IndexSpec("user_footprints", (("user_id", ASCENDING),), unique=True),
+    IndexSpec("footprint_history", (("user_id", ASCENDING), ("timestamp", ASCENDING))),
+    IndexSpec("footprint_rollups", (("scope", ASCENDING), ("key", ASCENDING), ("period", ASCENDING), ("bucket", ASCENDING)), unique=True),
+]
+
+
+def register_event_listener(listener) -> None:
+    """Attach a pymongo monitoring listener; must be called before the client is created."""
+    if _client is not None:
+        raise RuntimeError("register_event_listener() must be called before get_client()")
+    _event_listeners.append(listener)
 
 
 def get_client() -> MongoClient:
@@ -18,7 +81,8 @@ def get_client() -> MongoClient:
     if _client is None:
         if not MONGODB_URI:
             raise ValueError("MONGODB_URI is not set in the environment.")
-        _client = MongoClient(MONGODB_URI)
+        listeners = list(_event_listeners) + mongo_listeners() + tracing.mongo_listeners()
+        _client = MongoClient(MONGODB_URI, event_listeners=listeners)
     return _client
 
 
@@ -27,12 +91,33 @@ def get_db():
     return client[MONGODB_DB_NAME]
 
 
+def get_data_version(db=None) -> int:
+    """Return the marketplace data version (bumped whenever catalog data changes)."""
+    db = db if db is not None else get_db()
+    doc = db.meta.find_one({"_id": DATA_VERSION_ID}, {"version": 1})
+    return doc.get("version", 0) if doc else 0
+
+
+def bump_data_version(db=None) -> int:
+    """Increment the marketplace data version; call after writing credits, sellers or theory."""
+    db = db if db is not None else get_db()
+    doc = db.meta.find_one_and_update(
+        {"_id": DATA_VERSION_ID},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return doc["version"]
+
+
 def seed_if_empty() -> Dict[str, int]:
     db = get_db()
     counts = {}
+    seeded = False
 
     if db.credits.count_documents({}) == 0:
         db.credits.insert_many(MARKETPLACE_CREDITS)
+        seeded = True
     counts["credits"] = db.credits.count_documents({})
 
     if db.sellers.count_documents({}) == 0:
@@ -42,6 +127,7 @@ def seed_if_empty() -> Dict[str, int]:
             doc["seller_id"] = seller_id
             sellers.append(doc)
         db.sellers.insert_many(sellers)
+        seeded = True
     counts["sellers"] = db.sellers.count_documents({})
 
     if db.users.count_documents({}) == 0:
@@ -58,10 +144,80 @@ def seed_if_empty() -> Dict[str, int]:
         for key, value in THEORY_KNOWLEDGE.items():
             theory_docs.append({"topic": key, "content": value})
         db.theory.insert_many(theory_docs)
+        seeded = True
     counts["theory"] = db.theory.count_documents({})
 
     if db.session_profiles.count_documents({}) == 0:
         db.session_profiles.insert_many([BUYER_PROFILE, SELLER_PROFILE])
     counts["session_profiles"] = db.session_profiles.count_documents({})
 
+    if seeded:
+        bump_data_version(db)
     return counts
+
+
+def index_fingerprint(indexes: List[IndexSpec] = INDEXES) -> str:
+    """Stable hash of the registry, stored in the migration marker to detect changes."""
+    payload = json.dumps([[spec.collection, spec.keys, spec.unique] for spec in indexes])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def ensure_indexes(db=None, indexes: List[IndexSpec] = INDEXES) -> Dict[str, str]:
+    """Create every index in the registry; safe to repeat.
+
+    An index whose options changed (e.g. it became unique) is dropped and
+    rebuilt. Failures, such as duplicates blocking a unique index, are
+    reported per index rather than raised, so startup is not blocked.
+    """
+    db = db if db is not None else get_db()
+    results = {}
+    for spec in indexes:
+        collection = db[spec.collection]
+        model = IndexModel(list(spec.keys), name=spec.name, unique=spec.unique)
+        label = f"{spec.collection}.{spec.name}"
+        try:
+            collection.create_indexes([model])
+            results[label] = "ok"
+        except OperationFailure as exc:
+            if exc.code not in INDEX_CONFLICT_CODES:
+                results[label] = f"failed: {exc}"
+                continue
+            try:
+                collection.drop_index(spec.name)
+                collection.create_indexes([model])
+                results[label] = "rebuilt"
+            except OperationFailure as rebuild_exc:
+                results[label] = f"failed: {rebuild_exc}"
+    for label, status in results.items():
+        if status.startswith("failed"):
+            logger.warning("Index %s %s", label, status)
+    return results
+
+
+def run_migrations() -> Dict:
+    """One-time startup step: seed empty collections, apply the index registry and record both.
+
+    Once the marker matches SEED_VERSION and the registry fingerprint this is
+    a single find_one, so it is safe to call from every process start and
+    from health checks.
+    """
+    db = get_db()
+    marker = db.meta.find_one({"_id": SEED_MARKER_ID}) or {}
+    seeded = marker.get("version", 0) >= SEED_VERSION
+    fingerprint = index_fingerprint()
+    indexed = marker.get("indexes") == fingerprint
+    if seeded and indexed:
+        return {"seed_version": marker["version"], "applied": False}
+
+    result = {"seed_version": SEED_VERSION, "applied": True}
+    update = {"applied_at": datetime.utcnow().isoformat()}
+    if not seeded:
+        result["counts"] = update["counts"] = seed_if_empty()
+        update["version"] = SEED_VERSION
+    if not indexed:
+        result["indexes"] = ensure_indexes(db)
+        # Leave the marker stale while an index is missing so the next start retries
+        if not any(status.startswith("failed") for status in result["indexes"].values()):
+            update["indexes"] = fingerprint
+    db.meta.update_one({"_id": SEED_MARKER_ID}, {"$set": update}, upsert=True)
+    return result
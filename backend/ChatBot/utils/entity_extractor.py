@@ -0,0 +1,128 @@
+# Compiled keyword and entity extraction, run once per message
+
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+# Keyword tables, each checked in priority order. A keyword matches anywhere in
+# the lower-cased message, including inside a longer word.
+INTENT_KEYWORDS = {
+    "market_analysis": ["price", "demand", "selling", "market"],
+    "recommendation": ["recommend", "buy", "best option", "suggest"],
+    "emissions": ["emission", "offset", "co2", "impact"],
+    "theory": ["explain", "what is", "theory", "sdg", "voluntary", "compliance"],
+    "insights": ["insight", "data", "project-specific", "trustworthy", "seller"],
+}
+
+FEATURE_KEYWORDS = {
+    "retire_credits": ["retire", "retirement", "offset", "offsetting", "offset emissions"],
+    "certificate_auth": ["certificate", "authenticate", "verification", "verify", "validate"],
+    "carbon_footprint": ["footprint", "calculate emissions", "emissions calculator", "carbon calculator"],
+    "esg_report": ["esg", "report", "sustainability report", "esg reporting"],
+}
+
+PROFILE_KEYWORDS = {
+    "corporate_buyer": ["corporate", "enterprise", "company"],
+    "startup": ["startup", "small business"],
+    "individual": ["individual", "personal", "myself"],
+    "ngo": ["ngo", "nonprofit", "foundation"],
+}
+
+KEYWORD_TABLES = {"intents": INTENT_KEYWORDS, "features": FEATURE_KEYWORDS, "profiles": PROFILE_KEYWORDS}
+
+_QUANTITY_RE = re.compile(r"(\d+)\s*(credits|credit|tons|ton)")
+# Credit IDs are matched as whole tokens, e.g. "CR-001" in "is cr-001 any good?"
+_ID_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9_\-]*")
+
+
+class Entities(NamedTuple):
+    # Matched labels per keyword table, in the table's priority order
+    intents: Tuple[str, ...]
+    features: Tuple[str, ...]
+    profiles: Tuple[str, ...]
+    # First "<n> credits/tons" in the message
+    quantity: Optional[int]
+    # Lower-cased tokens that may be credit IDs, in message order
+    id_tokens: Tuple[str, ...]
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """Regex alternation shaped like a trie of `words`, preferring the longest match."""
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie)
+
+
+class KeywordExtractor:
+    """Every keyword table compiled into one regex.
+
+    The pattern is a zero-width lookahead, so it is tried at every position of
+    the message and finds the longest keyword starting there. Any shorter
+    keyword starting at the same position is a prefix of that one, so each
+    keyword's labels are stored with the labels of all its prefixes. One scan
+    of the message therefore finds every keyword a substring test would.
+    """
+
+    def __init__(self, tables: Dict[str, Dict[str, List[str]]]):
+        self.tables = tables
+        owners: Dict[str, set] = {}
+        for table, labels in tables.items():
+            for label, keywords in labels.items():
+                for keyword in keywords:
+                    owners.setdefault(keyword, set()).add((table, label))
+        self.labels: Dict[str, FrozenSet[Tuple[str, str]]] = {
+            keyword: frozenset().union(*(owners[k] for k in owners if keyword.startswith(k)))
+            for keyword in owners
+        }
+        self.pattern = re.compile("(?=(" + _trie_pattern(list(owners)) + "))")
+
+    def match(self, text: str) -> Dict[str, Tuple[str, ...]]:
+        found = set()
+        for m in self.pattern.finditer(text):
+            found |= self.labels[m.group(1)]
+        return {
+            table: tuple(label for label in labels if (table, label) in found)
+            for table, labels in self.tables.items()
+        }
+
+
+_keywords = KeywordExtractor(KEYWORD_TABLES)
+
+
+@lru_cache(maxsize=1024)
+def extract(text: str) -> Entities:
+    """Keywords, quantity and candidate credit IDs in `text`.
+
+    Cached by message, so the classifier, router and agents handling one
+    message share a single scan.
+    """
+    text = text.lower()
+    quantity = _QUANTITY_RE.search(text)
+    return Entities(
+        quantity=int(quantity.group(1)) if quantity else None,
+        id_tokens=tuple(_ID_TOKEN_RE.findall(text)),
+        **_keywords.match(text),
+    )
+
+
+def mentioned_credits(text: str, snapshot) -> List[Dict]:
+    """Catalog credits named in `text`, in the order they are mentioned."""
+    credits, seen = [], set()
+    for token in extract(text).id_tokens:
+        credit = snapshot.credits_by_key.get(token)
+        if credit is not None and token not in seen:
+            seen.add(token)
+            credits.append(credit)
+    return credits
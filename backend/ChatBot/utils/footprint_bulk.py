@@ -0,0 +1,169 @@
+# Bulk footprint ingestion: NDJSON records in, unordered bulk_write batches out
+
+import json
+import logging
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from config import FOOTPRINT_BULK_BATCH_SIZE, FOOTPRINT_BULK_MAX_RECORD_BYTES
+from utils.data_store import footprint_document
+from utils.footprint_history import history_entry, record_history, validate_footprint_data
+from utils.db import get_db
+from utils.tracing import traced
+from utils.user_context_cache import get_user_context_cache
+
+logger = logging.getLogger(__name__)
+
+
+def read_ndjson_lines(
+    read_line: Callable[[int], bytes], max_bytes: int = FOOTPRINT_BULK_MAX_RECORD_BYTES
+) -> Iterator[Optional[bytes]]:
+    """Yield lines from a stream via `read_line(limit)` (e.g. `stream.readline`).
+
+    A line longer than `max_bytes` is read and discarded in chunks, and None is
+    yielded in its place, so one oversized record cannot exhaust memory.
+    """
+    while True:
+        line = read_line(max_bytes + 1)
+        if not line:
+            return
+        if len(line) > max_bytes and not line.endswith(b"\n"):
+            while True:
+                rest = read_line(max_bytes + 1)
+                if not rest or rest.endswith(b"\n"):
+                    break
+            yield None
+            continue
+        yield line
+
+
+def parse_record(line: Optional[bytes]) -> Tuple[str, Dict, Optional[str]]:
+    """Validate one NDJSON line; return (user_id, footprint_data, org_id) or raise ValueError."""
+    if line is None:
+        raise ValueError(f"record exceeds {FOOTPRINT_BULK_MAX_RECORD_BYTES} bytes")
+    try:
+        record = json.loads(line)
+    except ValueError as exc:
+        raise ValueError(f"invalid JSON: {exc}") from None
+    if not isinstance(record, dict):
+        raise ValueError("record must be a JSON object")
+    user_id = record.get("user_id")
+    if not isinstance(user_id, str) or not user_id.strip():
+        raise ValueError("user_id is required")
+    footprint_data = record.get("footprint_data")
+    validate_footprint_data(footprint_data)
+    org_id = record.get("org_id")
+    if org_id is not None and not isinstance(org_id, str):
+        raise ValueError("org_id must be a string")
+    return user_id.strip(), footprint_data, (org_id or "").strip() or None
+
+
+class _Batch:
+    def __init__(self):
+        self.lines: List[int] = []
+        self.user_ids: List[str] = []
+        self.operations: List[UpdateOne] = []
+        self.history: List[Dict] = []
+        self.seen: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self.operations)
+
+    def add(self, line: int, user_id: str, footprint_data: Dict, org_id: Optional[str]) -> None:
+        recorded_at = datetime.utcnow()
+        document = footprint_document(user_id, footprint_data, recorded_at)
+        self.lines.append(line)
+        self.user_ids.append(user_id)
+        self.operations.append(UpdateOne({"user_id": user_id}, {"$set": document}, upsert=True))
+        self.history.append(history_entry(document, recorded_at, org_id))
+        self.seen.add(user_id)
+
+
+@traced("footprint_bulk.write_batch")
+def _write_batch(db, batch: _Batch) -> List[Dict]:
+    collection = db.user_footprints
+    errors: Dict[int, str] = {}
+    try:
+        result = collection.bulk_write(batch.operations, ordered=False)
+        upserted = set(result.upserted_ids)
+    except BulkWriteError as exc:
+        details = exc.details
+        errors = {e["index"]: e.get("errmsg", "write failed") for e in details.get("writeErrors", [])}
+        upserted = {u["index"] for u in details.get("upserted", [])}
+    except Exception as exc:
+        # The whole batch failed (e.g. connection lost); report every record
+        errors = {i: str(exc) for i in range(len(batch))}
+        upserted = set()
+
+    # $set merges into the stored document, so drop cached footprints rather than guess it
+    cache = get_user_context_cache()
+    if cache is not None:
+        for user_id in batch.user_ids:
+            cache.invalidate(user_id)
+
+    # History and rollups only for records whose latest footprint was saved
+    history = [entry for i, entry in enumerate(batch.history) if i not in errors]
+    try:
+        record_history(history, db)
+    except Exception as exc:
+        logger.warning("Footprint history not recorded for %d records: %s", len(history), exc)
+
+    results = []
+    for i, (line, user_id) in enumerate(zip(batch.lines, batch.user_ids)):
+        if i in errors:
+            results.append({"line": line, "user_id": user_id, "status": "error", "error": errors[i]})
+        else:
+            results.append({"line": line, "user_id": user_id, "status": "inserted" if i in upserted else "updated"})
+    return results
+
+
+def ingest_footprints(lines: Iterable[Optional[bytes]], batch_size: int = FOOTPRINT_BULK_BATCH_SIZE, db=None) -> Iterator[Dict]:
+    """Upsert footprints from NDJSON lines, yielding one result per record.
+
+    Valid records are sent in unordered `bulk_write` batches of `batch_size`,
+    and each written batch is appended to the footprint history and rollups.
+    The generator only pulls more input after the current batch is written,
+    so memory stays bounded by one batch however large the upload is. Blank
+    lines are skipped. A user repeated within a batch flushes the batch first,
+    so the later record always wins. Invalid records are reported at once and
+    written ones when their batch is, so results carry the 1-based input
+    `line` rather than arriving in input order. Ends with a `{"summary": ...}`
+    entry.
+    """
+    db = db if db is not None else get_db()
+    summary = {"received": 0, "inserted": 0, "updated": 0, "failed": 0, "batches": 0}
+    batch = _Batch()
+
+    def flush():
+        nonlocal batch
+        summary["batches"] += 1
+        results = _write_batch(db, batch)
+        batch = _Batch()
+        for result in results:
+            status = result["status"]
+            summary["failed" if status == "error" else status] += 1
+        return results
+
+    for number, line in enumerate(lines, start=1):
+        if line is not None and not line.strip():
+            continue
+        summary["received"] += 1
+        try:
+            user_id, footprint_data, org_id = parse_record(line)
+        except ValueError as exc:
+            summary["failed"] += 1
+            yield {"line": number, "status": "error", "error": str(exc)}
+            continue
+
+        if user_id in batch.seen:
+            yield from flush()
+        batch.add(number, user_id, footprint_data, org_id)
+        if len(batch) >= batch_size:
+            yield from flush()
+
+    if len(batch):
+        yield from flush()
+    yield {"summary": summary}
@@ -0,0 +1,201 @@
+# Footprint history: every saved calculation, plus monthly/yearly rollups kept at write time
+
+import math
+import re
+from collections import defaultdict
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from utils.db import get_db
+from utils.tracing import traced
+
+PERIODS = {"month": "%Y-%m", "year": "%Y"}
+SCOPES = ("user", "org")
+
+# Footprint fields that are summed into rollups and formatted for chat; every one must be a number
+NUMERIC_FIELDS = ("totalEmissions", "suggestedCredits", "treeEquivalent")
+BREAKDOWN_NUMERIC_FIELDS = ("value", "percentage")
+
+_TREND_RE = re.compile(
+    r"\b(trends?|trending|over time|history|historical|progress|monthly|yearly|"
+    r"month over month|year over year|last (?:month|year)|this year|compared?|"
+    r"increas\w*|decreas\w*|going (?:up|down)|improv\w*)\b"
+)
+
+
+def is_trend_question(text: str) -> bool:
+    return bool(_TREND_RE.search(text.lower()))
+
+
+def _is_number(value) -> bool:
+    return not isinstance(value, bool) and isinstance(value, (int, float)) and math.isfinite(value)
+
+
+def validate_footprint_data(footprint_data) -> None:
+    """Raise ValueError unless `footprint_data` can be stored, formatted for chat and folded into rollups.
+
+    Run before any write, so a footprint is never saved without its history.
+    Numeric fields may be left out (they read as 0) but not set to null or to
+    anything other than a finite number.
+    """
+    if not isinstance(footprint_data, dict) or not footprint_data:
+        raise ValueError("footprint_data must be a non-empty object")
+    for field in NUMERIC_FIELDS:
+        value = footprint_data.get(field, 0)
+        if not _is_number(value) or value < 0:
+            raise ValueError(f"{field} must be a non-negative number")
+    breakdown = footprint_data.get("breakdown")
+    if breakdown is None:
+        return
+    if not isinstance(breakdown, list):
+        raise ValueError("breakdown must be a list")
+    for item in breakdown:
+        if not isinstance(item, dict):
+            raise ValueError("breakdown items must be objects")
+        for field in BREAKDOWN_NUMERIC_FIELDS:
+            if not _is_number(item.get(field, 0)):
+                raise ValueError(f"breakdown {field}s must be numbers")
+
+
+def history_entry(document: Dict, recorded_at: datetime, org_id: Optional[str] = None) -> Dict:
+    """History row for a saved footprint document; `timestamp` is a real datetime for range queries."""
+    entry = {k: v for k, v in document.items() if k != "_id"}
+    entry["timestamp"] = recorded_at
+    if org_id:
+        entry["org_id"] = org_id
+    return entry
+
+
+_FIELD_UNSAFE_RE = re.compile(r"[.$]")
+
+
+@lru_cache(maxsize=256)
+def _sector_field(name: str) -> str:
+    # Field names may not contain dots or start with "$"
+    return "sectors." + _FIELD_UNSAFE_RE.sub("_", name)
+
+
+def rollup_updates(entries: Iterable[Dict]) -> List[UpdateOne]:
+    """Upserts that fold `entries` into their user and org rollups.
+
+    Entries that land in the same rollup are combined first, so a batch of
+    records costs one update per rollup touched rather than per record.
+    """
+    merged: Dict[tuple, Dict] = {}
+    for entry in entries:
+        emissions = float(entry.get("totalEmissions") or 0)
+        timestamp = entry["timestamp"]
+        contribution = {
+            "count": 1,
+            "total_emissions": emissions,
+            "suggested_credits": float(entry.get("suggestedCredits") or 0),
+        }
+        for item in entry.get("breakdown") or []:
+            if isinstance(item, dict) and item.get("name"):
+                field = _sector_field(str(item["name"]))
+                contribution[field] = contribution.get(field, 0.0) + float(item.get("value") or 0)
+        buckets = [(period, timestamp.strftime(fmt)) for period, fmt in PERIODS.items()]
+        owners = [("user", entry["user_id"])]
+        if entry.get("org_id"):
+            owners.append(("org", entry["org_id"]))
+
+        for scope, key in owners:
+            for period, bucket in buckets:
+                ident = (scope, key, period, bucket)
+                rollup = merged.get(ident)
+                if rollup is None:
+                    rollup = merged[ident] = {
+                        "inc": defaultdict(int), "min": emissions, "max": emissions,
+                        "first_at": timestamp, "last_at": timestamp,
+                    }
+                inc = rollup["inc"]
+                for field, value in contribution.items():
+                    inc[field] += value
+                rollup["min"] = min(rollup["min"], emissions)
+                rollup["max"] = max(rollup["max"], emissions)
+                rollup["first_at"] = min(rollup["first_at"], timestamp)
+                rollup["last_at"] = max(rollup["last_at"], timestamp)
+
+    updates = []
+    for (scope, key, period, bucket), rollup in merged.items():
+        updates.append(UpdateOne(
+            {"scope": scope, "key": key, "period": period, "bucket": bucket},
+            {
+                "$inc": dict(rollup["inc"]),
+                "$min": {"min_emissions": rollup["min"], "first_at": rollup["first_at"]},
+                "$max": {"max_emissions": rollup["max"], "last_at": rollup["last_at"]},
+            },
+            upsert=True,
+        ))
+    return updates
+
+
+@traced("footprint_history.record")
+def record_history(entries: List[Dict], db=None) -> None:
+    """Append `entries` to footprint_history and fold them into footprint_rollups."""
+    if not entries:
+        return
+    db = db if db is not None else get_db()
+    db.footprint_history.insert_many(entries, ordered=False)
+    db.footprint_rollups.bulk_write(rollup_updates(entries), ordered=False)
+
+
+def rollup_view(doc: Dict) -> Dict:
+    count = doc.get("count", 0)
+    view = {k: v for k, v in doc.items() if k not in ("_id", "scope", "key")}
+    view["avg_emissions"] = round(doc.get("total_emissions", 0) / count, 3) if count else 0.0
+    for field in ("first_at", "last_at"):
+        if isinstance(view.get(field), datetime):
+            view[field] = view[field].isoformat()
+    return view
+
+
+def get_footprint_history(
+    user_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None, limit: int = 100
+) -> List[Dict]:
+    """A user's saved calculations with start <= timestamp < end, oldest first."""
+    query: Dict = {"user_id": user_id}
+    if start or end:
+        query["timestamp"] = {}
+        if start:
+            query["timestamp"]["$gte"] = start
+        if end:
+            query["timestamp"]["$lt"] = end
+    cursor = get_db().footprint_history.find(query, {"_id": 0}).sort("timestamp", ASCENDING).limit(limit)
+    entries = list(cursor)
+    for entry in entries:
+        entry["timestamp"] = entry["timestamp"].isoformat()
+    return entries
+
+
+def get_rollups(
+    scope: str, key: str, period: str = "month", start: Optional[str] = None, end: Optional[str] = None
+) -> List[Dict]:
+    """Rollups for one user or org with start <= bucket <= end (e.g. "2026-01"), oldest first."""
+    query: Dict = {"scope": scope, "key": key, "period": period}
+    if start or end:
+        query["bucket"] = {}
+        if start:
+            query["bucket"]["$gte"] = start
+        if end:
+            query["bucket"]["$lte"] = end
+    return [rollup_view(doc) for doc in get_db().footprint_rollups.find(query).sort("bucket", ASCENDING)]
+
+
+def get_recent_rollups(scope: str, key: str, period: str = "month", limit: int = 12) -> List[Dict]:
+    query = {"scope": scope, "key": key, "period": period}
+    docs = list(get_db().footprint_rollups.find(query).sort("bucket", DESCENDING).limit(limit))
+    return [rollup_view(doc) for doc in reversed(docs)]
+
+
+def format_footprint_trend(rollups: List[Dict]) -> str:
+    lines = []
+    for rollup in rollups:
+        lines.append(
+            f"  • {rollup['bucket']}: avg {rollup['avg_emissions']:.2f} tonnes over {rollup['count']} "
+            f"calculation(s) (min {rollup.get('min_emissions', 0):.2f}, max {rollup.get('max_emissions', 0):.2f})"
+        )
+    return "\n".join(lines)
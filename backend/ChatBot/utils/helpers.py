@@ -1,31 +1,305 @@
 # Shared helper functions for the chatbot
 
+import asyncio
 import json
-from typing import Dict, Any
+import threading
+import time
+from typing import Dict, Any, Iterator, NamedTuple, Optional
 
-from groq import Groq
+import httpx
+from groq import AsyncGroq, Groq
 
-from config import GROQ_API_KEY, MODEL_NAME, TEMPERATURE, MAX_TOKENS
+from config import (
+    GROQ_API_KEY,
+    GROQ_BASE_URL,
+    GROQ_CONNECT_TIMEOUT,
+    GROQ_MAX_CONNECTIONS,
+    GROQ_MAX_RETRIES,
+    GROQ_READ_TIMEOUT,
+    MODEL_NAME,
+    TEMPERATURE,
+    MAX_TOKENS,
+)
+from utils.llm_cache import get_llm_cache, make_cache_key
+from utils.metrics import observe_llm_call
+from utils.single_flight import get_async_single_flight, get_single_flight
+from utils.tracing import span
+
+try:
+    # groq[aiohttp]: httpx's own async pool slows down sharply past ~50 in-flight requests
+    from groq import DefaultAioHttpClient as AsyncHttpClient
+    import httpx_aiohttp  # noqa: F401
+except ImportError:
+    AsyncHttpClient = httpx.AsyncClient
+
+# Model used for all chat completions
+CHAT_MODEL = "llama-3.1-8b-instant"
+
+_groq_client: Optional[Groq] = None
+_groq_client_lock = threading.Lock()
+# Async clients are bound to the event loop that created their connection pool
+_async_groq_client: Optional[AsyncGroq] = None
+_async_groq_loop = None
+
+
+class Completion(NamedTuple):
+    text: str
+    prompt_tokens: int
+    completion_tokens: int
+
+
+class TokenUsage:
+    """Running totals of the token usage Groq reports for this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def add(self, usage) -> None:
+        if usage is None:
+            return
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.completion_tokens += usage.completion_tokens or 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+            }
+
+
+_token_usage = TokenUsage()
+
+
+def get_token_usage() -> TokenUsage:
+    return _token_usage
 
 
 def get_groq_client() -> Groq:
-    if not GROQ_API_KEY:
-        raise ValueError("GROQ_API_KEY is not set in the environment.")
-    return Groq(api_key=GROQ_API_KEY)
+    """Return the process-wide Groq client, creating it on first use.
 
+    The client owns a pooled httpx connection pool, so keep-alive connections
+    are reused across requests and threads. Retries on 408/409/429/5xx use the
+    SDK's exponential backoff with jitter (honouring retry-after headers).
+    """
+    global _groq_client
+    if _groq_client is None:
+        with _groq_client_lock:
+            if _groq_client is None:
+                if not GROQ_API_KEY:
+                    raise ValueError("GROQ_API_KEY is not set in the environment.")
+                timeout = httpx.Timeout(GROQ_READ_TIMEOUT, connect=GROQ_CONNECT_TIMEOUT)
+                http_client = httpx.Client(
+                    timeout=timeout,
+                    limits=httpx.Limits(
+                        max_connections=GROQ_MAX_CONNECTIONS,
+                        max_keepalive_connections=GROQ_MAX_CONNECTIONS,
+                    ),
+                )
+                _groq_client = Groq(
+                    api_key=GROQ_API_KEY,
+                    base_url=GROQ_BASE_URL,
+                    timeout=timeout,
+                    max_retries=GROQ_MAX_RETRIES,
+                    http_client=http_client,
+                )
+    return _groq_client
 
-def llm_chat(system_prompt: str, user_prompt: str, temperature: float = TEMPERATURE, max_tokens: int = MAX_TOKENS) -> str:
+
+def close_groq_client() -> None:
+    """Close the shared client and its connection pool (used by benchmarks)."""
+    global _groq_client
+    with _groq_client_lock:
+        if _groq_client is not None:
+            _groq_client.close()
+            _groq_client = None
+
+
+def get_async_groq_client() -> AsyncGroq:
+    """Return the shared AsyncGroq client for the running event loop."""
+    global _async_groq_client, _async_groq_loop
+    loop = asyncio.get_running_loop()
+    if _async_groq_client is None or _async_groq_loop is not loop:
+        if not GROQ_API_KEY:
+            raise ValueError("GROQ_API_KEY is not set in the environment.")
+        timeout = httpx.Timeout(GROQ_READ_TIMEOUT, connect=GROQ_CONNECT_TIMEOUT)
+        http_client = AsyncHttpClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=GROQ_MAX_CONNECTIONS,
+                max_keepalive_connections=GROQ_MAX_CONNECTIONS,
+            ),
+        )
+        _async_groq_client = AsyncGroq(
+            api_key=GROQ_API_KEY,
+            base_url=GROQ_BASE_URL,
+            timeout=timeout,
+            max_retries=GROQ_MAX_RETRIES,
+            http_client=http_client,
+        )
+        _async_groq_loop = loop
+    return _async_groq_client
+
+
+async def aclose_async_groq_client() -> None:
+    """Close the async client's connection pool before its event loop shuts down."""
+    global _async_groq_client, _async_groq_loop
+    if _async_groq_client is not None:
+        await _async_groq_client.close()
+        _async_groq_client = None
+        _async_groq_loop = None
+
+
+def llm_complete(system_prompt: str, user_prompt: str, temperature: float = TEMPERATURE, max_tokens: int = MAX_TOKENS, json_mode: bool = False) -> Completion:
+    """One uncached completion, with the token usage Groq reported for it."""
+    options = {"response_format": {"type": "json_object"}} if json_mode else {}
     client = get_groq_client()
-    response = client.chat.completions.create(
-        model="llama-3.1-8b-instant",
-        temperature=temperature,
-        max_tokens=max_tokens,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
+    started = time.perf_counter()
+    with span("groq.completion", model=CHAT_MODEL, mode="sync") as attributes:
+        response = client.chat.completions.create(
+            model=CHAT_MODEL,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            **options,
+        )
+        usage = response.usage
+        _add_usage(attributes, usage)
+    _token_usage.add(usage)
+    observe_llm_call(CHAT_MODEL, "sync", time.perf_counter() - started, usage)
+    return Completion(
+        response.choices[0].message.content.strip(),
+        usage.prompt_tokens if usage else 0,
+        usage.completion_tokens if usage else 0,
     )
-    return response.choices[0].message.content.strip()
+
+
+def _add_usage(attributes: Dict, usage) -> None:
+    if usage is not None:
+        attributes["prompt_tokens"] = usage.prompt_tokens
+        attributes["completion_tokens"] = usage.completion_tokens
+
+
+def llm_chat(system_prompt: str, user_prompt: str, temperature: float = TEMPERATURE, max_tokens: int = MAX_TOKENS) -> str:
+    """Cached completion; identical calls made while one is in flight share its Groq request."""
+    key = make_cache_key(CHAT_MODEL, temperature, max_tokens, system_prompt, user_prompt)
+    cache = get_llm_cache()
+    if cache is not None:
+        with span("llm_cache.get") as attributes:
+            cached = cache.get(key)
+            attributes["hit"] = cached is not None
+        if cached is not None:
+            return cached
+
+    def complete() -> str:
+        text = llm_complete(system_prompt, user_prompt, temperature, max_tokens).text
+        # Cached before the flight ends, so callers arriving after it hit the cache
+        if cache is not None:
+            cache.put(key, text)
+        return text
+
+    flights = get_single_flight()
+    return flights.do(key, complete) if flights is not None else complete()
+
+
+def llm_chat_stream(system_prompt: str, user_prompt: str, temperature: float = TEMPERATURE, max_tokens: int = MAX_TOKENS) -> Iterator[str]:
+    """Yield the completion as Groq streams it; a cached answer is yielded in one piece."""
+    cache = get_llm_cache()
+    if cache is not None:
+        key = make_cache_key(CHAT_MODEL, temperature, max_tokens, system_prompt, user_prompt)
+        with span("llm_cache.get") as attributes:
+            cached = cache.get(key)
+            attributes["hit"] = cached is not None
+        if cached is not None:
+            yield cached
+            return
+
+    client = get_groq_client()
+    started = time.perf_counter()
+    parts = []
+    usage = None
+    # The span stays open across yields; it ends when the last chunk has been sent
+    with span("groq.completion", model=CHAT_MODEL, mode="stream") as attributes:
+        stream = client.chat.completions.create(
+            model=CHAT_MODEL,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            stream=True,
+        )
+        with stream:
+            for chunk in stream:
+                x_groq = getattr(chunk, "x_groq", None)
+                if getattr(x_groq, "usage", None) is not None:
+                    usage = x_groq.usage
+                    _token_usage.add(usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if not parts:
+                        attributes["ttft_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                    parts.append(delta)
+                    yield delta
+        _add_usage(attributes, usage)
+    observe_llm_call(CHAT_MODEL, "stream", time.perf_counter() - started, usage)
+
+    # Only complete answers are cached; a client that disconnects mid-stream leaves no entry
+    if cache is not None:
+        cache.put(key, "".join(parts).strip())
+
+
+async def allm_chat(system_prompt: str, user_prompt: str, temperature: float = TEMPERATURE, max_tokens: int = MAX_TOKENS) -> str:
+    """Async counterpart of llm_chat, sharing the same response cache."""
+    key = make_cache_key(CHAT_MODEL, temperature, max_tokens, system_prompt, user_prompt)
+    cache = get_llm_cache()
+    if cache is not None:
+        with span("llm_cache.get") as attributes:
+            cached = cache.get(key)
+            attributes["hit"] = cached is not None
+        if cached is not None:
+            return cached
+
+    flights = get_async_single_flight()
+    if flights is not None:
+        return await flights.do(key, lambda: _acomplete(key, system_prompt, user_prompt, temperature, max_tokens))
+    return await _acomplete(key, system_prompt, user_prompt, temperature, max_tokens)
+
+
+async def _acomplete(key: str, system_prompt: str, user_prompt: str, temperature: float, max_tokens: int) -> str:
+    cache = get_llm_cache()
+    client = get_async_groq_client()
+    started = time.perf_counter()
+    with span("groq.completion", model=CHAT_MODEL, mode="async") as attributes:
+        response = await client.chat.completions.create(
+            model=CHAT_MODEL,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+        )
+        _add_usage(attributes, response.usage)
+    _token_usage.add(response.usage)
+    observe_llm_call(CHAT_MODEL, "async", time.perf_counter() - started, response.usage)
+    text = response.choices[0].message.content.strip()
+
+    if cache is not None:
+        cache.put(key, text)
+    return text
 
 
 def safe_parse_json(text: str) -> Dict[str, Any]:
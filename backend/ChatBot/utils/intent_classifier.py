@@ -0,0 +1,98 @@
+# Fast in-process intent classifier used before falling back to the LLM router
+
+import math
+import re
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional
+
+from data.intent_examples import INTENT_EXAMPLES
+# Keyword rules live with the other keyword tables (same order as the router heuristics)
+from utils.entity_extractor import INTENT_KEYWORDS, extract  # noqa: F401
+
+KEYWORD_WEIGHT = 0.25
+SOFTMAX_SCALE = 8.0
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class IntentPrediction(NamedTuple):
+    label: str
+    confidence: float
+    scores: Dict[str, float]
+
+
+def tokenize(text: str) -> List[str]:
+    words = _TOKEN_RE.findall(text.lower())
+    bigrams = [f"{a}_{b}" for a, b in zip(words, words[1:])]
+    return words + bigrams
+
+
+def keyword_labels(text: str) -> List[str]:
+    """Return every label whose keyword rules match, in priority order."""
+    return list(extract(text).intents)
+
+
+def _normalize(vector: Dict[str, float]) -> Dict[str, float]:
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    if norm == 0:
+        return {}
+    return {term: v / norm for term, v in vector.items()}
+
+
+class IntentClassifier:
+    """TF-IDF nearest-centroid model combined with keyword rules.
+
+    Each label's centroid is a linear weight vector over TF-IDF features, so
+    scoring a message is a sparse dot product per label.
+    """
+
+    def __init__(self, examples: Dict[str, List[str]]):
+        docs = [(label, tokenize(text)) for label, texts in examples.items() for text in texts]
+        doc_freq = Counter(term for _, tokens in docs for term in set(tokens))
+        total = len(docs)
+        self.idf = {term: math.log((1 + total) / (1 + df)) + 1.0 for term, df in doc_freq.items()}
+        self.labels = list(examples.keys())
+
+        sums: Dict[str, Counter] = {label: Counter() for label in self.labels}
+        for label, tokens in docs:
+            sums[label].update(self._vectorize(tokens))
+        self.centroids = {label: _normalize(dict(vector)) for label, vector in sums.items()}
+
+    def _vectorize(self, tokens: List[str]) -> Dict[str, float]:
+        counts = Counter(t for t in tokens if t in self.idf)
+        vector = {term: (1.0 + math.log(count)) * self.idf[term] for term, count in counts.items()}
+        return _normalize(vector)
+
+    def predict(self, text: str) -> IntentPrediction:
+        vector = self._vectorize(tokenize(text))
+        scores = {}
+        for label in self.labels:
+            centroid = self.centroids[label]
+            scores[label] = sum(weight * centroid.get(term, 0.0) for term, weight in vector.items())
+        keyword_matches = keyword_labels(text)
+        for label in keyword_matches:
+            scores[label] += KEYWORD_WEIGHT
+
+        top = max(scores.values())
+        exp_scores = {label: math.exp(SOFTMAX_SCALE * (s - top)) for label, s in scores.items()}
+        total = sum(exp_scores.values())
+        probs = {label: s / total for label, s in exp_scores.items()}
+        label = max(probs, key=probs.get)
+        if not vector and not keyword_matches:
+            # Nothing recognizable in the message; leave the decision to the LLM
+            return IntentPrediction("general", 0.0, probs)
+        return IntentPrediction(label, probs[label], probs)
+
+
+_classifier: Optional[IntentClassifier] = None
+
+
+def get_classifier() -> IntentClassifier:
+    global _classifier
+    if _classifier is None:
+        _classifier = IntentClassifier(INTENT_EXAMPLES)
+    return _classifier
+
+
+def classify_intent(text: str) -> IntentPrediction:
+    return get_classifier().predict(text)
@@ -0,0 +1,40 @@
+# Rolling latency samples for the serving paths, reported by /health
+
+import threading
+from collections import deque
+from typing import Deque, Dict
+
+
+class LatencyRecorder:
+    """Keeps the most recent `window` samples per metric name (in milliseconds)."""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, value_ms: float) -> None:
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+            samples.append(value_ms)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            snapshot = {name: sorted(samples) for name, samples in self._samples.items()}
+        return {name: _summarize(samples) for name, samples in snapshot.items()}
+
+
+def _summarize(ordered) -> Dict[str, float]:
+    def pct(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))], 3)
+
+    return {"count": len(ordered), "p50_ms": pct(50), "p95_ms": pct(95), "p99_ms": pct(99)}
+
+
+_recorder = LatencyRecorder()
+
+
+def get_latency_recorder() -> LatencyRecorder:
+    return _recorder
@@ -0,0 +1,155 @@
+# Exact-match cache for LLM completions: in-memory LRU/TTL tier plus optional SQLite tier
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from config import LLM_CACHE_ENABLED, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS
+from utils.snapshot import get_snapshot
+from utils.ttl_cache import MISSING, TTLCache
+
+
+def make_cache_key(model: str, temperature: float, max_tokens: int, system_prompt: str, user_prompt: str, *options: str) -> str:
+    # `options` (e.g. "json") are appended only when set, so plain keys are unchanged
+    raw = json.dumps([model, temperature, max_tokens, system_prompt, user_prompt, *options], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SQLiteTier:
+    """Persistent cache tier; rows are tagged with the data version they were produced under."""
+
+    PRUNE_EVERY = 256
+
+    def __init__(self, path: str, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._puts = 0
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, version TEXT, value TEXT, created_at REAL)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str, version: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ? AND version = ?", (key, version)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl_seconds:
+            return None
+        return row[0]
+
+    def put(self, key: str, version: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, version, value, created_at) VALUES (?, ?, ?, ?)",
+                (key, version, value, time.time()),
+            )
+            self._puts += 1
+            if self._puts % self.PRUNE_EVERY == 0:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+                )
+            self._conn.commit()
+
+    def drop_other_versions(self, version: str) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM llm_cache WHERE version != ?", (version,))
+            self._conn.commit()
+            return cursor.rowcount
+
+
+class LLMCache:
+    """Caches completions per data version.
+
+    When the version reported by `version_provider` changes, the memory tier is
+    cleared and disk rows from other versions are deleted, so answers built from
+    old marketplace data are never served.
+    """
+
+    def __init__(
+        self,
+        version_provider: Callable[[], Optional[int]],
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+        path: str = LLM_CACHE_PATH,
+    ):
+        self.version_provider = version_provider
+        self.memory = TTLCache(max_entries, ttl_seconds)
+        self.disk = SQLiteTier(path, ttl_seconds) if path else None
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+        self.disk_hits = 0
+        self.version_changes = 0
+
+    def _current_version(self) -> Optional[str]:
+        try:
+            version = self.version_provider()
+        except Exception:
+            # Keep serving under the last known version if the lookup fails
+            return self._version
+        if version is None:
+            return self._version
+        version = str(version)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    if self._version is not None:
+                        self.version_changes += 1
+                    self.memory.clear()
+                    if self.disk is not None:
+                        self.disk.drop_other_versions(version)
+                    self._version = version
+        return version
+
+    def get(self, key: str) -> Optional[str]:
+        version = self._current_version()
+        if version is None:
+            return None
+        value = self.memory.get((version, key))
+        if value is not MISSING:
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key, version)
+            if value is not None:
+                self.disk_hits += 1
+                self.memory.put((version, key), value)
+                return value
+        return None
+
+    def put(self, key: str, value: str) -> None:
+        version = self._current_version()
+        if version is None:
+            return
+        self.memory.put((version, key), value)
+        if self.disk is not None:
+            self.disk.put(key, version, value)
+
+    def stats(self) -> Dict:
+        stats = self.memory.stats()
+        stats["disk_enabled"] = self.disk is not None
+        stats["disk_hits"] = self.disk_hits
+        stats["version_changes"] = self.version_changes
+        stats["data_version"] = self._version
+        return stats
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Return the process-wide LLM cache, or None when caching is disabled."""
+    global _cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMCache(lambda: get_snapshot().version)
+    return _cache
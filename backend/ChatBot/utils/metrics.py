@@ -0,0 +1,235 @@
+# Prometheus metrics: per-stage chat latency by intent, Groq token usage, LLM call coalescing and Mongo commands
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+from config import METRICS_ENABLED
+from utils.tracing import span
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+MONGO_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Fixed-bucket histogram per label set, rendered in the Prometheus text format.
+
+    observe() is a dict lookup, a bisect and three additions under a lock;
+    buckets are stored per bucket and only made cumulative when rendered.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, counts, total, count in sorted(snapshot):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                bucket_labels = _labels(self.labelnames, labels, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Counter:
+    """Monotonic count per label set, rendered in the Prometheus text format."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], int] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + 1
+
+    def value(self, *labels: str) -> int:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_labels(self.labelnames, labels)} {value}" for labels, value in snapshot)
+        return lines
+
+
+class CoalescedRatio:
+    """Gauge of the share of LLM calls that joined an identical call already in flight."""
+
+    name = "llm_coalesced_ratio"
+
+    def render(self) -> List[str]:
+        upstream = LLM_CALLS.value("upstream")
+        coalesced = LLM_CALLS.value("coalesced")
+        # Like a histogram series, absent until the first observation
+        if not upstream + coalesced:
+            return []
+        return [
+            f"# HELP {self.name} Share of LLM calls answered by an identical call already in flight.",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {coalesced / (upstream + coalesced)}",
+        ]
+
+
+CHAT_STAGE_SECONDS = Histogram(
+    "chat_stage_seconds",
+    "Time spent in each stage of a chat request, by routed intent.",
+    ("stage", "intent"),
+    STAGE_BUCKETS,
+)
+GROQ_REQUEST_SECONDS = Histogram(
+    "groq_request_seconds",
+    "Duration of Groq chat completion calls (whole stream for streamed calls).",
+    ("model", "mode"),
+    STAGE_BUCKETS,
+)
+GROQ_TOKENS = Histogram(
+    "groq_tokens",
+    "Tokens per Groq response, as reported in its usage.",
+    ("model", "kind"),
+    TOKEN_BUCKETS,
+)
+MONGO_COMMAND_SECONDS = Histogram(
+    "mongo_command_seconds",
+    "Duration of MongoDB commands as reported by the driver.",
+    ("command", "outcome"),
+    MONGO_BUCKETS,
+)
+LLM_CALLS = Counter(
+    "llm_calls_total",
+    "LLM calls by whether they sent a Groq request (upstream) or shared one in flight (coalesced).",
+    ("outcome",),
+)
+METRICS = [CHAT_STAGE_SECONDS, GROQ_REQUEST_SECONDS, GROQ_TOKENS, MONGO_COMMAND_SECONDS, LLM_CALLS, CoalescedRatio()]
+
+# Stage timings of the chat request running in this context, labelled with
+# its intent once routing has decided it
+_chat_stages: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("chat_stages", default=None)
+
+
+def start_chat() -> Optional[List[Tuple[str, float]]]:
+    """Begin collecting stage timings for one chat request; pass the result to finish_chat()."""
+    if not METRICS_ENABLED:
+        return None
+    stages: List[Tuple[str, float]] = []
+    _chat_stages.set(stages)
+    return stages
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    stages = _chat_stages.get()
+    if stages is not None:
+        stages.append((stage, seconds))
+
+
+@contextmanager
+def stage(name: str):
+    """Time a chat stage for chat_stage_seconds; it is also a span of the request's trace."""
+    started = time.perf_counter()
+    try:
+        with span(name):
+            yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def finish_chat(stages: Optional[List[Tuple[str, float]]], intent: str, total_seconds: float) -> None:
+    if stages is None:
+        return
+    # Cleared rather than reset: a streamed response finishes in a later step of its generator
+    if _chat_stages.get() is stages:
+        _chat_stages.set(None)
+    for name, seconds in stages:
+        CHAT_STAGE_SECONDS.observe(seconds, name, intent)
+    CHAT_STAGE_SECONDS.observe(total_seconds, "total", intent)
+
+
+def observe_llm_call(model: str, mode: str, seconds: float, usage) -> None:
+    if not METRICS_ENABLED:
+        return
+    GROQ_REQUEST_SECONDS.observe(seconds, model, mode)
+    if usage is None:
+        return
+    prompt = usage.prompt_tokens or 0
+    completion = usage.completion_tokens or 0
+    GROQ_TOKENS.observe(prompt, model, "prompt")
+    GROQ_TOKENS.observe(completion, model, "completion")
+    GROQ_TOKENS.observe(getattr(usage, "total_tokens", None) or prompt + completion, model, "total")
+
+
+def observe_llm_flight(coalesced: bool) -> None:
+    if METRICS_ENABLED:
+        LLM_CALLS.inc("coalesced" if coalesced else "upstream")
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Feeds the driver's own command durations into mongo_command_seconds."""
+
+    def started(self, event) -> None:
+        pass
+
+    def succeeded(self, event) -> None:
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, event.command_name, "ok")
+
+    def failed(self, event) -> None:
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, event.command_name, "error")
+
+
+def mongo_listeners() -> list:
+    """Listeners to pass to a Mongo client, empty when metrics are off."""
+    return [MongoCommandMetrics()] if METRICS_ENABLED else []
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
@@ -0,0 +1,242 @@
+# Near-duplicate question index: reuse a stored answer for a reworded question
+
+import re
+import threading
+import time
+import zlib
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from config import (
+    QUESTION_INDEX_DIMENSIONS,
+    QUESTION_INDEX_ENABLED,
+    QUESTION_INDEX_MAX_ENTRIES,
+    QUESTION_INDEX_THRESHOLD,
+)
+from utils.latency import get_latency_recorder
+from utils.snapshot import get_snapshot
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+# Numbers and credit IDs change the answer ("10 credits" vs "100 credits"), so they must match exactly
+_EXACT_RE = re.compile(r"\b(?:[a-z]+-\d+|\d+(?:\.\d+)?)\b")
+
+
+class QuestionMatch(NamedTuple):
+    intent: str
+    answer: str
+    question: str
+    similarity: float
+
+
+# Words that reword a question without changing what it asks
+FILLER_WORDS = frozenset(
+    "a an the is are was be do does did i me my you your can could would please tell "
+    "what whats what's s exactly just about on for of to".split()
+)
+
+
+# Words that flip what a question asks; they are matched exactly, not by similarity
+NEGATION_WORDS = frozenset(
+    "not no never without none nor cannot dont doesnt didnt isnt arent wasnt werent "
+    "cant couldnt shouldnt wont wouldnt".split()
+)
+
+# Words that compare terms; in such a question the order of the terms matters
+# ("is solar better than wind" asks the opposite of "is wind better than solar")
+COMPARISON_WORDS = frozenset("than vs versus compared compare against or".split())
+
+
+def _stem(word: str) -> str:
+    # Fold plain plurals so "credit" and "credits" embed the same way
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss") and not _EXACT_RE.fullmatch(word):
+        return word[:-1]
+    return word
+
+
+def normalize_question(text: str) -> str:
+    words = _WORD_RE.findall(text.lower().replace("'", ""))
+    return " ".join(_stem(w) for w in words if w not in FILLER_WORDS)
+
+
+def exact_terms(normalized: str) -> str:
+    """The parts of a question that must match exactly for its answer to be reused:
+    numbers and credit IDs, negations, and the word order of a comparison."""
+    words = normalized.split()
+    terms = sorted(set(_EXACT_RE.findall(normalized)) | NEGATION_WORDS.intersection(words))
+    if COMPARISON_WORDS.intersection(words):
+        terms.append("order:" + "_".join(words))
+    return " ".join(terms)
+
+
+def embed(normalized: str, dimensions: int = QUESTION_INDEX_DIMENSIONS) -> np.ndarray:
+    """Signed feature hashing of words and character trigrams, L2-normalized.
+
+    Trigrams keep small rewordings ("credit" / "credits", typos) close; words
+    weight the content terms. crc32 keeps the embedding stable across processes.
+    """
+    vector = np.zeros(dimensions, dtype=np.float32)
+    words = normalized.split()
+    features = [f"w:{w}" for w in words]
+    for word in words:
+        padded = f" {word} "
+        features.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    for feature in features:
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[h % dimensions] += 1.0 if (h >> 31) & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class QuestionIndex:
+    """Bounded in-memory index of answered questions.
+
+    Embeddings sit in one preallocated float32 matrix and a lookup is a single
+    matrix-vector product over the live rows. Entries carry the marketplace data
+    version they were answered under; when the version changes the index is
+    emptied. When full, the least recently used entry is replaced.
+    """
+
+    def __init__(
+        self,
+        version_provider: Callable[[], Optional[int]],
+        max_entries: int = QUESTION_INDEX_MAX_ENTRIES,
+        threshold: float = QUESTION_INDEX_THRESHOLD,
+        dimensions: int = QUESTION_INDEX_DIMENSIONS,
+    ):
+        self.version_provider = version_provider
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.dimensions = dimensions
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((max_entries, dimensions), dtype=np.float32)
+        self._last_used = np.zeros(max_entries)
+        self._entries: List[Optional[Dict]] = [None] * max_entries
+        self._slots: Dict[tuple, int] = {}
+        self._size = 0
+        self._version: Optional[int] = None
+        self.lookups = 0
+        self.hits = 0
+        self.inserts = 0
+        self.evictions = 0
+
+    def _current_version(self) -> Optional[int]:
+        # Called outside the index lock: the provider may refresh the snapshot
+        try:
+            return self.version_provider()
+        except Exception:
+            return self._version
+
+    def _apply_version(self, version: Optional[int]) -> None:
+        if version != self._version:
+            self._clear()
+            self._version = version
+
+    def _clear(self) -> None:
+        self._entries = [None] * self.max_entries
+        self._slots.clear()
+        self._last_used[:] = 0
+        self._size = 0
+
+    def lookup(self, question: str, scope: str = "") -> Optional[QuestionMatch]:
+        """Best stored answer for `question` in `scope`, if similar enough."""
+        start = time.perf_counter()
+        normalized = normalize_question(question)
+        query = embed(normalized, self.dimensions)
+        exact = exact_terms(normalized)
+        version = self._current_version()
+        with self._lock:
+            self._apply_version(version)
+            self.lookups += 1
+            match = None
+            if self._size:
+                similarities = self._vectors[:self._size] @ query
+                candidates = np.flatnonzero(similarities >= self.threshold)
+                for slot in candidates[np.argsort(-similarities[candidates])]:
+                    similarity = float(similarities[slot])
+                    entry = self._entries[slot]
+                    if entry["scope"] == scope and entry["exact"] == exact:
+                        self._last_used[slot] = time.monotonic()
+                        self.hits += 1
+                        match = QuestionMatch(entry["intent"], entry["answer"], entry["question"], similarity)
+                        break
+        get_latency_recorder().record("question_index_lookup", (time.perf_counter() - start) * 1000)
+        return match
+
+    def add(self, question: str, intent: str, answer: str, scope: str = "", version: Optional[int] = None) -> None:
+        """Store an answer. Pass the data version the answer was built from, if known;
+        an answer from an older version is dropped."""
+        normalized = normalize_question(question)
+        if not normalized:
+            return
+        vector = embed(normalized, self.dimensions)
+        current = self._current_version()
+        with self._lock:
+            self._apply_version(current)
+            if version is not None and version != current:
+                return
+            key = (scope, normalized)
+            slot = self._slots.get(key)
+            if slot is None:
+                if self._size < self.max_entries:
+                    slot = self._size
+                    self._size += 1
+                else:
+                    slot = int(np.argmin(self._last_used))
+                    old = self._entries[slot]
+                    del self._slots[(old["scope"], old["normalized"])]
+                    self.evictions += 1
+                self._slots[key] = slot
+            self._vectors[slot] = vector
+            self._last_used[slot] = time.monotonic()
+            self._entries[slot] = {
+                "scope": scope,
+                "normalized": normalized,
+                "exact": exact_terms(normalized),
+                "question": question,
+                "intent": intent,
+                "answer": answer,
+            }
+            self.inserts += 1
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            text = sum(
+                len(e["question"]) + len(e["normalized"]) + len(e["answer"])
+                for e in self._entries[:self._size]
+            )
+            return int(self._vectors.nbytes + self._last_used.nbytes + text)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups, hits = self.lookups, self.hits
+            stats = {
+                "entries": self._size,
+                "max_entries": self.max_entries,
+                "lookups": lookups,
+                "hits": hits,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "inserts": self.inserts,
+                "evictions": self.evictions,
+                "threshold": self.threshold,
+                "data_version": self._version,
+            }
+        stats["memory_bytes"] = self.memory_bytes()
+        stats["lookup_latency"] = get_latency_recorder().summary().get("question_index_lookup")
+        return stats
+
+
+_index: Optional[QuestionIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_question_index() -> Optional[QuestionIndex]:
+    """Shared index tied to the marketplace snapshot version, or None when disabled."""
+    global _index
+    if not QUESTION_INDEX_ENABLED:
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = QuestionIndex(lambda: get_snapshot().version)
+    return _index
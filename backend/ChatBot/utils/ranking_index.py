@@ -0,0 +1,236 @@
+# Incrementally maintained top-k rankings over the marketplace catalog
+
+import threading
+from bisect import bisect_left, insort
+from itertools import count
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from utils.scoring import (
+    compute_recommendation_score,
+    compute_trust_score,
+    compute_value_score,
+    recommendation_weights,
+)
+from utils.snapshot import MarketplaceSnapshot, get_snapshot
+from utils.tracing import traced
+from utils.vector_scoring import CreditColumns, profile_weight_matrix
+
+
+class SortedScores:
+    """Keys kept in descending score order.
+
+    Updates locate entries by binary search; top(k) is a slice of the first k
+    entries. Ties keep first-insertion order, matching a stable sort of the
+    catalog.
+    """
+
+    def __init__(self):
+        self._entries: List[Tuple[float, int, Hashable]] = []
+        self._positions: Dict[Hashable, Tuple[float, int]] = {}
+        self._seq = count()
+
+    def load(self, keys: List[Hashable], scores: List[float]) -> None:
+        """Replace the contents in one sort; keys keep their list order on ties."""
+        self._entries = sorted((-score, next(self._seq), key) for key, score in zip(keys, scores))
+        self._positions = {key: (neg, seq) for neg, seq, key in self._entries}
+
+    def upsert(self, key: Hashable, score: float) -> None:
+        existing = self._positions.get(key)
+        if existing is not None:
+            if existing[0] == -score:
+                return
+            self._remove_entry(key, existing)
+            seq = existing[1]
+        else:
+            seq = next(self._seq)
+        entry = (-score, seq, key)
+        insort(self._entries, entry)
+        self._positions[key] = (-score, seq)
+
+    def remove(self, key: Hashable) -> None:
+        existing = self._positions.pop(key, None)
+        if existing is not None:
+            self._remove_entry(key, existing)
+
+    def _remove_entry(self, key: Hashable, existing: Tuple[float, int]) -> None:
+        index = bisect_left(self._entries, (existing[0], existing[1], key))
+        del self._entries[index]
+
+    def score(self, key: Hashable) -> Optional[float]:
+        existing = self._positions.get(key)
+        return -existing[0] if existing else None
+
+    def top(self, k: int) -> List[Tuple[float, Hashable]]:
+        return [(-neg, key) for neg, _, key in self._entries[:k]]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RankingIndex:
+    """Top-k structures for value, demand, seller trust and each buyer profile.
+
+    Call upsert/remove as credits, sellers or profiles change; a seller update
+    rescores only that seller's credits. `sync` diffs against a snapshot and
+    applies the same incremental updates.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.credits: Dict[str, Dict] = {}
+        self.sellers: Dict[str, Dict] = {}
+        self.profiles: Dict[str, Dict] = {}
+        self._credits_by_seller: Dict[str, set] = {}
+        self.value = SortedScores()
+        self.demand = SortedScores()
+        self.seller_trust = SortedScores()
+        self.recommendations: Dict[str, SortedScores] = {}
+        self.snapshot: Optional[MarketplaceSnapshot] = None
+
+    # -- updates -----------------------------------------------------------
+
+    def upsert_credit(self, credit: Dict) -> None:
+        with self._lock:
+            credit_id = credit["credit_id"]
+            previous = self.credits.get(credit_id)
+            if previous is not None and previous["seller_id"] != credit["seller_id"]:
+                self._credits_by_seller.get(previous["seller_id"], set()).discard(credit_id)
+            self.credits[credit_id] = credit
+            self._credits_by_seller.setdefault(credit["seller_id"], set()).add(credit_id)
+            self.value.upsert(credit_id, compute_value_score(credit))
+            self.demand.upsert(credit_id, credit.get("demand_score", 0.0))
+            for profile_key in self.profiles:
+                self._score_recommendation(profile_key, credit)
+
+    def remove_credit(self, credit_id: str) -> None:
+        with self._lock:
+            credit = self.credits.pop(credit_id, None)
+            if credit is None:
+                return
+            self._credits_by_seller.get(credit["seller_id"], set()).discard(credit_id)
+            self.value.remove(credit_id)
+            self.demand.remove(credit_id)
+            for scores in self.recommendations.values():
+                scores.remove(credit_id)
+
+    def upsert_seller(self, seller_id: str, seller: Dict) -> None:
+        with self._lock:
+            self.sellers[seller_id] = seller
+            self.seller_trust.upsert(seller_id, compute_trust_score(seller))
+            self._rescore_seller_credits(seller_id)
+
+    def remove_seller(self, seller_id: str) -> None:
+        with self._lock:
+            if self.sellers.pop(seller_id, None) is not None:
+                self.seller_trust.remove(seller_id)
+                self._rescore_seller_credits(seller_id)
+
+    def upsert_profile(self, profile_key: str, profile: Dict) -> None:
+        with self._lock:
+            self.profiles[profile_key] = profile
+            self.recommendations[profile_key] = SortedScores()
+            for credit in self.credits.values():
+                self._score_recommendation(profile_key, credit)
+
+    def remove_profile(self, profile_key: str) -> None:
+        with self._lock:
+            self.profiles.pop(profile_key, None)
+            self.recommendations.pop(profile_key, None)
+
+    def _rescore_seller_credits(self, seller_id: str) -> None:
+        for credit_id in self._credits_by_seller.get(seller_id, ()):
+            credit = self.credits[credit_id]
+            for profile_key in self.profiles:
+                self._score_recommendation(profile_key, credit)
+
+    def _score_recommendation(self, profile_key: str, credit: Dict) -> None:
+        seller = self.sellers.get(credit["seller_id"], {})
+        weights = recommendation_weights(self.profiles[profile_key])
+        score = compute_recommendation_score(credit, seller, weights)
+        self.recommendations[profile_key].upsert(credit["credit_id"], score)
+
+    def build(self, snapshot: MarketplaceSnapshot) -> None:
+        """Index a whole catalog at once, scoring it in one vectorized pass."""
+        with self._lock:
+            credits = snapshot.credits
+            self.credits = {c["credit_id"]: c for c in credits}
+            self.sellers = dict(snapshot.sellers)
+            self.profiles = dict(snapshot.profiles)
+            self._credits_by_seller = {}
+            for credit in credits:
+                self._credits_by_seller.setdefault(credit["seller_id"], set()).add(credit["credit_id"])
+
+            columns = CreditColumns.from_catalog(credits, snapshot.sellers)
+            ids = columns.credit_ids
+            self.value.load(ids, columns.value_scores().tolist())
+            self.demand.load(ids, columns.demand.tolist())
+            seller_ids = list(self.sellers)
+            self.seller_trust.load(seller_ids, [compute_trust_score(self.sellers[s]) for s in seller_ids])
+
+            profile_keys, weights = profile_weight_matrix(self.profiles)
+            matrix = columns.recommendation_scores(weights)
+            self.recommendations = {}
+            for row, profile_key in enumerate(profile_keys):
+                scores = SortedScores()
+                scores.load(ids, matrix[row].tolist())
+                self.recommendations[profile_key] = scores
+            self.snapshot = snapshot
+
+    @traced("ranking_index.sync")
+    def sync(self, snapshot: MarketplaceSnapshot) -> None:
+        """Apply only what changed between the indexed data and `snapshot`."""
+        with self._lock:
+            if self.snapshot is snapshot:
+                return
+            if not self.credits:
+                self.build(snapshot)
+                return
+            for seller_id in set(self.sellers) - set(snapshot.sellers):
+                self.remove_seller(seller_id)
+            for seller_id, seller in snapshot.sellers.items():
+                if self.sellers.get(seller_id) != seller:
+                    self.upsert_seller(seller_id, seller)
+            for profile_key in set(self.profiles) - set(snapshot.profiles):
+                self.remove_profile(profile_key)
+            for profile_key, profile in snapshot.profiles.items():
+                if self.profiles.get(profile_key) != profile:
+                    self.upsert_profile(profile_key, profile)
+            for credit_id in set(self.credits) - set(snapshot.credits_by_id):
+                self.remove_credit(credit_id)
+            for credit in snapshot.credits:
+                if self.credits.get(credit["credit_id"]) != credit:
+                    self.upsert_credit(credit)
+            self.snapshot = snapshot
+
+    # -- queries (O(k)) ----------------------------------------------------
+
+    def top_by_value(self, k: int) -> List[Dict]:
+        with self._lock:
+            return [self.credits[credit_id] for _, credit_id in self.value.top(k)]
+
+    def top_by_demand(self, k: int) -> List[Dict]:
+        with self._lock:
+            return [self.credits[credit_id] for _, credit_id in self.demand.top(k)]
+
+    def top_sellers(self, k: int) -> List[Tuple[float, str, Dict]]:
+        with self._lock:
+            return [(score, seller_id, self.sellers[seller_id]) for score, seller_id in self.seller_trust.top(k)]
+
+    def top_recommendations(self, profile_key: str, k: int) -> List[Tuple[float, Dict, Dict]]:
+        with self._lock:
+            results = []
+            for score, credit_id in self.recommendations[profile_key].top(k):
+                credit = self.credits[credit_id]
+                results.append((score, credit, self.sellers.get(credit["seller_id"], {})))
+            return results
+
+
+_index = RankingIndex()
+
+
+def get_ranking_index() -> RankingIndex:
+    """Return the shared index, brought up to date with the current snapshot."""
+    snapshot = get_snapshot()
+    if _index.snapshot is not snapshot:
+        _index.sync(snapshot)
+    return _index
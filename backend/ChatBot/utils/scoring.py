@@ -2,6 +2,8 @@
 
 from typing import List, Dict
 
+from utils.tracing import traced
+
 
 def compute_value_score(credit: Dict) -> float:
     # Higher demand and higher emissions offset per dollar = higher value
@@ -12,6 +14,7 @@ def compute_value_score(credit: Dict) -> float:
     return (0.6 * demand) + (0.4 * offset_per_dollar)
 
 
+@traced("scoring.rank_credits")
 def rank_credits(credits: List[Dict]) -> List[Dict]:
     return sorted(credits, key=compute_value_score, reverse=True)
 
@@ -21,3 +24,21 @@ def compute_trust_score(seller_profile: Dict) -> float:
     volume = seller_profile.get("past_sales_volume", 0)
     # Small boost for volume to represent market confidence
     return base + min(volume / 1000, 5)
+
+
+# Default recommendation weights: demand, seller trust, impact per dollar.
+# A buyer profile may override them with a "score_weights" entry.
+DEFAULT_RECOMMENDATION_WEIGHTS = {"demand": 0.4, "trust": 0.35, "impact": 0.25}
+
+
+def recommendation_weights(profile: Dict) -> Dict[str, float]:
+    return profile.get("score_weights") or DEFAULT_RECOMMENDATION_WEIGHTS
+
+
+def compute_recommendation_score(credit: Dict, seller: Dict, weights: Dict[str, float] = DEFAULT_RECOMMENDATION_WEIGHTS) -> float:
+    # Score: demand + trust + impact per dollar
+    # Missing fields take the same defaults as compute_value_score
+    trust = compute_trust_score(seller)
+    price = max(credit.get("price_usd", 1.0), 1.0)
+    impact_per_dollar = credit.get("emissions_offset_tons", 0.0) / price
+    return (weights["demand"] * credit.get("demand_score", 0.0)) + (weights["trust"] * trust) + (weights["impact"] * impact_per_dollar)
@@ -0,0 +1,258 @@
+# Server-side chat sessions: role, resolved profile and prompt context, built once per session
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, NamedTuple, Optional
+
+from config import SESSION_BACKEND, SESSION_MAX_ENTRIES, SESSION_SQLITE_PATH, SESSION_TTL_SECONDS
+from utils.data_store import get_session_profile, get_user_footprint_safe
+from utils.ttl_cache import MISSING, TTLCache
+
+ROLES = ("buyer", "seller")
+MAX_SESSION_ID_LENGTH = 128
+
+
+class Session(NamedTuple):
+    session_id: str
+    role: str
+    user_id: Optional[str]
+    profile: Dict
+    buyer_state: str
+    # "User profile context" block of every personalized prompt in the session
+    context: str
+    created_at: float
+
+    def footprint(self, question: str = "") -> Optional[Dict]:
+        # Read through the user context cache rather than copied in, so a save shows up at once
+        return get_user_footprint_safe(self.user_id, question)
+
+
+def derive_buyer_state(profile: dict) -> str:
+    has_retired = profile.get("credits_retired", 0) > 0
+    has_target = bool(profile.get("net_zero_target_year"))
+    annual_emissions = profile.get("annual_emissions", 0)
+
+    if has_retired and has_target and annual_emissions >= 3000:
+        return (
+            "You have a clear net-zero target and have already retired credits, "
+            "but your emissions scale suggests you will benefit from consistent, high-quality offsets."
+        )
+    if has_retired and has_target:
+        return (
+            "You have a net-zero target and prior retirements, which puts you in a strong position "
+            "to optimize for quality and verification."
+        )
+    if has_target:
+        return (
+            "You have a net-zero target in place, so the next step is aligning purchases to credible "
+            "credits and measurable impact."
+        )
+    return (
+        "You are early in your offset journey, so establishing a baseline and selecting verified credits "
+        "will provide the most value."
+    )
+
+
+def build_session_context(role: str, profile: dict, buyer_state: Optional[str] = None) -> str:
+    if role == "buyer":
+        buyer_state = buyer_state or derive_buyer_state(profile)
+        return (
+            "User role: Buyer\n"
+            f"Company: {profile.get('company')} in {profile.get('industry')} based in {profile.get('location')}.\n"
+            f"ESG maturity: {profile.get('esg_maturity')}.\n"
+            f"Buyer state: {buyer_state}\n"
+            "Personalization guidance: Reference marketplace quality, seller trust, and credit availability. "
+            "Keep the tone advisory and business-friendly."
+        )
+
+    return (
+        "User role: Seller\n"
+        f"Organization: {profile.get('organization')} with {profile.get('project_type')} projects.\n"
+        f"Verification standard: {profile.get('verification_standard')}. "
+        f"Trust score: {profile.get('trust_score')}.\n"
+        f"Market demand: {profile.get('market_demand')}.\n"
+        "Personalization guidance: Reference buyer demand, emissions trends, and offset potential. "
+        "Keep the tone advisory and business-friendly."
+    )
+
+
+def request_session_context(role: str, user_id: Optional[str] = None) -> str:
+    """Prompt context for an API session: only the role and user_id the client sent."""
+    context = f"User role: {role}\n" if role in ROLES else ""
+    if user_id:
+        context += f"user_id: {user_id}\n"
+    return context
+
+
+def build_session(session_id: str, role: str = "", user_id: Optional[str] = None) -> Session:
+    """Session for an API request, built from what the request carries.
+
+    The demo profiles in session_profiles describe one made-up organization,
+    so they are never attached to a web user (see build_profile_session).
+    """
+    role = role if role in ROLES else ""
+    return Session(session_id, role, user_id or None, {}, "", request_session_context(role, user_id), time.time())
+
+
+def build_profile_session(session_id: str, role: str, user_id: Optional[str] = None) -> Session:
+    """Session for the app.py CLI: the role's demo profile, buyer state and profile context."""
+    if role not in ROLES:
+        return build_session(session_id, role, user_id)
+    profile = dict(get_session_profile(role))
+    buyer_state = derive_buyer_state(profile) if role == "buyer" else ""
+    context = build_session_context(role, profile, buyer_state)
+    return Session(session_id, role, user_id or None, profile, buyer_state, context, time.time())
+
+
+class MemorySessionBackend:
+    """Sessions in this process only, with LRU eviction and a TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.entries = TTLCache(max_entries, ttl_seconds)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        session = self.entries.get(session_id)
+        return None if session is MISSING else session
+
+    def put(self, session: Session) -> None:
+        self.entries.put(session.session_id, session)
+
+    def delete(self, session_id: str) -> None:
+        self.entries.invalidate(session_id)
+
+    def stats(self) -> Dict[str, int]:
+        return self.entries.stats()
+
+
+class SQLiteSessionBackend:
+    """Sessions in a SQLite file shared by every worker process on the host.
+
+    A local stand-in for a networked store such as Redis: any object with the
+    same get/put/delete/stats methods can be registered in SESSION_BACKENDS.
+    """
+
+    PRUNE_EVERY = 256
+
+    def __init__(self, path: str, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._lock = threading.Lock()
+        self._puts = 0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chat_sessions (session_id TEXT PRIMARY KEY, data TEXT, expires_at REAL)"
+            )
+            self._conn.commit()
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, expires_at FROM chat_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return Session(**json.loads(row[0]))
+
+    def put(self, session: Session) -> None:
+        data = json.dumps(session._asdict(), default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chat_sessions (session_id, data, expires_at) VALUES (?, ?, ?)",
+                (session.session_id, data, time.time() + self.ttl_seconds),
+            )
+            self._puts += 1
+            if self._puts % self.PRUNE_EVERY == 0:
+                self._conn.execute("DELETE FROM chat_sessions WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()
+        return {"size": size}
+
+
+SESSION_BACKENDS: Dict[str, Callable[[], object]] = {
+    "memory": lambda: MemorySessionBackend(SESSION_MAX_ENTRIES, SESSION_TTL_SECONDS),
+    "sqlite": lambda: SQLiteSessionBackend(SESSION_SQLITE_PATH, SESSION_TTL_SECONDS),
+}
+
+
+class SessionStore:
+    """Looks sessions up by ID and builds them on first use.
+
+    An unknown or missing session ID starts a new session under a fresh
+    server-generated ID, which the API returns for the client to send back.
+    A request that names a different role or user_id than its session
+    rebuilds it in place; one that omits them keeps the stored values.
+    """
+
+    def __init__(self, backend, builder: Callable[..., Session] = build_session):
+        self.backend = backend
+        self.builder = builder
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.rebuilt = 0
+
+    def _lookup(self, session_id: Optional[str]) -> Optional[Session]:
+        if not session_id or len(session_id) > MAX_SESSION_ID_LENGTH:
+            return None
+        return self.backend.get(session_id)
+
+    def _reuse(self, session: Optional[Session], role: str, user_id: Optional[str]) -> Optional[Session]:
+        if session is None or (role and role != session.role) or (user_id and user_id != session.user_id):
+            return None
+        with self._lock:
+            self.reused += 1
+        return session
+
+    def reusable(self, session_id: Optional[str], role: str = "", user_id: Optional[str] = None) -> Optional[Session]:
+        """The stored session if it can serve this request as is, without building anything."""
+        return self._reuse(self._lookup(session_id), role, user_id)
+
+    def resolve(self, session_id: Optional[str], role: str = "", user_id: Optional[str] = None) -> Session:
+        previous = self._lookup(session_id)
+        session = self._reuse(previous, role, user_id)
+        if session is not None:
+            return session
+
+        if previous is None:
+            session = self.builder(uuid.uuid4().hex, role, user_id)
+        else:
+            session = self.builder(previous.session_id, role or previous.role, user_id or previous.user_id)
+        self.backend.put(session)
+        with self._lock:
+            if previous is None:
+                self.created += 1
+            else:
+                self.rebuilt += 1
+        return session
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counters = {"created": self.created, "reused": self.reused, "rebuilt": self.rebuilt}
+        return {**counters, **self.backend.stats()}
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if SESSION_BACKEND not in SESSION_BACKENDS:
+                    raise ValueError(f"SESSION_BACKEND must be one of {', '.join(SESSION_BACKENDS)}")
+                _store = SessionStore(SESSION_BACKENDS[SESSION_BACKEND]())
+    return _store
@@ -0,0 +1,156 @@
+# Single-flight: identical concurrent calls share one execution and all receive its result
+
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from config import LLM_SINGLE_FLIGHT_ENABLED
+from utils.metrics import observe_llm_flight
+from utils.tracing import span
+
+T = TypeVar("T")
+
+
+class FlightStats:
+    """Counts calls that ran (leaders) and calls that joined one in flight (followers)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def record(self, coalesced: bool) -> None:
+        with self._lock:
+            if coalesced:
+                self.followers += 1
+            else:
+                self.leaders += 1
+        observe_llm_flight(coalesced)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.leaders + self.followers
+            return {
+                "upstream": self.leaders,
+                "coalesced": self.followers,
+                "coalesced_ratio": round(self.followers / total, 4) if total else 0.0,
+                "in_flight": _flights.in_flight() + _async_flights.in_flight(),
+            }
+
+
+class _Call:
+    __slots__ = ("done", "value", "error", "ok")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+        self.ok = False
+
+
+class SingleFlight:
+    """Thread version: the first caller for a key runs fn, later callers block until it returns.
+
+    An exception raised by fn is raised in every caller that shared the call.
+    The key is released before waiters are woken, so a call made after that
+    starts a new flight (and normally finds the result in the response cache).
+    """
+
+    def __init__(self, stats: FlightStats):
+        self._stats = stats
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        self._stats.record(coalesced=not leader)
+
+        if not leader:
+            with span("llm.coalesced"):
+                call.done.wait()
+            if call.error is not None:
+                raise call.error
+            if not call.ok:
+                # The leader was interrupted (not an Exception) before it had a result
+                return fn()
+            return call.value
+
+        try:
+            call.value = fn()
+            call.ok = True
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+
+class AsyncSingleFlight:
+    """asyncio version: the first caller's coroutine runs as a task that every caller awaits.
+
+    The task is shielded, so a caller that is cancelled (a client that went
+    away) does not cancel the request the others are waiting on. Tasks belong
+    to one event loop; flights are forgotten when the loop changes.
+    """
+
+    def __init__(self, stats: FlightStats):
+        self._stats = stats
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._loop = None
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._calls = {}
+            self._loop = loop
+        task = self._calls.get(key)
+        self._stats.record(coalesced=task is not None)
+        if task is not None:
+            with span("llm.coalesced"):
+                return await asyncio.shield(task)
+
+        # The task runs in a copy of the leader's context, so its spans join the leader's trace
+        task = loop.create_task(factory())
+        self._calls[key] = task
+        task.add_done_callback(lambda done: self._release(key, done))
+        return await asyncio.shield(task)
+
+    def _release(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Retrieved here so that a failure nobody is left awaiting is not reported as unhandled
+        if not task.cancelled():
+            task.exception()
+
+
+_stats = FlightStats()
+_flights = SingleFlight(_stats)
+_async_flights = AsyncSingleFlight(_stats)
+
+
+def get_single_flight() -> Optional[SingleFlight]:
+    """Return the process-wide thread single-flight group, or None when disabled."""
+    return _flights if LLM_SINGLE_FLIGHT_ENABLED else None
+
+
+def get_async_single_flight() -> Optional[AsyncSingleFlight]:
+    """Return the process-wide asyncio single-flight group, or None when disabled."""
+    return _async_flights if LLM_SINGLE_FLIGHT_ENABLED else None
+
+
+def get_flight_stats() -> Optional[FlightStats]:
+    return _stats if LLM_SINGLE_FLIGHT_ENABLED else None
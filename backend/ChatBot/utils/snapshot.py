@@ -0,0 +1,162 @@
+# In-process, read-only snapshot of the marketplace catalog shared by all agents
+
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from pymongo.errors import PyMongoError
+
+from config import DATA_VERSION_POLL_SECONDS
+from utils.data_store import get_credits, get_sellers, get_theory, get_users
+from utils.db import get_data_version, get_db
+from utils.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Collections whose changes trigger a reload when change streams are available
+WATCHED_COLLECTIONS = ["credits", "sellers", "users", "theory", "meta"]
+
+
+class MarketplaceSnapshot:
+    """Immutable view of the catalog at one data version.
+
+    Treat every attribute as read-only: snapshots are shared across threads and
+    replaced wholesale on refresh, never mutated in place.
+    """
+
+    def __init__(self, version: int, credits: List[Dict], sellers: Dict[str, Dict], profiles: Dict[str, Dict], theory: Dict[str, str]):
+        self.version = version
+        self.credits = credits
+        self.credits_by_id = {c["credit_id"]: c for c in credits}
+        # Lower-cased IDs, for IDs typed in any case in a message
+        self.credits_by_key = {c["credit_id"].lower(): c for c in credits}
+        self.sellers = sellers
+        self.profiles = profiles
+        self.theory = theory
+        self.loaded_at = time.time()
+
+    def find_credit(self, credit_id: str) -> Optional[Dict]:
+        return self.credits_by_id.get(credit_id) or self.credits_by_key.get(credit_id.lower())
+
+
+@traced("snapshot.load")
+def load_snapshot() -> MarketplaceSnapshot:
+    # Read the version first: a write landing mid-load leaves the snapshot on the
+    # older version, so the next poll reloads it.
+    version = get_data_version()
+    return MarketplaceSnapshot(version, get_credits(), get_sellers(), get_users(), get_theory())
+
+
+class SnapshotStore:
+    """Holds the current snapshot and refreshes it when the data version changes.
+
+    Readers never block on a refresh once a snapshot exists: one thread checks
+    the version document at most every `poll_seconds` while the rest keep
+    serving the current snapshot. A new snapshot is swapped in with a single
+    reference assignment, so every request sees one consistent view.
+    """
+
+    def __init__(self, loader=load_snapshot, version_reader=get_data_version, poll_seconds: float = DATA_VERSION_POLL_SECONDS):
+        self.loader = loader
+        self.version_reader = version_reader
+        self.poll_seconds = poll_seconds
+        self._snapshot: Optional[MarketplaceSnapshot] = None
+        self._checked_at = 0.0
+        self._refresh_lock = threading.Lock()
+        self._watching = False
+        self.refreshes = 0
+
+    def get(self) -> MarketplaceSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._refresh_lock:
+                if self._snapshot is None:
+                    self._swap(self.loader())
+            return self._snapshot
+
+        if not self._watching and time.monotonic() - self._checked_at >= self.poll_seconds:
+            if self._refresh_lock.acquire(blocking=False):
+                try:
+                    self._refresh_if_changed()
+                finally:
+                    self._refresh_lock.release()
+        return self._snapshot
+
+    def refresh(self) -> MarketplaceSnapshot:
+        """Reload unconditionally."""
+        with self._refresh_lock:
+            self._swap(self.loader())
+        return self._snapshot
+
+    def _refresh_if_changed(self) -> None:
+        try:
+            version = self.version_reader()
+            if version != self._snapshot.version:
+                self._swap(self.loader())
+            else:
+                self._checked_at = time.monotonic()
+        except PyMongoError as exc:
+            # Keep serving the last good snapshot; retry after the next poll interval
+            self._checked_at = time.monotonic()
+            logger.warning("Marketplace snapshot refresh failed: %s", exc)
+
+    def _swap(self, snapshot: MarketplaceSnapshot) -> None:
+        self._snapshot = snapshot
+        self._checked_at = time.monotonic()
+        self.refreshes += 1
+
+    def start_polling(self) -> None:
+        """Check the data version from a daemon thread so get() never waits on Mongo.
+
+        Used by the async server, where a blocking version check would stall the
+        event loop.
+        """
+        def run():
+            while self._watching:
+                time.sleep(self.poll_seconds)
+                with self._refresh_lock:
+                    self._refresh_if_changed()
+
+        self.get()
+        self._watching = True
+        threading.Thread(target=run, name="snapshot-poller", daemon=True).start()
+
+    def watch_changes(self) -> bool:
+        """Refresh from a Mongo change stream in a daemon thread.
+
+        Change streams need a replica set; on a standalone server this returns
+        False and the store keeps polling the version document.
+        """
+        db = get_db()
+        pipeline = [{"$match": {"ns.coll": {"$in": WATCHED_COLLECTIONS}}}]
+        try:
+            stream = db.watch(pipeline)
+        except PyMongoError as exc:
+            logger.warning("Change streams unavailable, polling data version instead: %s", exc)
+            return False
+
+        def run():
+            try:
+                with stream:
+                    for _change in stream:
+                        self.refresh()
+            except PyMongoError as exc:
+                logger.warning("Change stream closed, falling back to polling: %s", exc)
+            finally:
+                self._watching = False
+
+        self._watching = True
+        threading.Thread(target=run, name="snapshot-change-stream", daemon=True).start()
+        return True
+
+
+_store = SnapshotStore()
+
+
+def get_snapshot() -> MarketplaceSnapshot:
+    return _store.get()
+
+
+def get_snapshot_store() -> SnapshotStore:
+    return _store
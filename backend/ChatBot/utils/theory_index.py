@@ -0,0 +1,207 @@
+# BM25 retrieval over theory documents, so theory prompts stay within a token budget
+
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import THEORY_CONTEXT_TOKENS, THEORY_TOP_K
+from utils.snapshot import MarketplaceSnapshot, get_snapshot
+from utils.tokens import estimate_tokens
+
+# Standard BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Long documents are split into passages of roughly this many tokens
+PASSAGE_TOKENS = 120
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it its me my of on or "
+    "that the their this to was what when which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def split_passages(topic: str, content: str, max_tokens: int = PASSAGE_TOKENS) -> List[str]:
+    """Group whole sentences into passages of at most `max_tokens` (one sentence may exceed it)."""
+    passages, current = [], []
+    for sentence in _SENTENCE_RE.split(content.strip()):
+        if current and estimate_tokens(" ".join(current + [sentence])) > max_tokens:
+            passages.append(" ".join(current))
+            current = []
+        current.append(sentence)
+    if current:
+        passages.append(" ".join(current))
+    return [f"{topic}: {p}" for p in passages]
+
+
+class TheoryIndex:
+    """Incremental BM25 index over theory passages.
+
+    Passages live in slots that are reused after removal. Each term keeps a
+    posting dict (slot -> term frequency); the NumPy arrays used for scoring
+    are rebuilt lazily for a term only after its postings change, so adding or
+    editing one document touches only that document's terms.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.documents: Dict[str, str] = {}
+        self.snapshot: Optional[MarketplaceSnapshot] = None
+        self._doc_slots: Dict[str, List[int]] = {}
+        self._texts: List[Optional[str]] = []
+        self._order: List[Tuple[int, int]] = []
+        self._lengths = np.zeros(0)
+        self._free: List[int] = []
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._live = 0
+        self._total_length = 0
+        self._seq = 0
+        self.corpus_tokens = 0
+
+    def __len__(self) -> int:
+        return self._live
+
+    # -- updates -----------------------------------------------------------
+
+    def upsert(self, topic: str, content: str) -> None:
+        with self._lock:
+            if self.documents.get(topic) == content:
+                return
+            for slot in self._doc_slots.pop(topic, []):
+                self._remove_passage(slot)
+            self._seq += 1
+            slots = [self._add_passage(text, self._seq, i) for i, text in enumerate(split_passages(topic, content))]
+            self._doc_slots[topic] = slots
+            # An edited topic keeps its position in `documents`
+            self.documents[topic] = content
+
+    def remove(self, topic: str) -> None:
+        with self._lock:
+            for slot in self._doc_slots.pop(topic, []):
+                self._remove_passage(slot)
+            self.documents.pop(topic, None)
+
+    def sync(self, snapshot: MarketplaceSnapshot) -> None:
+        """Apply only the theory documents that changed since the last sync."""
+        with self._lock:
+            if self.snapshot is snapshot:
+                return
+            for topic in set(self.documents) - set(snapshot.theory):
+                self.remove(topic)
+            for topic, content in snapshot.theory.items():
+                self.upsert(topic, content)
+            self.snapshot = snapshot
+
+    def _add_passage(self, text: str, doc_seq: int, position: int) -> int:
+        terms = Counter(tokenize(text))
+        length = sum(terms.values())
+        if self._free:
+            slot = self._free.pop()
+            self._texts[slot] = text
+            self._order[slot] = (doc_seq, position)
+        else:
+            slot = len(self._texts)
+            self._texts.append(text)
+            self._order.append((doc_seq, position))
+            if slot >= len(self._lengths):
+                self._lengths = np.concatenate([self._lengths, np.zeros(max(16, len(self._lengths)))])
+        self._lengths[slot] = length
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[slot] = tf
+            self._arrays.pop(term, None)
+        self._live += 1
+        self._total_length += length
+        self.corpus_tokens += estimate_tokens(text)
+        return slot
+
+    def _remove_passage(self, slot: int) -> None:
+        text = self._texts[slot]
+        for term in set(tokenize(text)):
+            postings = self._postings[term]
+            del postings[slot]
+            if not postings:
+                del self._postings[term]
+            self._arrays.pop(term, None)
+        self._live -= 1
+        self._total_length -= int(self._lengths[slot])
+        self.corpus_tokens -= estimate_tokens(text)
+        self._lengths[slot] = 0
+        self._texts[slot] = None
+        self._free.append(slot)
+
+    def _term_arrays(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            postings = self._postings[term]
+            arrays = (
+                np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                np.fromiter(postings.values(), dtype=np.float64, count=len(postings)),
+            )
+            self._arrays[term] = arrays
+        return arrays
+
+    # -- queries -----------------------------------------------------------
+
+    def search(self, query: str, k: int) -> List[Tuple[float, str]]:
+        """Top-k (score, passage) pairs by BM25; passages sharing no term with the query are skipped."""
+        with self._lock:
+            terms = [t for t in set(tokenize(query)) if t in self._postings]
+            if not terms or not self._live:
+                return []
+            n = self._live
+            avg_length = self._total_length / n
+            scores = np.zeros(len(self._texts))
+            for term in terms:
+                slots, tf = self._term_arrays(term)
+                df = len(slots)
+                idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+                norm = K1 * (1.0 - B + B * self._lengths[slots] / avg_length)
+                scores[slots] += idf * tf * (K1 + 1.0) / (tf + norm)
+
+            matched = np.flatnonzero(scores)
+            if len(matched) > k:
+                matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+            # Highest score first; ties keep document order
+            ranked = sorted(matched.tolist(), key=lambda slot: (-scores[slot], self._order[slot]))
+            return [(float(scores[slot]), self._texts[slot]) for slot in ranked]
+
+    def context(self, query: str, token_budget: int = THEORY_CONTEXT_TOKENS, k: int = THEORY_TOP_K) -> List[str]:
+        """Passages for a prompt about `query`, within `token_budget` estimated tokens.
+
+        While the whole library fits in the budget every document is returned
+        whole, in snapshot order, as before retrieval existed.
+        """
+        with self._lock:
+            if self.corpus_tokens <= token_budget:
+                return [f"{topic}: {content}" for topic, content in self.documents.items()]
+            selected, used = [], 0
+            for _score, text in self.search(query, k):
+                cost = estimate_tokens(text)
+                if used + cost > token_budget:
+                    continue
+                selected.append(text)
+                used += cost
+            return selected
+
+
+_index = TheoryIndex()
+
+
+def get_theory_index() -> TheoryIndex:
+    """Return the shared index, brought up to date with the current snapshot."""
+    snapshot = get_snapshot()
+    if _index.snapshot is not snapshot:
+        _index.sync(snapshot)
+    return _index
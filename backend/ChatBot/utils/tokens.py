@@ -0,0 +1,12 @@
+# Cheap token estimates for prompt budgeting (no tokenizer dependency)
+
+import math
+
+# Llama-family tokenizers average roughly four characters of English per token
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
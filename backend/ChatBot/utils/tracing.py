@@ -0,0 +1,363 @@
+# Request tracing: spans held in a context variable, tail-sampled per trace and written to a rotating file
+
+import asyncio
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from itertools import count
+from logging.handlers import QueueListener, RotatingFileHandler
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from pymongo import monitoring
+
+from config import (
+    LOG_LEVEL,
+    TRACE_FILE,
+    TRACE_FILE_BACKUPS,
+    TRACE_FILE_MAX_BYTES,
+    TRACE_QUEUE_SIZE,
+    TRACE_SAMPLE_RATE,
+    TRACE_SLOW_MS,
+    TRACING_ENABLED,
+)
+
+# Spans kept per trace; later ones are counted in the root span's dropped_spans
+MAX_SPANS_PER_TRACE = 500
+
+# Response header carrying the request's trace ID
+TRACE_HEADER = "X-Trace-Id"
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s trace=%(trace_id)s %(message)s"
+
+
+class SpanRecord(NamedTuple):
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    # Wall-clock start in epoch seconds
+    start: float
+    duration_ms: float
+    attributes: Dict
+    error: Optional[str]
+
+
+class Trace:
+    """The spans of one request.
+
+    Spans may end on other threads (prefetch workers, asyncio.to_thread);
+    appending to the list is the only write they share.
+    """
+
+    def __init__(self, name: str, attributes: Dict):
+        # Random, not cryptographic: IDs only need to be unique
+        self.trace_id = "%032x" % random.getrandbits(128)
+        self.name = name
+        self.attributes = attributes
+        self.start = time.time()
+        self.started = time.perf_counter()
+        self.spans: List[SpanRecord] = []
+        self.dropped_spans = 0
+        self.error: Optional[str] = None
+        self._ids = count(1)
+        self.root_id = self.new_span_id()
+
+    def new_span_id(self) -> str:
+        return "%x" % next(self._ids)
+
+    def add(self, record: SpanRecord) -> None:
+        if len(self.spans) < MAX_SPANS_PER_TRACE:
+            self.spans.append(record)
+        else:
+            self.dropped_spans += 1
+
+    def lines(self, duration_ms: float, sampled_by: str) -> str:
+        """The trace as JSON lines, root span first."""
+        attributes = dict(self.attributes, sampled_by=sampled_by)
+        if self.dropped_spans:
+            attributes["dropped_spans"] = self.dropped_spans
+        root = SpanRecord(self.root_id, None, self.name, self.start, duration_ms, attributes, self.error)
+        return "\n".join(
+            json.dumps({"trace_id": self.trace_id, **span._asdict()}, default=str)
+            for span in [root, *self.spans]
+        )
+
+
+# The trace of the request running in this context and its innermost open span
+_current: ContextVar[Optional[Tuple[Trace, str]]] = ContextVar("trace_span", default=None)
+
+
+def _describe(exc: BaseException) -> str:
+    return f"{type(exc).__name__}: {exc}"
+
+
+def current_trace_id() -> Optional[str]:
+    current = _current.get()
+    return current[0].trace_id if current is not None else None
+
+
+def start_trace(name: str, **attributes) -> Optional[Trace]:
+    """Begin a trace for the request running in this context; pass the result to finish_trace()."""
+    if not TRACING_ENABLED:
+        return None
+    trace = Trace(name, attributes)
+    _current.set((trace, trace.root_id))
+    _stats.record_start()
+    return trace
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time the enclosed block as a child of the current span.
+
+    Yields the span's attribute dict, so the block can add to it; outside a
+    trace it is a dict that goes nowhere.
+    """
+    current = _current.get()
+    if current is None:
+        yield attributes
+        return
+    trace, parent_id = current
+    span_id = trace.new_span_id()
+    token = _current.set((trace, span_id))
+    start, started = time.time(), time.perf_counter()
+    error = None
+    try:
+        yield attributes
+    except Exception as exc:
+        error = _describe(exc)
+        trace.error = trace.error or error
+        raise
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # Exited in another context than it was entered in (a generator resumed elsewhere)
+            _current.set((trace, parent_id))
+        trace.add(SpanRecord(span_id, parent_id, name, start, (time.perf_counter() - started) * 1000, attributes, error))
+
+
+def traced(name: str):
+    """Decorator form of span() for sync and async functions."""
+    def decorate(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if _current.get() is None:
+                    return await fn(*args, **kwargs)
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record_exception(exc: BaseException) -> None:
+    """Mark the current trace as failed for an exception that was handled, not raised."""
+    current = _current.get()
+    if current is not None:
+        current[0].error = _describe(exc)
+
+
+def finish_trace(trace: Optional[Trace], error: Optional[BaseException] = None, **attributes) -> None:
+    """End the trace and decide, now that its outcome is known, whether to keep it."""
+    if trace is None:
+        return
+    duration_ms = (time.perf_counter() - trace.started) * 1000
+    # Cleared rather than reset: a streamed response finishes in a later step of its generator
+    current = _current.get()
+    if current is not None and current[0] is trace:
+        _current.set(None)
+    if error is not None:
+        trace.error = _describe(error)
+    trace.attributes.update(attributes)
+
+    if trace.error:
+        sampled_by = "error"
+    elif duration_ms >= TRACE_SLOW_MS:
+        sampled_by = "slow"
+    elif random.random() < TRACE_SAMPLE_RATE:
+        sampled_by = "rate"
+    else:
+        _stats.record_finish(None)
+        return
+    exporter = get_span_exporter()
+    exported = exporter is not None and exporter.export(trace, duration_ms, sampled_by)
+    _stats.record_finish(sampled_by if exported else "dropped")
+
+
+class _TraceFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return record.trace.lines(record.duration_ms, record.sampled_by)
+
+
+class SpanExporter:
+    """Writes kept traces to a rotating JSON-lines file from a background thread.
+
+    export() only enqueues the trace; serialization and file writes happen on
+    the listener thread. When the queue is full the trace is dropped, so a
+    slow disk never holds up a request.
+    """
+
+    def __init__(self, path: str, max_bytes: int, backups: int, queue_size: int):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True)
+        handler.setFormatter(_TraceFormatter())
+        self.queue: "queue.Queue[logging.LogRecord]" = queue.Queue(queue_size)
+        self._listener = QueueListener(self.queue, handler)
+        self._listener.start()
+
+    def export(self, trace: Trace, duration_ms: float, sampled_by: str) -> bool:
+        record = logging.LogRecord("tracing", logging.INFO, "", 0, "", None, None)
+        record.trace, record.duration_ms, record.sampled_by = trace, duration_ms, sampled_by
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            return False
+
+    def flush(self) -> None:
+        """Block until every queued trace is written."""
+        self.queue.join()
+
+    def close(self) -> None:
+        # Drained first: stop() enqueues a sentinel, which a full queue would refuse
+        self.queue.join()
+        self._listener.stop()
+
+
+class TracingStats:
+    """Counters for traces started and kept, reported by /health."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = 0
+        self.finished = 0
+        self.kept: Dict[str, int] = {"error": 0, "slow": 0, "rate": 0}
+        self.dropped = 0
+
+    def record_start(self) -> None:
+        with self._lock:
+            self.started += 1
+
+    def record_finish(self, sampled_by: Optional[str]) -> None:
+        with self._lock:
+            self.finished += 1
+            if sampled_by == "dropped":
+                self.dropped += 1
+            elif sampled_by is not None:
+                self.kept[sampled_by] += 1
+
+    def stats(self) -> Dict:
+        exporter = _exporter
+        with self._lock:
+            return {
+                "started": self.started,
+                "finished": self.finished,
+                "kept": dict(self.kept),
+                "dropped_queue_full": self.dropped,
+                "queued": exporter.queue.qsize() if exporter is not None else 0,
+                "file": TRACE_FILE,
+            }
+
+
+_stats = TracingStats()
+_exporter: Optional[SpanExporter] = None
+_exporter_lock = threading.Lock()
+
+
+def get_tracing_stats() -> Optional[TracingStats]:
+    return _stats if TRACING_ENABLED else None
+
+
+def get_span_exporter() -> Optional[SpanExporter]:
+    """Return the process-wide exporter, or None when tracing is disabled."""
+    global _exporter
+    if not TRACING_ENABLED:
+        return None
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = SpanExporter(TRACE_FILE, TRACE_FILE_MAX_BYTES, TRACE_FILE_BACKUPS, TRACE_QUEUE_SIZE)
+                # Write out whatever is still queued when the process exits
+                atexit.register(_exporter.close)
+    return _exporter
+
+
+class MongoCommandSpans(monitoring.CommandListener):
+    """Adds each MongoDB command to the trace of the request that sent it.
+
+    The driver calls listeners on the thread (or task) running the command, so
+    the current span is the one that issued it.
+    """
+
+    def __init__(self):
+        # Collection per in-flight command, only for commands sent inside a trace
+        self._collections: Dict[int, str] = {}
+
+    def started(self, event) -> None:
+        if _current.get() is not None:
+            target = event.command.get(event.command_name)
+            self._collections[event.request_id] = target if isinstance(target, str) else ""
+
+    def succeeded(self, event) -> None:
+        self._add(event, None)
+
+    def failed(self, event) -> None:
+        self._add(event, str(event.failure.get("errmsg", "command failed")))
+
+    def _add(self, event, error: Optional[str]) -> None:
+        collection = self._collections.pop(event.request_id, None)
+        current = _current.get()
+        if current is None:
+            return
+        trace, parent_id = current
+        duration_ms = event.duration_micros / 1000
+        attributes = {"collection": collection} if collection else {}
+        trace.add(SpanRecord(
+            trace.new_span_id(), parent_id, "mongo." + event.command_name,
+            time.time() - duration_ms / 1000, duration_ms, attributes, error,
+        ))
+
+
+def mongo_listeners() -> list:
+    """Listeners to pass to a Mongo client, empty when tracing is off."""
+    return [MongoCommandSpans()] if TRACING_ENABLED else []
+
+
+class TraceIdFilter(logging.Filter):
+    """Adds the current trace ID (or "-") to every log record as `trace_id`."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = current_trace_id() or "-"
+        return True
+
+
+def configure_logging(level: str = LOG_LEVEL) -> None:
+    """Log to stderr with the trace ID on every line, unless the server already configured logging."""
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.addFilter(TraceIdFilter())
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root.addHandler(handler)
+    root.setLevel(level)
+    # The HTTP clients log every request at INFO
+    for name in ("httpx", "httpcore"):
+        logging.getLogger(name).setLevel(max(root.level, logging.WARNING))
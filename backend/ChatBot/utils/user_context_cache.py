@@ -0,0 +1,124 @@
+# Per-user context cache: each user's latest footprint and its chat text, kept in step with saves
+
+import logging
+import threading
+import zlib
+from typing import Dict, NamedTuple, Optional
+
+from config import (
+    USER_CONTEXT_CACHE_ENABLED,
+    USER_CONTEXT_CACHE_MAX_ENTRIES,
+    USER_CONTEXT_CACHE_NEGATIVE_TTL_SECONDS,
+    USER_CONTEXT_CACHE_TTL_SECONDS,
+)
+from utils.ttl_cache import MISSING, TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class UserContext(NamedTuple):
+    # None is a negative entry: the user has no saved footprint
+    footprint: Optional[Dict]
+    footprint_text: str
+
+
+class UserContextCache:
+    """LRU/TTL cache of UserContext by user_id, updated by every footprint write.
+
+    Saves store the document they wrote (write-through); writes that do not
+    return the stored document, such as bulk ingestion, invalidate instead.
+    A read that misses takes a `read_token()` before querying Mongo and passes
+    it to `fill()`. Every write bumps a generation counter for the user's
+    stripe, and `fill()` drops the result if that counter moved. So a read
+    that raced with a save can never cache the footprint from before it.
+    Entries are per process: a save handled by another worker is only seen
+    here once the entry expires.
+    """
+
+    STRIPES = 1024
+
+    def __init__(self, max_entries: int, ttl_seconds: float, negative_ttl_seconds: float, formatter):
+        self.entries = TTLCache(max_entries, ttl_seconds)
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._format = formatter
+        self._generations = [0] * self.STRIPES
+        self._lock = threading.Lock()
+        self.stale_fills = 0
+
+    def _stripe(self, user_id: str) -> int:
+        return zlib.crc32(user_id.encode("utf-8")) % self.STRIPES
+
+    def _context(self, footprint: Optional[Dict]) -> UserContext:
+        return UserContext(footprint, self._format(footprint) if footprint else "")
+
+    def get(self, user_id: str) -> Optional[UserContext]:
+        context = self.entries.get(user_id)
+        return None if context is MISSING else context
+
+    def read_token(self, user_id: str) -> int:
+        return self._generations[self._stripe(user_id)]
+
+    def fill(self, user_id: str, footprint: Optional[Dict], token: int) -> UserContext:
+        """Cache what a read returned, unless a write for this user landed since `token`."""
+        context = self._context(footprint)
+        ttl = None if footprint else self.negative_ttl_seconds
+        with self._lock:
+            if self._generations[self._stripe(user_id)] != token:
+                self.stale_fills += 1
+                return context
+            self.entries.put(user_id, context, ttl)
+        return context
+
+    def store(self, user_id: str, footprint: Dict) -> None:
+        """Write-through after a save, with the document as stored.
+
+        Never raises: the save has already happened, so a document that cannot
+        be formatted only drops the user's entry and the next read refetches it.
+        """
+        try:
+            context = self._context(footprint)
+        except Exception as exc:
+            logger.warning("User context not cached for %s: %s", user_id, exc)
+            self.invalidate(user_id)
+            return
+        with self._lock:
+            self._generations[self._stripe(user_id)] += 1
+            current = self.entries.peek(user_id)
+            # Two saves for one user finished out of order, so which one Mongo
+            # kept is unknown; let the next read fetch it
+            if current is not MISSING and current.footprint and \
+                    str(current.footprint.get("timestamp", "")) > str(footprint.get("timestamp", "")):
+                self.entries.invalidate(user_id)
+                return
+            self.entries.put(user_id, context)
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            self._generations[self._stripe(user_id)] += 1
+            self.entries.invalidate(user_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.entries.stats(), "stale_fills": self.stale_fills}
+
+
+_cache: Optional[UserContextCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_user_context_cache() -> Optional[UserContextCache]:
+    """Return the process-wide user context cache, or None when it is disabled."""
+    global _cache
+    if not USER_CONTEXT_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                # Imported here because utils/data_store.py imports this module
+                from utils.data_store import format_footprint_for_chat
+                _cache = UserContextCache(
+                    USER_CONTEXT_CACHE_MAX_ENTRIES,
+                    USER_CONTEXT_CACHE_TTL_SECONDS,
+                    USER_CONTEXT_CACHE_NEGATIVE_TTL_SECONDS,
+                    format_footprint_for_chat,
+                )
+    return _cache
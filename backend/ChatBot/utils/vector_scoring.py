@@ -0,0 +1,84 @@
+# NumPy-backed columnar scoring for the whole credit catalog in one pass
+#
+# Mirrors the per-dict formulas in utils/scoring.py:
+#   value          = 0.6 * demand + 0.4 * offset / max(price, 1)
+#   trust          = trust_score + min(past_sales_volume / 1000, 5)
+#   recommendation = w_demand * demand + w_trust * trust + w_impact * offset / max(price, 1)
+
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from utils.scoring import DEFAULT_RECOMMENDATION_WEIGHTS, recommendation_weights
+
+WEIGHT_ORDER = ("demand", "trust", "impact")
+
+
+def seller_trust_scores(sellers: Sequence[Dict]) -> np.ndarray:
+    base = np.fromiter((s.get("trust_score", 0) for s in sellers), dtype=np.float64, count=len(sellers))
+    volume = np.fromiter((s.get("past_sales_volume", 0) for s in sellers), dtype=np.float64, count=len(sellers))
+    return base + np.minimum(volume / 1000, 5)
+
+
+class CreditColumns:
+    """Price, demand, offset and seller-trust columns for a list of credits."""
+
+    def __init__(self, credit_ids: List[str], price: np.ndarray, demand: np.ndarray, offset: np.ndarray, seller_trust: np.ndarray):
+        self.credit_ids = credit_ids
+        self.price = price
+        self.demand = demand
+        self.offset = offset
+        self.seller_trust = seller_trust
+
+    @classmethod
+    def from_catalog(cls, credits: Sequence[Dict], sellers: Dict[str, Dict]) -> "CreditColumns":
+        n = len(credits)
+        seller_ids = list(sellers)
+        trust_by_seller = dict(zip(seller_ids, seller_trust_scores([sellers[s] for s in seller_ids]).tolist()))
+        return cls(
+            [c["credit_id"] for c in credits],
+            np.fromiter((c.get("price_usd", 1.0) for c in credits), dtype=np.float64, count=n),
+            np.fromiter((c.get("demand_score", 0.0) for c in credits), dtype=np.float64, count=n),
+            np.fromiter((c.get("emissions_offset_tons", 0.0) for c in credits), dtype=np.float64, count=n),
+            np.fromiter((trust_by_seller.get(c["seller_id"], 0.0) for c in credits), dtype=np.float64, count=n),
+        )
+
+    def __len__(self) -> int:
+        return len(self.credit_ids)
+
+    def offset_per_dollar(self) -> np.ndarray:
+        return self.offset / np.maximum(self.price, 1.0)
+
+    def value_scores(self) -> np.ndarray:
+        return (0.6 * self.demand) + (0.4 * self.offset_per_dollar())
+
+    def recommendation_scores(self, weights: np.ndarray) -> np.ndarray:
+        """Score every credit for every profile.
+
+        `weights` has shape (profiles, 3) in WEIGHT_ORDER; the result has shape
+        (profiles, credits).
+        """
+        features = np.stack([self.demand, self.seller_trust, self.offset_per_dollar()])
+        return np.atleast_2d(weights) @ features
+
+
+def profile_weight_matrix(profiles: Dict[str, Dict]) -> Tuple[List[str], np.ndarray]:
+    keys = list(profiles)
+    matrix = np.array(
+        [[recommendation_weights(profiles[k])[name] for name in WEIGHT_ORDER] for k in keys],
+        dtype=np.float64,
+    ).reshape(len(keys), len(WEIGHT_ORDER))
+    return keys, matrix
+
+
+def default_weight_vector() -> np.ndarray:
+    return np.array([DEFAULT_RECOMMENDATION_WEIGHTS[name] for name in WEIGHT_ORDER], dtype=np.float64)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first (O(N) selection + O(k log k) sort)."""
+    k = min(k, scores.shape[-1])
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
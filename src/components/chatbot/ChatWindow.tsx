@@ -8,6 +8,7 @@ export default function ChatWindow({ onClose }: { onClose: () => void }) {
   const [loading, setLoading] = useState(false);
   const { user } = useAuth();
   const bottomRef = useRef<HTMLDivElement>(null);
+  const sessionIdRef = useRef<string | null>(null);
 
   const scrollToBottom = () => {
     bottomRef.current?.scrollIntoView({ behavior: "smooth" });
@@ -33,11 +34,13 @@ export default function ChatWindow({ onClose }: { onClose: () => void }) {
         body: JSON.stringify({
           message: userMessage,
           role: "seller",
-          user_id: user?.id || null
+          user_id: user?.id || null,
+          session_id: sessionIdRef.current
         })
       });
 
       const data = await res.json();
+      if (data.session_id) sessionIdRef.current = data.session_id;
 
       setMessages(prev => [
         ...prev,